@@ -1,5 +1,5 @@
 from django.contrib import admin
-from .models import AIModel, ChatSession, ChatMessage, AIInsight
+from .models import AIModel, ChatSession, ChatMessage, AIInsight, DocumentStageMetric
 
 @admin.register(AIModel)
 class AIModelAdmin(admin.ModelAdmin):
@@ -25,4 +25,11 @@ class ChatMessageAdmin(admin.ModelAdmin):
 class AIInsightAdmin(admin.ModelAdmin):
     list_display = ['title', 'user', 'insight_type', 'priority', 'is_read', 'created_at']
     list_filter = ['insight_type', 'priority', 'is_read', 'is_dismissed']
-    search_fields = ['title', 'user__username']
\ No newline at end of file
+    search_fields = ['title', 'user__username']
+
+@admin.register(DocumentStageMetric)
+class DocumentStageMetricAdmin(admin.ModelAdmin):
+    list_display = ['document', 'stage', 'wall_time_ms', 'cpu_time_ms', 'page_count', 'input_bytes', 'created_at']
+    list_filter = ['stage', 'created_at']
+    search_fields = ['document__name']
+    readonly_fields = ['created_at']
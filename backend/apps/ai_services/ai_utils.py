@@ -6,19 +6,30 @@ import pdfplumber
 from PIL import Image
 import re
 import json
+import threading
 from datetime import datetime, timedelta
 from decimal import Decimal
-from transformers import AutoTokenizer, AutoModelForTokenClassification, pipeline
-import torch
 from groq import Groq
 from django.conf import settings
+from .instrumentation import stage
+from .preprocessing import ImagePreprocessor
+from .ocr_engines import get_ocr_engine
+from .roi import RegionOCR, REGION_FIELDS, regions_to_text
+from .pdf_triage import triage_pdf, routing_is_valid, render_pdf_pages
+from .pdf_text import iter_pdf_text
+from .line_items import (
+    words_from_pdfplumber, words_from_ocr_data, text_from_ocr_data, LineItemExtractor, items_to_rows
+)
 import logging
 
 logger = logging.getLogger(__name__)
 
+IMAGE_EXTENSIONS = ['.jpg', '.jpeg', '.png', '.bmp', '.tiff']
+
 class OCRProcessor:
-    def __init__(self):
+    def __init__(self, engine=None):
         self.tesseract_config = '--oem 3 --psm 6'
+        self.preprocessor = ImagePreprocessor()
         # Allow overriding Tesseract binary on Windows via env
         try:
             cmd = os.environ.get('TESSERACT_CMD') or getattr(settings, 'TESSERACT_CMD', None)
@@ -26,70 +37,178 @@ class OCRProcessor:
                 pytesseract.pytesseract.tesseract_cmd = cmd
         except Exception:
             pass
+        self.engine = get_ocr_engine(engine, config=self.tesseract_config)
+        # full OCRs the whole page, roi only the header, tax and totals blocks
+        self.mode = getattr(settings, 'OCR_MODE', 'full')
+        self._region_ocr = None
+        self._roi_fallback_logged = False
+
+    @property
+    def region_ocr(self):
+        if self._region_ocr is None:
+            self._region_ocr = RegionOCR(engine=self.engine)
+        return self._region_ocr
+
+    def extract_regions(self, file_path):
+        """OCR an image region by region, see ``roi.RegionOCR``"""
+        processed_image = self.preprocess_image(file_path)
+        if processed_image is None:
+            return []
+        try:
+            return self.region_ocr.run(processed_image)
+        except Exception as e:
+            logger.error(f"Error in region OCR: {e}")
+            return []
     
-    def preprocess_image(self, image_path):
+    def preprocess_image(self, image_path, stages=None):
         """Preprocess image for better OCR results"""
         try:
-            # Load image
-            image = cv2.imread(image_path)
-            if image is None:
-                raise ValueError("Could not load image")
-            
-            # Convert to grayscale
-            gray = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
-            
-            # Apply noise reduction
-            denoised = cv2.medianBlur(gray, 3)
-            
-            # Apply thresholding
-            _, thresh = cv2.threshold(denoised, 0, 255, cv2.THRESH_BINARY + cv2.THRESH_OTSU)
-            
-            # Dilation and erosion to remove noise
-            kernel = np.ones((1, 1), np.uint8)
-            processed = cv2.morphologyEx(thresh, cv2.MORPH_CLOSE, kernel)
+            with stage('preprocess_image', page_count=1,
+                       input_bytes=os.path.getsize(image_path)) as metrics:
+                # Load image
+                image = cv2.imread(image_path)
+                if image is None:
+                    raise ValueError("Could not load image")
+                
+                preprocessor = self.preprocessor if stages is None else ImagePreprocessor(stages=stages)
+                processed, details = preprocessor.run(image)
+                metrics['details'].update(details)
             
             return processed
         except Exception as e:
             logger.error(f"Error preprocessing image: {e}")
             return None
     
-    def extract_text(self, file_path):
-        """Extract text from image or PDF"""
+    def route_pdf(self, file_path, page_routing=None):
+        """Reuse a cached page routing if still valid, else triage the PDF"""
+        if routing_is_valid(page_routing, file_path):
+            return page_routing
+        with stage('pdf_triage', input_bytes=os.path.getsize(file_path)) as metrics:
+            try:
+                routing = triage_pdf(file_path)
+            except Exception as e:
+                # pdfplumber may still cope with files pdfium rejects
+                logger.error(f"Error triaging PDF: {e}")
+                return None
+            metrics['page_count'] = len(routing['pages'])
+            metrics['details']['routes'] = {
+                route: routing['pages'].count(route) for route in set(routing['pages'])
+            }
+        return routing
+    
+    def ocr_image(self, image, on_words=None):
+        """OCR one image; with ``on_words``, also pass it the image's word boxes"""
+        if on_words is None:
+            return self.engine.image_to_string(image)
+        data = self.engine.image_to_data(image)
+        on_words(words_from_ocr_data(data))
+        return text_from_ocr_data(data)
+    
+    def iter_pdf_pages(self, file_path, routing=None, stop=None, on_words=None):
+        """Yield ``(page_index, text)`` in page order, one page in memory at a time.
+
+        Text pages come from the text layer, scanned pages are rendered and
+        OCR'd, empty pages are skipped. Without a routing every page is read
+        from the text layer. ``stop(page_index, text)`` returning True ends
+        the iteration early. With a streaming consumer the ``pdf_pages``
+        stage also includes the consumer's time between pages. ``on_words``,
+        when given, receives the word boxes of each page in page order.
+        """
+        on_page = None
+        if on_words is not None:
+            def on_page(index, page):
+                on_words(words_from_pdfplumber(page.extract_words(x_tolerance=2, y_tolerance=2)))
+        
+        with stage('pdf_pages', page_count=0, input_bytes=os.path.getsize(file_path)) as metrics:
+            if not routing:
+                for index, text in iter_pdf_text(file_path, stop=stop, on_page=on_page):
+                    metrics['page_count'] += 1
+                    yield index, text
+                return
+            
+            routes = routing['pages']
+            texts = iter_pdf_text(file_path, pages=[i for i, route in enumerate(routes) if route == 'text'],
+                                  on_page=on_page)
+            images = render_pdf_pages(file_path, [i for i, route in enumerate(routes) if route == 'ocr'],
+                                      dpi=self.preprocessor.target_dpi)
+            try:
+                for index, route in enumerate(routes):
+                    if route == 'text':
+                        _, text = next(texts)
+                    elif route == 'ocr':
+                        _, image = next(images)
+                        processed, _ = self.preprocessor.run(image)
+                        text = self.ocr_image(processed, on_words)
+                    else:
+                        continue
+                    metrics['page_count'] += 1
+                    metrics['details'][route] = metrics['details'].get(route, 0) + 1
+                    yield index, text
+                    if stop is not None and stop(index, text):
+                        return
+            finally:
+                # Close both documents even when the consumer stops early
+                texts.close()
+                images.close()
+    
+    def _extract_pdf_text(self, file_path, routing, on_words=None):
+        """Text layer for text pages, rendered OCR for scanned pages, in page order"""
+        page_texts = []
+        try:
+            for _, text in self.iter_pdf_pages(file_path, routing, on_words=on_words):
+                if text.strip():
+                    page_texts.append(text)
+        except Exception as e:
+            logger.error(f"Error extracting PDF text: {e}")
+        return "\n".join(page_texts)
+    
+    def use_regions(self, mode=None):
+        """Whether images are OCR'd region by region in ``mode`` (default: the configured one)"""
+        if (mode or self.mode) != 'roi':
+            return False
+        # One engine call per key region only pays off without process start-up
+        if self.engine.name != 'tesserocr':
+            if not self._roi_fallback_logged:
+                logger.warning("OCR_MODE 'roi' needs the tesserocr engine; using full-page OCR")
+                self._roi_fallback_logged = True
+            return False
+        return True
+    
+    def extract_text(self, file_path, mode=None, page_routing=None, on_words=None, regions=None):
+        """Extract text from image or PDF.
+
+        ``on_words`` is called with the word boxes of each page as it is
+        read. Pass a list as ``regions`` to receive the OCR regions when an
+        image is read region by region.
+        """
         try:
             file_extension = os.path.splitext(file_path)[1].lower()
+            found_regions = None
             
-            if file_extension in ['.jpg', '.jpeg', '.png', '.bmp', '.tiff']:
+            if file_extension in IMAGE_EXTENSIONS and self.use_regions(mode):
+                found_regions = self.extract_regions(file_path)
+            if found_regions:
+                if regions is not None:
+                    regions.extend(found_regions)
+                text = regions_to_text(found_regions)
+            elif file_extension in IMAGE_EXTENSIONS:
                 # Process image
                 processed_image = self.preprocess_image(file_path)
-                if processed_image is not None:
-                    text = pytesseract.image_to_string(
-                        processed_image, config=self.tesseract_config
-                    )
-                else:
-                    # Fallback to original image
-                    text = pytesseract.image_to_string(
-                        Image.open(file_path), config=self.tesseract_config
-                    )
+                with stage('tesseract', page_count=1, engine=self.engine.name) as metrics:
+                    if processed_image is not None:
+                        metrics['input_bytes'] = int(processed_image.nbytes)
+                        text = self.ocr_image(processed_image, on_words)
+                    else:
+                        # Fallback to original image
+                        metrics['input_bytes'] = os.path.getsize(file_path)
+                        text = self.ocr_image(Image.open(file_path), on_words)
             elif file_extension == '.pdf':
-                # Extract text from PDF using pdfplumber with relaxed tolerances
-                text_parts = []
-                try:
-                    with pdfplumber.open(file_path) as pdf:
-                        for page in pdf.pages:
-                            page_text = page.extract_text(x_tolerance=2, y_tolerance=2) or ''
-                            if page_text.strip():
-                                text_parts.append(page_text)
-                except Exception:
-                    text_parts = []
-                text = "\n".join(text_parts).strip()
-                # Fallback: first page via Tesseract if pdf text empty
-                if not text:
-                    try:
-                        text = pytesseract.image_to_string(
-                            Image.open(file_path), config=self.tesseract_config
-                        )
-                    except Exception:
-                        text = ''
+                text = self._extract_pdf_text(file_path, self.route_pdf(file_path, page_routing), on_words)
+            elif file_extension == '.txt':
+                # Plain-text invoices (e.g. exported from accounting tools) need no OCR
+                with stage('read_text', page_count=1, input_bytes=os.path.getsize(file_path)):
+                    with open(file_path, encoding='utf-8', errors='replace') as f:
+                        text = f.read()
             else:
                 raise ValueError(f"Unsupported file format: {file_extension}")
             
@@ -99,16 +218,29 @@ class OCRProcessor:
             return ""
 
 class NERProcessor:
+    """BERT NER, loaded on first use.
+
+    transformers and torch are only imported when the model is loaded, so
+    processes that never run NER (extraction workers) stay small.
+    """
     def __init__(self):
         self.model_name = "dbmdz/bert-large-cased-finetuned-conll03-english"
         self.tokenizer = None
         self.model = None
         self.pipeline = None
-        self._load_model()
+        self._loaded = False
+        self._load_lock = threading.Lock()
     
-    def _load_model(self):
+    def load(self):
         """Load NER model"""
+        with self._load_lock:
+            if not self._loaded:
+                self._load_model()
+                self._loaded = True
+    
+    def _load_model(self):
         try:
+            from transformers import AutoTokenizer, AutoModelForTokenClassification, pipeline
             self.tokenizer = AutoTokenizer.from_pretrained(self.model_name)
             self.model = AutoModelForTokenClassification.from_pretrained(self.model_name)
             self.pipeline = pipeline("ner", 
@@ -121,11 +253,15 @@ class NERProcessor:
     
     def extract_entities(self, text):
         """Extract named entities from text"""
-        if not self.pipeline or not text:
+        if not text:
+            return []
+        self.load()
+        if not self.pipeline:
             return []
         
         try:
-            entities = self.pipeline(text)
+            with stage('ner', input_bytes=len(text.encode('utf-8'))):
+                entities = self.pipeline(text)
             return [
                 {
                     'text': entity['word'],
@@ -140,27 +276,53 @@ class NERProcessor:
             return []
 
 class InvoiceDataExtractor:
-    def __init__(self):
-        self.ocr = OCRProcessor()
-        self.ner = NERProcessor()
+    def __init__(self, ocr=None, ner=None):
+        self.ocr = ocr or OCRProcessor()
+        self.ner = ner or NERProcessor()
     
-    def extract_invoice_data(self, file_path):
-        """Extract structured data from invoice"""
+    def extract_invoice_data(self, file_path, page_routing=None, on_text=None, with_entities=True):
+        """Extract structured data from invoice.
+
+        ``on_text`` receives the raw text as soon as OCR is done. Without
+        ``with_entities`` NER is skipped and ``entities`` is left empty.
+        """
         try:
             # Extract text using OCR
-            text = self.ocr.extract_text(file_path)
+            file_extension = os.path.splitext(file_path)[1].lower()
+            if file_extension == '.pdf':
+                page_routing = self.ocr.route_pdf(file_path, page_routing)
+            # Line items are read page by page from word boxes; ROI mode skips
+            # the item table by design
+            line_items = LineItemExtractor() if getattr(settings, 'LINE_ITEM_EXTRACTION', False) else None
+            regions = []
+            text = self.ocr.extract_text(file_path, page_routing=page_routing,
+                                         on_words=line_items.add_page if line_items else None,
+                                         regions=regions)
             if not text:
                 return None
+            if on_text is not None:
+                on_text(text)
             
             # Extract entities using NER
-            entities = self.ner.extract_entities(text)
+            entities = self.ner.extract_entities(text) if with_entities else []
             
             # Extract structured data using regex patterns
-            structured_data = self._extract_with_regex(text)
+            with stage('regex', input_bytes=len(text.encode('utf-8'))):
+                if regions:
+                    structured_data = self._extract_from_regions(regions, text)
+                else:
+                    structured_data = self._extract_with_regex(text)
+            
+            if line_items is not None and line_items.pages:
+                with stage('line_items', page_count=line_items.pages) as metrics:
+                    structured_data['items'] = items_to_rows(line_items.items)
+                    metrics['details']['items'] = len(structured_data['items'])
             
             # Combine NER entities with regex results
             structured_data['entities'] = entities
             structured_data['raw_text'] = text
+            if file_extension == '.pdf':
+                structured_data['page_routing'] = page_routing or {}
             
             return structured_data
         
@@ -168,6 +330,22 @@ class InvoiceDataExtractor:
             logger.error(f"Error extracting invoice data: {e}")
             return None
     
+    def _extract_from_regions(self, regions, text):
+        """Take each field from the region kind it belongs to, falling back to the whole text"""
+        data = self._extract_with_regex(text)
+        for kind, fields in REGION_FIELDS.items():
+            region_text = regions_to_text([r for r in regions if r['kind'] == kind])
+            if not region_text:
+                continue
+            region_data = self._extract_with_regex(region_text)
+            for field in fields:
+                if region_data.get(field):
+                    data[field] = region_data[field]
+        data['regions'] = [
+            {'kind': r['kind'], 'box': r['box'], 'quality': r['quality']} for r in regions
+        ]
+        return data
+    
     def _extract_with_regex(self, text):
         """Extract structured data using regex patterns"""
         data = {
@@ -363,6 +541,43 @@ class AITaxAdvisor:
         return "I'd be happy to help with your tax query. For specific advice, please consult with a qualified Chartered Accountant who can review your particular situation."
 
 class ComplianceAnalyzer:
+    GST_NUMBER_REQUIRED = {
+        'type': 'compliance_reminder',
+        'title': 'GST Number Required',
+        'description': 'Expenses above ₹200 require valid GST number from vendor for input credit.',
+        'priority': 'medium',
+        'action_required': True
+    }
+    HIGH_GST_RATE = {
+        'type': 'anomaly',
+        'title': 'High GST Rate Detected',
+        'description': 'GST rate of {gst_rate:.1f}% seems unusually high. Please verify.',
+        'priority': 'high',
+        'action_required': True
+    }
+    TDS_REQUIRED = {
+        'type': 'compliance_reminder',
+        'title': 'TDS Deduction Required',
+        'description': 'Professional payments above ₹30,000 require 10% TDS deduction.',
+        'priority': 'high',
+        'action_required': True
+    }
+    DOCUMENTATION_REQUIRED = {
+        'type': 'compliance_reminder',
+        'title': 'Documentation Required',
+        'description': 'High-value transactions (₹{amount:,.0f}) require proper invoices and supporting documents.',
+        'priority': 'medium',
+        'action_required': True
+    }
+    
+    # Every insight the analyzer writes starts from one of these
+    TEMPLATES = (GST_NUMBER_REQUIRED, HIGH_GST_RATE, TDS_REQUIRED, DOCUMENTATION_REQUIRED)
+    
+    BATCH_COLUMNS = {
+        'amount': 0.0, 'type': '', 'category': '', 'gst_number': '',
+        'cgst_amount': 0.0, 'sgst_amount': 0.0, 'igst_amount': 0.0, 'tds_amount': 0.0,
+    }
+    
     def __init__(self):
         self.gst_rules = self._load_gst_rules()
     
@@ -389,6 +604,69 @@ class ComplianceAnalyzer:
             logger.error(f"Error analyzing transaction: {e}")
             return []
     
+    def analyze_batch(self, transactions):
+        """Analyze many transactions at once with column-wise rule checks.
+        
+        ``transactions`` is a DataFrame (or anything ``pd.DataFrame`` accepts,
+        such as a list of ``values()`` dicts) with an ``id`` column plus the
+        fields ``analyze_transaction`` reads. Returns ``{id: [insight, ...]}``
+        for every row, with the same insights in the same order as the
+        per-transaction path.
+        """
+        import pandas as pd
+        
+        frame = transactions if isinstance(transactions, pd.DataFrame) else pd.DataFrame(transactions)
+        ids = frame['id'].tolist() if 'id' in frame else list(frame.index)
+        results = {txn_id: [] for txn_id in ids}
+        if frame.empty:
+            return results
+        
+        def column(name):
+            default = self.BATCH_COLUMNS[name]
+            if name not in frame:
+                return np.full(len(frame), default, dtype=object if isinstance(default, str) else float)
+            if isinstance(default, str):
+                return frame[name].fillna('').astype(str).to_numpy()
+            return pd.to_numeric(frame[name], errors='coerce').fillna(0).to_numpy(dtype=float)
+        
+        amount = column('amount')
+        is_expense = column('type') == 'expense'
+        total_gst = column('cgst_amount') + column('sgst_amount') + column('igst_amount')
+        has_gst = total_gst > 0
+        
+        with np.errstate(divide='ignore', invalid='ignore'):
+            gst_rate = np.where(has_gst, total_gst / amount * 100, 0.0)
+        
+        gst_number_required = (amount > 200) & is_expense & (column('gst_number') == '')
+        high_gst_rate = has_gst & (gst_rate > 30)
+        professional = pd.Series(column('category')).str.lower().str.contains('professional', regex=False).to_numpy()
+        tds_required = (
+            is_expense & professional & (amount > 30000)
+            & (column('tds_amount') < amount * 0.1 * 0.9)
+        )
+        documentation_required = amount > 50000
+        # The per-transaction path divides by a zero amount and drops every
+        # insight for that transaction; keep the two paths in agreement
+        valid = ~(has_gst & (amount == 0))
+        
+        for mask, template in (
+            (gst_number_required, self.GST_NUMBER_REQUIRED),
+            (high_gst_rate, self.HIGH_GST_RATE),
+            (tds_required, self.TDS_REQUIRED),
+            (documentation_required, self.DOCUMENTATION_REQUIRED),
+        ):
+            description = template['description']
+            formatted = '{' in description
+            for index in np.flatnonzero(mask & valid):
+                insight = dict(template)
+                if formatted:
+                    insight['description'] = description.format(
+                        gst_rate=gst_rate[index], amount=amount[index]
+                    )
+                results[ids[index]].append(insight)
+        
+        return results
+    
     def _check_gst_compliance(self, transaction_data):
         """Check GST compliance issues"""
         insights = []
@@ -397,13 +675,7 @@ class ComplianceAnalyzer:
         
         # Check if GST number is required but missing
         if amount > 200 and transaction_data.get('type') == 'expense' and not gst_number:
-            insights.append({
-                'type': 'compliance_reminder',
-                'title': 'GST Number Required',
-                'description': f'Expenses above ₹200 require valid GST number from vendor for input credit.',
-                'priority': 'medium',
-                'action_required': True
-            })
+            insights.append(dict(self.GST_NUMBER_REQUIRED))
         
         # Check GST rate reasonableness
         total_gst = (
@@ -415,13 +687,9 @@ class ComplianceAnalyzer:
         if total_gst > 0:
             gst_rate = (total_gst / amount) * 100
             if gst_rate > 30:  # Unusually high GST rate
-                insights.append({
-                    'type': 'anomaly',
-                    'title': 'High GST Rate Detected',
-                    'description': f'GST rate of {gst_rate:.1f}% seems unusually high. Please verify.',
-                    'priority': 'high',
-                    'action_required': True
-                })
+                insight = dict(self.HIGH_GST_RATE)
+                insight['description'] = insight['description'].format(gst_rate=gst_rate)
+                insights.append(insight)
         
         return insights
     
@@ -440,13 +708,7 @@ class ComplianceAnalyzer:
                 expected_tds = amount * 0.1  # 10% TDS rate
                 
                 if tds_amount < expected_tds * 0.9:  # Allow 10% tolerance
-                    insights.append({
-                        'type': 'compliance_reminder',
-                        'title': 'TDS Deduction Required',
-                        'description': f'Professional payments above ₹30,000 require 10% TDS deduction.',
-                        'priority': 'high',
-                        'action_required': True
-                    })
+                    insights.append(dict(self.TDS_REQUIRED))
         
         return insights
     
@@ -457,13 +719,9 @@ class ComplianceAnalyzer:
         
         # High-value transactions need proper documentation
         if amount > 50000:
-            insights.append({
-                'type': 'compliance_reminder',
-                'title': 'Documentation Required',
-                'description': f'High-value transactions (₹{amount:,.0f}) require proper invoices and supporting documents.',
-                'priority': 'medium',
-                'action_required': True
-            })
+            insight = dict(self.DOCUMENTATION_REQUIRED)
+            insight['description'] = insight['description'].format(amount=amount)
+            insights.append(insight)
         
         return insights
     
@@ -0,0 +1,361 @@
+"""Benchmark harness for the invoice extraction pipeline.
+
+Runs ``InvoiceDataExtractor.extract_invoice_data`` over a fixed set of input
+files and reports cold and warm timings, a per-stage breakdown, throughput at
+several process-pool sizes and peak RSS as a JSON-serialisable dict, so two
+reports from different commits can be compared with ``compare_reports``.
+``sweep_preprocessing`` measures the OCR time and accuracy trade-off of each
+image preprocessing stage, ``compare_ocr_engines`` times the OCR engines
+against each other on the same preprocessed images and
+``benchmark_line_items`` times the line-item table extraction.
+The Groq client is disabled for the whole run, so no LLM call is ever made.
+"""
+from concurrent.futures import ProcessPoolExecutor
+from difflib import SequenceMatcher
+from pathlib import Path
+import multiprocessing
+import platform
+import resource
+import subprocess
+import statistics
+import time
+
+from django.conf import settings
+from django.utils import timezone
+
+from .instrumentation import PipelineTrace, summarize_stage_timings
+from .preprocessing import DEFAULT_STAGES
+
+REPO_ROOT = Path(settings.BASE_DIR).parent
+
+SAMPLE_FILES = [
+    REPO_ROOT / 'Sample_Invoice_INR.pdf',
+    REPO_ROOT / 'Sample_Invoice_INR_CGST_SGST.pdf',
+    REPO_ROOT / 'Indian_Invoice_Test.pdf',
+    REPO_ROOT / 'invoice-0-4.pdf',
+    REPO_ROOT / 'sample1.jpg',
+    Path(settings.BASE_DIR) / 'sample_data' / 'sample_invoice.txt',
+]
+
+IMAGE_EXTENSIONS = {'.jpg', '.jpeg', '.png', '.bmp', '.tiff'}
+
+# Fields compared between a preprocessing variant and the reference OCR
+SWEEP_FIELDS = ['invoice_number', 'gst_number', 'date', 'amount', 'cgst', 'sgst', 'igst', 'vendor_name']
+
+_worker_extractor = None
+
+def _peak_rss_mb(who=resource.RUSAGE_SELF):
+    # ru_maxrss is reported in kilobytes on Linux
+    return round(resource.getrusage(who).ru_maxrss / 1024, 1)
+
+def _git_commit():
+    try:
+        return subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'], cwd=REPO_ROOT,
+            capture_output=True, text=True, timeout=5
+        ).stdout.strip()
+    except Exception:
+        return ''
+
+def create_extractor(use_ner=True, ocr_mode=None):
+    """Build a fresh extractor with the LLM disabled"""
+    from . import ai_utils
+    ai_utils.ai_advisor.groq_client = None
+    ocr = ai_utils.OCRProcessor()
+    if ocr_mode:
+        ocr.mode = ocr_mode
+    ner = _NoopNER()
+    if use_ner:
+        # Load now so model loading counts as setup, not as the first document
+        ner = ai_utils.NERProcessor()
+        ner.load()
+    return ai_utils.InvoiceDataExtractor(ocr=ocr, ner=ner)
+
+class _NoopNER:
+    def extract_entities(self, text):
+        return []
+
+def timed_extract(extractor, path):
+    """Run one extraction and return (wall_ms, stage metrics, extracted data)"""
+    with PipelineTrace() as trace:
+        start = time.perf_counter()
+        data = extractor.extract_invoice_data(str(path))
+        wall_ms = (time.perf_counter() - start) * 1000
+    return wall_ms, trace.stages, data
+
+def _init_worker(use_ner, ocr_mode=None):
+    global _worker_extractor
+    import django
+    django.setup()
+    _worker_extractor = create_extractor(use_ner, ocr_mode)
+
+def _worker_extract(path):
+    _worker_extractor.extract_invoice_data(path)
+    return path
+
+def measure_throughput(files, pool_size, docs, use_ner=True, ocr_mode=None):
+    """Documents per second through a pool of worker processes"""
+    paths = [str(files[i % len(files)]) for i in range(docs)]
+    context = multiprocessing.get_context('spawn')
+    with ProcessPoolExecutor(max_workers=pool_size, mp_context=context,
+                             initializer=_init_worker, initargs=(use_ner, ocr_mode)) as pool:
+        # Warm every worker (model load, Tesseract start-up) before timing
+        list(pool.map(_worker_extract, [paths[0]] * pool_size))
+        start = time.perf_counter()
+        list(pool.map(_worker_extract, paths))
+        elapsed = time.perf_counter() - start
+    return {
+        'pool_size': pool_size,
+        'docs': docs,
+        'seconds': round(elapsed, 3),
+        'docs_per_sec': round(docs / elapsed, 3) if elapsed else None,
+        'peak_worker_rss_mb': _peak_rss_mb(resource.RUSAGE_CHILDREN),
+    }
+
+def run_benchmark(files=None, warm_runs=3, pool_sizes=(1,), pool_docs=None, use_ner=True,
+                  ocr_mode=None, log=None):
+    """Run the full benchmark and return the report dict"""
+    files = [Path(f) for f in (files or SAMPLE_FILES) if Path(f).exists()]
+    log = log or (lambda message: None)
+
+    setup_start = time.perf_counter()
+    extractor = create_extractor(use_ner, ocr_mode)
+    setup_ms = (time.perf_counter() - setup_start) * 1000
+    log(f"Extractor ready in {setup_ms:.0f}ms")
+
+    results = {}
+    stage_rows = []
+    for path in files:
+        cold_ms, _, data = timed_extract(extractor, path)
+        warm = []
+        for _ in range(warm_runs):
+            wall_ms, stages, _ = timed_extract(extractor, path)
+            warm.append(wall_ms)
+            stage_rows.extend(
+                (metrics['stage'], metrics['wall_time_ms'], metrics['cpu_time_ms'])
+                for metrics in stages
+            )
+        results[path.name] = {
+            'bytes': path.stat().st_size,
+            'extracted': bool(data),
+            'cold_ms': round(cold_ms, 2),
+            'warm_p50_ms': round(statistics.median(warm), 2) if warm else None,
+            'warm_min_ms': round(min(warm), 2) if warm else None,
+        }
+        log(f"{path.name}: cold {cold_ms:.0f}ms, warm p50 {results[path.name]['warm_p50_ms']}ms")
+
+    throughput = []
+    for pool_size in pool_sizes:
+        docs = pool_docs or len(files) * 4
+        throughput.append(measure_throughput(files, pool_size, docs, use_ner, ocr_mode))
+        log(f"pool={pool_size}: {throughput[-1]['docs_per_sec']} docs/sec")
+
+    return {
+        'generated_at': timezone.now().isoformat(),
+        'git_commit': _git_commit(),
+        'python': platform.python_version(),
+        'ner_enabled': use_ner,
+        'ocr_mode': 'roi' if extractor.ocr.use_regions() else 'full',
+        'warm_runs': warm_runs,
+        'setup_ms': round(setup_ms, 2),
+        'files': results,
+        'stages': summarize_stage_timings(stage_rows),
+        'throughput': throughput,
+        'peak_rss_mb': _peak_rss_mb(),
+    }
+
+def preprocessing_variants(stages=None):
+    """All stages, each stage switched off in turn, and no preprocessing at all"""
+    stages = list(stages or DEFAULT_STAGES)
+    variants = {'all': stages}
+    for name in stages:
+        variants[f'no_{name}'] = [s for s in stages if s != name]
+    variants['none'] = []
+    return variants
+
+def _text_similarity(reference, text):
+    return SequenceMatcher(None, reference.split(), text.split(), autojunk=False).ratio()
+
+def sweep_preprocessing(files=None, variants=None, runs=1, log=None):
+    """OCR each image under every preprocessing variant.
+
+    Accuracy is measured against OCR of the untouched full-resolution image:
+    token similarity of the text and agreement of the regex-extracted fields.
+    """
+    import cv2
+    from .ai_utils import InvoiceDataExtractor, OCRProcessor
+    from .preprocessing import ImagePreprocessor
+
+    files = [Path(f) for f in (files or SAMPLE_FILES)
+             if Path(f).exists() and Path(f).suffix.lower() in IMAGE_EXTENSIONS]
+    variants = variants or preprocessing_variants()
+    log = log or (lambda message: None)
+    ocr = OCRProcessor()
+    fields_of = InvoiceDataExtractor(ocr=ocr, ner=_NoopNER())._extract_with_regex
+
+    def run_ocr(image):
+        start = time.perf_counter()
+        text = ocr.engine.image_to_string(image)
+        return text, (time.perf_counter() - start) * 1000
+
+    results = {}
+    for path in files:
+        image = cv2.imread(str(path))
+        if image is None:
+            continue
+        try:
+            reference, reference_ms = run_ocr(cv2.cvtColor(image, cv2.COLOR_BGR2GRAY))
+        except Exception as e:
+            log(f"{path.name}: OCR unavailable ({e})")
+            results[path.name] = {'error': str(e)}
+            continue
+        reference_fields = fields_of(reference)
+        compared = [f for f in SWEEP_FIELDS if reference_fields.get(f)]
+
+        rows = {'reference': {'ocr_ms': round(reference_ms, 2),
+                              'pixels': int(image.shape[0] * image.shape[1])}}
+        for name, stages in variants.items():
+            preprocessor = ImagePreprocessor(stages=stages)
+            preprocess_ms, ocr_ms = [], []
+            for _ in range(runs):
+                start = time.perf_counter()
+                processed, details = preprocessor.run(image)
+                preprocess_ms.append((time.perf_counter() - start) * 1000)
+                text, elapsed = run_ocr(processed)
+                ocr_ms.append(elapsed)
+            fields = fields_of(text)
+            matched = sum(1 for f in compared if fields.get(f) == reference_fields[f])
+            rows[name] = {
+                'stages': stages,
+                'pixels': details['pixels_out'],
+                'preprocess_ms': round(statistics.median(preprocess_ms), 2),
+                'ocr_ms': round(statistics.median(ocr_ms), 2),
+                'text_similarity': round(_text_similarity(reference, text), 3),
+                'fields_matched': f"{matched}/{len(compared)}",
+            }
+            log(f"{path.name} [{name}]: preprocess {rows[name]['preprocess_ms']}ms, "
+                f"ocr {rows[name]['ocr_ms']}ms, similarity {rows[name]['text_similarity']}")
+        results[path.name] = rows
+    return results
+
+def compare_ocr_engines(files=None, engines=('subprocess', 'tesserocr'), runs=3, log=None):
+    """Time each OCR engine on the same preprocessed images.
+
+    ``setup_ms`` covers building the engine (the model load for tesserocr),
+    ``cold_ms`` the first call and ``warm_p50_ms`` the steady state.
+    """
+    from .ai_utils import OCRProcessor
+    from .ocr_engines import get_ocr_engine
+
+    log = log or (lambda message: None)
+    preprocessor = OCRProcessor()
+    images = {}
+    for path in files or SAMPLE_FILES:
+        path = Path(path)
+        if path.exists() and path.suffix.lower() in IMAGE_EXTENSIONS:
+            processed = preprocessor.preprocess_image(str(path))
+            if processed is not None:
+                images[path.name] = processed
+
+    results = {}
+    for name in engines:
+        start = time.perf_counter()
+        try:
+            engine = get_ocr_engine(name, config=preprocessor.tesseract_config)
+        except ValueError as e:
+            results[name] = {'error': str(e)}
+            continue
+        setup_ms = (time.perf_counter() - start) * 1000
+        if engine.name != name:
+            results[name] = {'error': f'unavailable, fell back to {engine.name}'}
+            log(f"{name}: unavailable")
+            continue
+
+        per_file = {}
+        for file_name, image in images.items():
+            timings = []
+            try:
+                for _ in range(runs + 1):
+                    start = time.perf_counter()
+                    engine.image_to_string(image)
+                    timings.append((time.perf_counter() - start) * 1000)
+            except Exception as e:
+                per_file[file_name] = {'error': str(e)}
+                continue
+            per_file[file_name] = {
+                'cold_ms': round(timings[0], 2),
+                'warm_p50_ms': round(statistics.median(timings[1:]), 2) if runs else None,
+            }
+            log(f"{name} {file_name}: cold {per_file[file_name]['cold_ms']}ms, "
+                f"warm p50 {per_file[file_name]['warm_p50_ms']}ms")
+        results[name] = {'setup_ms': round(setup_ms, 2), 'files': per_file}
+    return results
+
+def benchmark_line_items(files=None, synthetic_lines=(10, 100, 500), runs=5, log=None):
+    """Time line-item extraction on the sample PDFs' word boxes and on generated tables.
+
+    Word boxes are collected up front so only the row/column clustering is timed.
+    """
+    import pdfplumber
+    from .line_items import (
+        extract_line_items, synthetic_invoice_words, words_from_pdfplumber
+    )
+
+    log = log or (lambda message: None)
+    inputs = {}
+    for path in files or SAMPLE_FILES:
+        path = Path(path)
+        if path.exists() and path.suffix.lower() == '.pdf':
+            with pdfplumber.open(path) as pdf:
+                inputs[path.name] = [
+                    words_from_pdfplumber(page.extract_words(x_tolerance=2, y_tolerance=2))
+                    for page in pdf.pages
+                ]
+    for lines in synthetic_lines:
+        inputs[f'synthetic_{lines}_lines'] = [synthetic_invoice_words(lines)]
+
+    results = {}
+    for name, pages in inputs.items():
+        timings = []
+        for _ in range(runs):
+            start = time.perf_counter()
+            items = extract_line_items(pages)
+            timings.append((time.perf_counter() - start) * 1000)
+        results[name] = {
+            'words': sum(len(words['text']) for words in pages),
+            'items': len(items['amount']),
+            'p50_ms': round(statistics.median(timings), 3),
+        }
+        log(f"line items {name}: {results[name]['items']} items in {results[name]['p50_ms']}ms")
+    return results
+
+def compare_reports(baseline, current, threshold=0.2):
+    """List regressions of ``current`` against ``baseline`` beyond ``threshold``"""
+    regressions = []
+
+    def check_slower(name, old, new):
+        if old and new and new > old * (1 + threshold):
+            regressions.append(f"{name}: {old:.1f} -> {new:.1f} (+{(new / old - 1) * 100:.0f}%)")
+
+    for file_name, result in current.get('files', {}).items():
+        old = baseline.get('files', {}).get(file_name)
+        if old:
+            check_slower(f"{file_name} warm_p50_ms", old.get('warm_p50_ms'), result.get('warm_p50_ms'))
+
+    for stage_name, summary in current.get('stages', {}).items():
+        old = baseline.get('stages', {}).get(stage_name)
+        if old:
+            check_slower(f"stage {stage_name} p50_ms", old['wall_ms']['p50'], summary['wall_ms']['p50'])
+
+    old_throughput = {row['pool_size']: row for row in baseline.get('throughput', [])}
+    for row in current.get('throughput', []):
+        old = old_throughput.get(row['pool_size'])
+        if old and old.get('docs_per_sec') and row.get('docs_per_sec'):
+            if row['docs_per_sec'] < old['docs_per_sec'] * (1 - threshold):
+                regressions.append(
+                    f"pool={row['pool_size']} docs_per_sec: "
+                    f"{old['docs_per_sec']} -> {row['docs_per_sec']}"
+                )
+
+    check_slower('peak_rss_mb', baseline.get('peak_rss_mb'), current.get('peak_rss_mb'))
+    return regressions
@@ -0,0 +1,146 @@
+"""In-process deferred execution with request coalescing.
+
+There is no task queue behind the ``tasks`` module, so work that should not
+hold up a request is handed to a ``CoalescingExecutor``. Keys submitted
+within ``window_seconds`` of the first pending one are collected and passed
+to the batch function together, from a background thread, once the window
+closes or ``max_batch`` keys are waiting. ``delay`` defers the submit until
+the surrounding database transaction commits, so the background thread
+always sees the rows it is asked about.
+
+Pending keys live in memory: anything not yet run when the process exits
+is run by an ``atexit`` flush, but a killed process loses them.
+
+``DeferredTask`` wraps a single-key task function with Celery-style
+``delay`` methods that go through an executor built on first use.
+"""
+from django.db import connection, transaction as db_transaction
+import atexit
+import functools
+import threading
+import time
+import logging
+
+logger = logging.getLogger(__name__)
+
+class CoalescingExecutor:
+    """Run ``func(keys)`` for keys submitted close together, in one batch"""
+
+    def __init__(self, func, name, mode='deferred', window_seconds=2.0, max_batch=1000):
+        self.func = func
+        self.name = name
+        self.mode = mode
+        self.window_seconds = window_seconds
+        self.max_batch = max_batch
+        self._pending = {}  # insertion ordered, ignores repeats
+        self._first_at = None
+        self._condition = threading.Condition()
+        self._thread = None
+        atexit.register(self.flush)
+
+    def delay(self, key):
+        """Submit ``key`` once the current database transaction commits"""
+        db_transaction.on_commit(lambda: self.submit(key))
+
+    def delay_many(self, keys):
+        """Submit ``keys`` once the current database transaction commits"""
+        keys = list(keys)
+        db_transaction.on_commit(lambda: self.submit_many(keys))
+
+    def submit(self, key):
+        self.submit_many([key])
+
+    def submit_many(self, keys):
+        if self.mode == 'eager':
+            keys = list(dict.fromkeys(keys))
+            for start in range(0, len(keys), self.max_batch):
+                self._run(keys[start:start + self.max_batch])
+            return
+        with self._condition:
+            if not self._pending:
+                self._first_at = time.monotonic()
+            for key in keys:
+                self._pending[key] = None
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._worker, name=self.name, daemon=True)
+                self._thread.start()
+            self._condition.notify()
+
+    def _take(self, limit):
+        keys = list(self._pending)[:limit]
+        for key in keys:
+            del self._pending[key]
+        self._first_at = time.monotonic() if self._pending else None
+        return keys
+
+    def _worker(self):
+        while True:
+            with self._condition:
+                while not self._pending:
+                    self._condition.wait()
+                # Wait out the window unless the batch fills up first
+                while len(self._pending) < self.max_batch:
+                    remaining = self._first_at + self.window_seconds - time.monotonic()
+                    if remaining <= 0:
+                        break
+                    self._condition.wait(remaining)
+                    if not self._pending:
+                        break
+                batch = self._take(self.max_batch)
+            if batch:
+                try:
+                    self._run(batch)
+                finally:
+                    # This thread's connection would otherwise stay open between batches
+                    connection.close()
+
+    def _run(self, keys):
+        try:
+            self.func(keys)
+        except Exception:
+            logger.exception(f"Error running {self.name} batch of {len(keys)}")
+
+    def pending(self):
+        with self._condition:
+            return list(self._pending)
+
+    def flush(self):
+        """Run everything pending now, in the calling thread"""
+        while True:
+            with self._condition:
+                batch = self._take(self.max_batch)
+            if not batch:
+                return
+            self._run(batch)
+
+class DeferredTask:
+    """A task function whose ``delay(key)`` queues the key on a ``CoalescingExecutor``.
+
+    Calling the task runs it inline. ``make_executor`` is called on first
+    use, so the executor reads its settings then rather than at import.
+    """
+
+    def __init__(self, func, make_executor):
+        functools.update_wrapper(self, func)
+        self.func = func
+        self.make_executor = make_executor
+        self._executor = None
+        self._lock = threading.Lock()
+
+    def __call__(self, *args, **kwargs):
+        return self.func(*args, **kwargs)
+
+    @property
+    def executor(self):
+        with self._lock:
+            if self._executor is None:
+                self._executor = self.make_executor()
+            return self._executor
+
+    def delay(self, key):
+        """Queue ``key`` once the current database transaction commits"""
+        self.executor.delay(key)
+
+    def delay_many(self, keys):
+        """Queue ``keys`` once the current database transaction commits"""
+        self.executor.delay_many(keys)
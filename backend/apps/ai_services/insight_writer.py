@@ -0,0 +1,73 @@
+"""Buffered bulk writes of AIInsight rows and their M2M links.
+
+Creating insights one at a time costs an INSERT per insight plus a query
+per ``related_transactions.add``. ``BulkInsightWriter`` buffers the insights
+together with their through-table rows (the UUID primary key is assigned
+in Python, so links can be built before anything is saved) and writes each
+buffer with three ``bulk_create`` calls. Used as a context manager it holds
+one database transaction for the whole job, flushing every ``batch_size``
+insights and once more on exit.
+"""
+import sys
+from django.conf import settings
+from django.db import transaction as db_transaction
+from .models import AIInsight
+
+class BulkInsightWriter:
+    """Collect insights and their links, then write them with bulk_create"""
+
+    def __init__(self, batch_size=None):
+        self.batch_size = batch_size or settings.INSIGHT_WRITE_BATCH_SIZE
+        self.written = 0
+        self._insights = []
+        self._transaction_links = []
+        self._document_links = []
+        self._atomic = None
+
+    def add(self, user_id, insight_type, title, description, priority,
+            transaction_ids=(), document_ids=(), **fields):
+        """Buffer one insight; extra ``fields`` are passed to the model"""
+        insight = AIInsight(
+            user_id=user_id,
+            insight_type=insight_type,
+            title=title,
+            description=description,
+            priority=priority,
+            **fields
+        )
+        self._insights.append(insight)
+        TransactionLink = AIInsight.related_transactions.through
+        DocumentLink = AIInsight.related_documents.through
+        self._transaction_links.extend(
+            TransactionLink(aiinsight_id=insight.id, transaction_id=txn_id) for txn_id in transaction_ids
+        )
+        self._document_links.extend(
+            DocumentLink(aiinsight_id=insight.id, document_id=doc_id) for doc_id in document_ids
+        )
+        if len(self._insights) >= self.batch_size:
+            self.flush()
+        return insight
+
+    def flush(self):
+        if not self._insights:
+            return
+        with db_transaction.atomic(savepoint=False):
+            AIInsight.objects.bulk_create(self._insights)
+            AIInsight.related_transactions.through.objects.bulk_create(self._transaction_links)
+            AIInsight.related_documents.through.objects.bulk_create(self._document_links)
+        self.written += len(self._insights)
+        self._insights, self._transaction_links, self._document_links = [], [], []
+
+    def __enter__(self):
+        self._atomic = db_transaction.atomic()
+        self._atomic.__enter__()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        try:
+            if exc_type is None:
+                self.flush()
+        except BaseException:
+            self._atomic.__exit__(*sys.exc_info())
+            raise
+        return self._atomic.__exit__(exc_type, exc, tb)
@@ -0,0 +1,127 @@
+"""Per-stage timing for the document pipeline.
+
+Code paths wrap their work in ``stage(...)``. When a ``PipelineTrace`` is
+active in the current context, each stage records wall time, CPU time, page
+count and input size; without an active trace ``stage`` costs next to nothing.
+"""
+from contextlib import contextmanager
+import contextvars
+import resource
+import time
+import logging
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+_current_trace = contextvars.ContextVar('pipeline_trace', default=None)
+
+PERCENTILES = (50, 95, 99)
+
+def _child_cpu_seconds():
+    usage = resource.getrusage(resource.RUSAGE_CHILDREN)
+    return usage.ru_utime + usage.ru_stime
+
+class PipelineTrace:
+    """Collects stage metrics for one document run"""
+
+    def __init__(self, on_stage=None, on_stage_end=None):
+        self.stages = []
+        self.on_stage = on_stage
+        self.on_stage_end = on_stage_end
+        self.wall_ms = None
+        self._token = None
+        self._started = None
+
+    def __enter__(self):
+        self._token = _current_trace.set(self)
+        self._started = time.perf_counter()
+        self.wall_ms = None
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.wall_ms = (time.perf_counter() - self._started) * 1000
+        _current_trace.reset(self._token)
+        return False
+
+    def started(self, name):
+        if self.on_stage:
+            try:
+                self.on_stage(name)
+            except Exception as e:
+                logger.error(f"Error in stage callback for {name}: {e}")
+
+    def finished(self, metrics):
+        self.stages.append(metrics)
+        if self.on_stage_end:
+            try:
+                self.on_stage_end(metrics)
+            except Exception as e:
+                logger.error(f"Error in stage end callback for {metrics['stage']}: {e}")
+
+    def total_wall_ms(self):
+        """Wall time of the traced block (so far, while it is open).
+
+        Stages nest (``tesseract`` inside ``pdf_pages``), so adding up their
+        times would count the nested ones twice.
+        """
+        if self.wall_ms is not None:
+            return self.wall_ms
+        if self._started is None:
+            return 0.0
+        return (time.perf_counter() - self._started) * 1000
+
+def current_trace():
+    return _current_trace.get()
+
+@contextmanager
+def stage(name, page_count=None, input_bytes=None, **details):
+    """Time a pipeline stage; the yielded dict can be updated with counts found mid-stage"""
+    metrics = {
+        'stage': name,
+        'page_count': page_count,
+        'input_bytes': input_bytes,
+        'details': details,
+    }
+    trace = _current_trace.get()
+    if trace is None:
+        yield metrics
+        return
+
+    trace.started(name)
+    wall_start = time.perf_counter()
+    cpu_start = time.thread_time()
+    # Tesseract runs as a child process, so its CPU time only shows up in the
+    # children's rusage. That counter is process-wide and may include other
+    # threads' children when stages overlap.
+    child_start = _child_cpu_seconds()
+    try:
+        yield metrics
+    finally:
+        metrics['wall_time_ms'] = (time.perf_counter() - wall_start) * 1000
+        metrics['cpu_time_ms'] = (
+            (time.thread_time() - cpu_start) + (_child_cpu_seconds() - child_start)
+        ) * 1000
+        trace.finished(metrics)
+
+def summarize_stage_timings(rows):
+    """Compute per-stage percentiles from (stage, wall_ms, cpu_ms) rows"""
+    by_stage = {}
+    for stage_name, wall_ms, cpu_ms in rows:
+        entry = by_stage.setdefault(stage_name, ([], []))
+        entry[0].append(wall_ms)
+        entry[1].append(cpu_ms)
+
+    summary = {}
+    for stage_name, (wall, cpu) in by_stage.items():
+        wall = np.asarray(wall, dtype=float)
+        cpu = np.asarray(cpu, dtype=float)
+        wall_p = np.percentile(wall, PERCENTILES)
+        cpu_p = np.percentile(cpu, PERCENTILES)
+        summary[stage_name] = {
+            'count': int(wall.size),
+            'wall_ms': {f'p{p}': round(float(v), 2) for p, v in zip(PERCENTILES, wall_p)},
+            'cpu_ms': {f'p{p}': round(float(v), 2) for p, v in zip(PERCENTILES, cpu_p)},
+            'wall_ms_mean': round(float(wall.mean()), 2),
+        }
+    return summary
@@ -0,0 +1,331 @@
+"""Line-item table extraction from positioned words.
+
+Works on word boxes from either pdfplumber (``page.extract_words``) or
+Tesseract (``image_to_data``). Words are clustered into rows by their
+vertical centres and into columns by the header row ("Description", "HSN",
+"Qty", "Rate", "Amount", "GST" ...), both with numpy on whole-page arrays, so
+the cost stays linear in the word count on 100+ line invoices.
+"""
+import numpy as np
+import re
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Checked in order, so "Unit Price" is a rate before "Total" makes it an amount
+HEADER_PATTERNS = [
+    ('hsn', re.compile(r'\b(?:hsn|sac)\b', re.IGNORECASE)),
+    ('qty', re.compile(r'\b(?:qty|quantity|nos|units?)\b(?!\s*price)', re.IGNORECASE)),
+    ('rate', re.compile(r'\b(?:rate|price|unit\s*cost)\b', re.IGNORECASE)),
+    ('tax', re.compile(r'\b(?:gst|cgst|sgst|igst|tax)\b', re.IGNORECASE)),
+    ('amount', re.compile(r'\b(?:amount|total|value)\b', re.IGNORECASE)),
+    ('description', re.compile(r'\b(?:description|item|items|particulars|product|services?|details)\b', re.IGNORECASE)),
+]
+
+# Rows starting like this close the item table
+TABLE_END = re.compile(
+    r'^(?:sub\s*-?\s*total|total|grand\s*total|net\s*(?:amount|payable)|cgst|sgst|igst|utgst|gst\b|'
+    r'tax(?:able)?\b|round(?:ing)?\s*off|amount\s+(?:in\s+words|chargeable|due))',
+    re.IGNORECASE
+)
+
+NUMBER = re.compile(r'-?\d[\d,]*(?:\.\d+)?')
+CURRENCY = re.compile(r'(?:₹|rs\.?|inr|\$)', re.IGNORECASE)
+
+FIELDS = ['description', 'hsn', 'qty', 'rate', 'amount', 'tax', 'tax_rate']
+
+def words_from_pdfplumber(words):
+    """Column arrays from ``page.extract_words()`` output"""
+    return {
+        'text': [w['text'] for w in words],
+        'x0': np.array([w['x0'] for w in words], dtype=float),
+        'x1': np.array([w['x1'] for w in words], dtype=float),
+        'top': np.array([w['top'] for w in words], dtype=float),
+        'bottom': np.array([w['bottom'] for w in words], dtype=float),
+    }
+
+def words_from_ocr_data(data, min_confidence=0):
+    """Column arrays from ``image_to_data`` dict output, dropping empty and rejected boxes"""
+    text = np.array([str(t).strip() for t in data['text']], dtype=object)
+    conf = np.array([float(c) for c in data['conf']], dtype=float)
+    keep = (text != '') & (conf >= min_confidence)
+    left = np.asarray(data['left'], dtype=float)[keep]
+    top = np.asarray(data['top'], dtype=float)[keep]
+    return {
+        'text': list(text[keep]),
+        'x0': left,
+        'x1': left + np.asarray(data['width'], dtype=float)[keep],
+        'top': top,
+        'bottom': top + np.asarray(data['height'], dtype=float)[keep],
+    }
+
+def text_from_ocr_data(data):
+    """Rebuild plain text from ``image_to_data`` output, one line per Tesseract line"""
+    lines = []
+    current_key = None
+    for i, word in enumerate(data['text']):
+        word = str(word).strip()
+        if not word:
+            continue
+        key = (data['block_num'][i], data['par_num'][i], data['line_num'][i])
+        if key != current_key:
+            if current_key is not None and key[0] != current_key[0]:
+                lines.append('')
+            lines.append(word)
+            current_key = key
+        else:
+            lines[-1] += ' ' + word
+    return "\n".join(lines)
+
+def parse_number(cell):
+    if not cell:
+        return None
+    match = NUMBER.search(CURRENCY.sub('', cell))
+    if not match:
+        return None
+    try:
+        return float(match.group(0).replace(',', ''))
+    except ValueError:
+        return None
+
+def cluster_rows(words):
+    """Row id per word from gaps between sorted vertical centres"""
+    count = len(words['text'])
+    if not count:
+        return np.zeros(0, dtype=int)
+    centre = (words['top'] + words['bottom']) / 2
+    height = words['bottom'] - words['top']
+    tolerance = max(float(np.median(height)) * 0.5, 1.0)
+    order = np.argsort(centre, kind='stable')
+    breaks = np.diff(centre[order]) > tolerance
+    row_of_sorted = np.concatenate([[0], np.cumsum(breaks)])
+    rows = np.empty(count, dtype=int)
+    rows[order] = row_of_sorted
+    return rows
+
+def _phrases(indexes, words, gap):
+    """Merge horizontally adjacent words of one row into phrases"""
+    indexes = sorted(indexes, key=lambda i: words['x0'][i])
+    phrases = []
+    for i in indexes:
+        if phrases and words['x0'][i] - phrases[-1]['x1'] <= gap:
+            phrases[-1]['text'] += ' ' + words['text'][i]
+            phrases[-1]['x1'] = max(phrases[-1]['x1'], words['x1'][i])
+        else:
+            phrases.append({'text': words['text'][i], 'x0': words['x0'][i], 'x1': words['x1'][i]})
+    return phrases
+
+def detect_header(row_indexes, words, gap):
+    """Header columns as (name, x0, x1) if this row is an item table header"""
+    columns = []
+    for phrase in _phrases(row_indexes, words, gap):
+        for name, pattern in HEADER_PATTERNS:
+            if pattern.search(phrase['text']):
+                if name not in [column[0] for column in columns]:
+                    columns.append((name, phrase['x0'], phrase['x1']))
+                break
+    names = [column[0] for column in columns]
+    if len(columns) < 2 or ('amount' not in names and 'description' not in names):
+        return None
+    return columns
+
+def occupied_segments(x0, x1, gap):
+    """Horizontal runs covered by at least one word, bridging gaps up to ``gap``"""
+    if not len(x0):
+        return np.zeros((0, 2))
+    offset = np.floor(x0.min())
+    start = np.floor(x0 - offset).astype(int)
+    stop = np.ceil(x1 - offset).astype(int)
+    coverage = np.zeros(stop.max() + 2, dtype=int)
+    np.add.at(coverage, start, 1)
+    np.add.at(coverage, stop, -1)
+    filled = np.cumsum(coverage) > 0
+    edges = np.diff(np.concatenate([[0], filled.astype(int), [0]]))
+    runs = np.column_stack([np.flatnonzero(edges == 1), np.flatnonzero(edges == -1)]).astype(float)
+    # Merge runs separated by less than a word space
+    starts = np.flatnonzero(np.concatenate([[True], runs[1:, 0] - runs[:-1, 1] > gap]))
+    merged = np.column_stack([
+        np.minimum.reduceat(runs[:, 0], starts),
+        np.maximum.reduceat(runs[:, 1], starts),
+    ])
+    return merged + offset
+
+def fit_columns(header, x0, x1, gap):
+    """Column boundaries from the header and the whitespace between body words.
+
+    Text columns are usually left aligned and numbers right aligned, so body
+    values rarely sit under the middle of their header. Each run of occupied
+    x range in the table body is assigned to the header it overlaps most (or
+    the nearest one) and boundaries go in the gaps between columns.
+    """
+    header = sorted(header, key=lambda column: column[1])
+    names = [column[0] for column in header]
+    head_x0 = np.array([column[1] for column in header])
+    head_x1 = np.array([column[2] for column in header])
+    left, right = head_x0.copy(), head_x1.copy()
+
+    segments = occupied_segments(x0, x1, gap)
+    if len(segments):
+        overlap = (np.minimum(segments[:, 1, None], head_x1[None, :])
+                   - np.maximum(segments[:, 0, None], head_x0[None, :]))
+        centre_distance = np.abs(
+            (segments[:, 0, None] + segments[:, 1, None]) / 2 - (head_x0 + head_x1)[None, :] / 2
+        )
+        owner = np.where(overlap.max(axis=1) > 0, overlap.argmax(axis=1), centre_distance.argmin(axis=1))
+        for column in range(len(names)):
+            owned = segments[owner == column]
+            if len(owned):
+                left[column] = min(left[column], owned[:, 0].min())
+                right[column] = max(right[column], owned[:, 1].max())
+
+    boundaries = []
+    for column in range(len(names) - 1):
+        if right[column] < left[column + 1]:
+            boundaries.append((right[column] + left[column + 1]) / 2)
+        else:
+            # Columns touch; fall back to the gap between the headers
+            boundaries.append((head_x1[column] + head_x0[column + 1]) / 2)
+    return {'names': names, 'boundaries': np.array(boundaries)}
+
+class LineItemExtractor:
+    """Incremental line-item extraction, one page of words at a time.
+
+    Only the items found so far and the current table's columns are kept
+    between pages, so word boxes can be dropped as soon as their page has
+    been read. A table that runs onto the next page without a repeated
+    header keeps the previous page's columns.
+    """
+
+    def __init__(self):
+        self.items = {field: [] for field in FIELDS}
+        self.columns = None
+        self.pages = 0
+
+    def add_page(self, words):
+        self.pages += 1
+        if not len(words['text']):
+            return
+        rows = cluster_rows(words)
+        gap = float(np.median(words['bottom'] - words['top']))
+        order = np.lexsort((words['x0'], rows))
+        _, starts = np.unique(rows[order], return_index=True)
+        page_rows = np.split(order, starts[1:])
+
+        # Rows without an amount continue the item above them, but never one
+        # from a previous page or table: a continuation page's letterhead
+        # would otherwise be appended to the last item's description
+        can_extend = False
+        position = 0
+        while position < len(page_rows):
+            header = None
+            if self.columns is None:
+                header = detect_header(page_rows[position], words, gap)
+                position += 1
+                if header is None:
+                    continue
+                can_extend = False
+
+            table = []
+            while position < len(page_rows):
+                row_text = ' '.join(words['text'][i] for i in page_rows[position])
+                if TABLE_END.match(row_text.strip()):
+                    break
+                table.append(page_rows[position])
+                position += 1
+            ended = position < len(page_rows)
+
+            if header is not None:
+                body = np.concatenate(table) if table else np.zeros(0, dtype=int)
+                self.columns = fit_columns(header, words['x0'][body], words['x1'][body], gap / 2)
+            for row_indexes in table:
+                if _add_row(self.items, row_indexes, words, self.columns, can_extend):
+                    can_extend = True
+            if ended:
+                self.columns = None
+
+def extract_line_items(pages):
+    """Extract item columns from a sequence of per-page word arrays.
+
+    Returns a dict of equal-length lists keyed by ``FIELDS``.
+    """
+    extractor = LineItemExtractor()
+    for words in pages:
+        extractor.add_page(words)
+    return extractor.items
+
+def _add_row(items, row_indexes, words, columns, can_extend=True):
+    """Add the row as an item, or fold it into the previous one; True if an item was added"""
+    centres = (words['x0'][row_indexes] + words['x1'][row_indexes]) / 2
+    column_ids = np.searchsorted(columns['boundaries'], centres)
+    cells = {}
+    for i, column_id in zip(row_indexes, column_ids):
+        name = columns['names'][column_id]
+        cells[name] = f"{cells[name]} {words['text'][i]}" if name in cells else words['text'][i]
+
+    amount = parse_number(cells.get('amount'))
+    if amount is None and 'amount' in columns['names']:
+        # Wrapped description or part number under the previous item
+        if can_extend and items['description']:
+            _extend_previous(items, cells)
+        return False
+
+    tax_cell = cells.get('tax', '')
+    row = {
+        'description': cells.get('description', '').strip(),
+        'hsn': cells.get('hsn', '').strip(),
+        'qty': parse_number(cells.get('qty')),
+        'rate': parse_number(cells.get('rate')),
+        'amount': amount,
+        'tax': None if '%' in tax_cell else parse_number(tax_cell),
+        'tax_rate': parse_number(tax_cell) if '%' in tax_cell else None,
+    }
+    if not row['description'] and row['amount'] is None:
+        return False
+    for field in FIELDS:
+        items[field].append(row[field])
+    return True
+
+def _extend_previous(items, cells):
+    text = cells.get('description', '').strip()
+    if text:
+        items['description'][-1] = f"{items['description'][-1]} {text}".strip()
+    for field in ['qty', 'rate', 'tax']:
+        if items[field][-1] is None:
+            items[field][-1] = parse_number(cells.get(field))
+    if not items['hsn'][-1] and cells.get('hsn'):
+        items['hsn'][-1] = cells['hsn'].strip()
+
+def items_to_rows(items):
+    """Per-item dicts for ``extracted_data['items']``"""
+    return [dict(zip(FIELDS, values)) for values in zip(*(items[field] for field in FIELDS))]
+
+def synthetic_invoice_words(lines, hsn=True):
+    """Word arrays for a generated invoice page with ``lines`` items, for tests and benchmarks"""
+    header = [('Description', 40), ('HSN', 260), ('Qty', 330), ('Rate', 390), ('GST', 460), ('Amount', 530)]
+    if not hsn:
+        header = [column for column in header if column[0] != 'HSN']
+    rows = [[(text, x) for text, x in header]]
+    for i in range(lines):
+        qty, rate = i % 7 + 1, 100 + i
+        row = [('Item', 40), (f'{i + 1:04d}', 70), ('widget', 110)]
+        if hsn:
+            row.append((f'{8471 + i % 5}', 260))
+        row += [(str(qty), 335), (f'{rate:,.2f}', 385), ('18%', 462), (f'{qty * rate:,.2f}', 528)]
+        rows.append(row)
+    rows.append([('Subtotal', 40), ('0.00', 528)])
+
+    text, x0, x1, top, bottom = [], [], [], [], []
+    for row_number, row in enumerate(rows):
+        for word, x in row:
+            text.append(word)
+            x0.append(x)
+            x1.append(x + 6 * len(word))
+            top.append(40 + row_number * 14)
+            bottom.append(50 + row_number * 14)
+    return {
+        'text': text,
+        'x0': np.array(x0, dtype=float),
+        'x1': np.array(x1, dtype=float),
+        'top': np.array(top, dtype=float),
+        'bottom': np.array(bottom, dtype=float),
+    }
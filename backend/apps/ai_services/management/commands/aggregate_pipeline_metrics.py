@@ -0,0 +1,22 @@
+from django.core.management.base import BaseCommand
+from apps.ai_services.tasks import aggregate_pipeline_metrics
+
+class Command(BaseCommand):
+    help = 'Aggregate document pipeline stage timings into p50/p95/p99 per stage'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--days', type=int, default=7,
+                            help='Only include stage timings recorded in the last N days')
+
+    def handle(self, *args, **options):
+        metrics = aggregate_pipeline_metrics(days=options['days'])
+
+        for stage_name, summary in sorted(metrics['stages'].items()):
+            wall = summary['wall_ms']
+            self.stdout.write(
+                f"{stage_name:<20} n={summary['count']:<6} "
+                f"p50={wall['p50']:.1f}ms p95={wall['p95']:.1f}ms p99={wall['p99']:.1f}ms"
+            )
+        self.stdout.write(self.style.SUCCESS(
+            f"Aggregated {len(metrics['stages'])} stages over {options['days']} days"
+        ))
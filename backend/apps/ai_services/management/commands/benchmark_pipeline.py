@@ -0,0 +1,87 @@
+import json
+from django.core.management.base import BaseCommand, CommandError
+from apps.ai_services.benchmark import (
+    run_benchmark, compare_reports, sweep_preprocessing, compare_ocr_engines,
+    benchmark_line_items
+)
+
+class Command(BaseCommand):
+    help = 'Benchmark invoice extraction on the bundled sample invoices and emit a JSON report'
+
+    def add_arguments(self, parser):
+        parser.add_argument('files', nargs='*',
+                            help='Files to benchmark (defaults to the bundled samples)')
+        parser.add_argument('--warm-runs', type=int, default=3,
+                            help='Warm runs per file after the cold run')
+        parser.add_argument('--pool-sizes', default='1,2',
+                            help='Comma separated worker pool sizes for the throughput test')
+        parser.add_argument('--pool-docs', type=int, default=None,
+                            help='Documents per throughput run (default: 4x the file count)')
+        parser.add_argument('--no-ner', action='store_true',
+                            help='Skip the NER stage to isolate OCR and regex timings')
+        parser.add_argument('--ocr-mode', choices=['full', 'roi'],
+                            help='Override settings.OCR_MODE for image files')
+        parser.add_argument('--preprocess-sweep', action='store_true',
+                            help='Also OCR images with each preprocessing stage switched off')
+        parser.add_argument('--engines',
+                            help='Comma separated OCR engines to time against each other, '
+                                 'e.g. subprocess,tesserocr')
+        parser.add_argument('--line-items', action='store_true',
+                            help='Also time line-item extraction, including 100+ line tables')
+        parser.add_argument('--output', help='Write the JSON report to this path')
+        parser.add_argument('--compare', help='Baseline JSON report to compare against')
+        parser.add_argument('--threshold', type=float, default=0.2,
+                            help='Allowed slowdown before a metric counts as a regression')
+
+    def handle(self, *args, **options):
+        try:
+            pool_sizes = [int(size) for size in options['pool_sizes'].split(',') if size.strip()]
+        except ValueError:
+            raise CommandError('--pool-sizes must be a comma separated list of integers')
+
+        report = run_benchmark(
+            files=options['files'] or None,
+            warm_runs=options['warm_runs'],
+            pool_sizes=pool_sizes,
+            pool_docs=options['pool_docs'],
+            use_ner=not options['no_ner'],
+            ocr_mode=options['ocr_mode'],
+            log=self.stdout.write,
+        )
+        if options['preprocess_sweep']:
+            report['preprocessing'] = sweep_preprocessing(
+                files=options['files'] or None,
+                runs=max(options['warm_runs'], 1),
+                log=self.stdout.write,
+            )
+        if options['engines']:
+            report['ocr_engines'] = compare_ocr_engines(
+                files=options['files'] or None,
+                engines=[name.strip() for name in options['engines'].split(',') if name.strip()],
+                runs=max(options['warm_runs'], 1),
+                log=self.stdout.write,
+            )
+        if options['line_items']:
+            report['line_items'] = benchmark_line_items(
+                files=options['files'] or None,
+                runs=max(options['warm_runs'], 1),
+                log=self.stdout.write,
+            )
+
+        output = json.dumps(report, indent=2)
+        if options['output']:
+            with open(options['output'], 'w') as f:
+                f.write(output)
+            self.stdout.write(self.style.SUCCESS(f"Report written to {options['output']}"))
+        else:
+            self.stdout.write(output)
+
+        if options['compare']:
+            with open(options['compare']) as f:
+                baseline = json.load(f)
+            regressions = compare_reports(baseline, report, options['threshold'])
+            if regressions:
+                for regression in regressions:
+                    self.stderr.write(regression)
+                raise CommandError(f"{len(regressions)} benchmark regressions against {options['compare']}")
+            self.stdout.write(self.style.SUCCESS('No regressions against baseline'))
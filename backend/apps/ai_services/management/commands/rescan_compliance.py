@@ -0,0 +1,24 @@
+from django.core.management.base import BaseCommand
+from apps.ai_services.tasks import rescan_compliance
+
+class Command(BaseCommand):
+    help = 'Re-run the compliance rules over stored transactions, replacing their analysis insights'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--user', dest='user_id', default=None,
+                            help='Only re-scan this user\'s transactions (default: all users)')
+        parser.add_argument('--chunk-size', type=int, default=5000,
+                            help='Transactions analyzed per batch')
+        parser.add_argument('--dry-run', action='store_true',
+                            help='Report what would be flagged without writing anything')
+
+    def handle(self, *args, **options):
+        summary = rescan_compliance(
+            user_id=options['user_id'],
+            chunk_size=options['chunk_size'],
+            dry_run=options['dry_run'],
+        )
+        self.stdout.write(self.style.SUCCESS(
+            f"Scanned {summary['scanned']} transactions: {summary['flagged']} flagged, "
+            f"{summary['insights']} insights{' (dry run)' if options['dry_run'] else ''}"
+        ))
@@ -95,6 +95,33 @@ class AIInsight(models.Model):
     class Meta:
         db_table = 'ai_insights'
         ordering = ['-created_at']
+        indexes = [
+            # Insight list: undismissed insights, newest first
+            models.Index(fields=['user', 'is_dismissed', '-created_at']),
+            # Type and priority filters and the analytics counts
+            models.Index(fields=['user', 'insight_type', 'priority']),
+        ]
     
     def __str__(self):
-        return f"{self.title} ({self.priority})"
\ No newline at end of file
+        return f"{self.title} ({self.priority})"
+
+class DocumentStageMetric(models.Model):
+    """Timing of one document pipeline stage (OCR, NER, regex, summary, ...)"""
+    document = models.ForeignKey('documents.Document', on_delete=models.CASCADE, related_name='stage_metrics')
+    stage = models.CharField(max_length=50)
+    wall_time_ms = models.FloatField()
+    cpu_time_ms = models.FloatField()
+    page_count = models.IntegerField(null=True, blank=True)
+    input_bytes = models.BigIntegerField(null=True, blank=True)
+    details = models.JSONField(default=dict, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    
+    class Meta:
+        db_table = 'document_stage_metrics'
+        ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['created_at', 'stage']),
+        ]
+    
+    def __str__(self):
+        return f"{self.stage}: {self.wall_time_ms:.0f}ms"
@@ -0,0 +1,152 @@
+"""OCR engines behind ``OCRProcessor.extract_text``.
+
+``subprocess`` is pytesseract: every call writes a temp image, starts the
+``tesseract`` binary and reloads the traineddata, which costs more than the
+recognition itself on small receipts. ``tesserocr`` keeps one initialised
+Tesseract API handle per worker thread and feeds it images in memory. It is an
+optional dependency; when it cannot be imported the subprocess engine is used.
+"""
+from django.conf import settings
+from PIL import Image
+import numpy as np
+import pytesseract
+import threading
+import os
+import re
+import logging
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_CONFIG = '--oem 3 --psm 6'
+
+def _to_pil(image):
+    if isinstance(image, np.ndarray):
+        if image.ndim == 3:
+            # OpenCV images are BGR
+            image = image[:, :, ::-1]
+        return Image.fromarray(image)
+    return image
+
+class SubprocessTesseractEngine:
+    name = 'subprocess'
+
+    def __init__(self, config=DEFAULT_CONFIG, lang='eng'):
+        self.config = config
+        self.lang = lang
+
+    def image_to_string(self, image):
+        return pytesseract.image_to_string(image, lang=self.lang, config=self.config)
+
+    def image_to_data(self, image):
+        return pytesseract.image_to_data(image, lang=self.lang, config=self.config,
+                                         output_type=pytesseract.Output.DICT)
+
+class TesserocrEngine:
+    """In-process Tesseract with a persistent API handle per thread.
+
+    Handles are not shared between threads, and a forked worker builds its own
+    instead of reusing the parent's.
+    """
+    name = 'tesserocr'
+
+    def __init__(self, config=DEFAULT_CONFIG, lang='eng', tessdata_path=None):
+        import tesserocr
+        self._tesserocr = tesserocr
+        self.config = config
+        self.lang = lang
+        self.tessdata_path = tessdata_path or getattr(settings, 'TESSDATA_PATH', None)
+        self.psm, self.oem = self._parse_config(config)
+        self._local = threading.local()
+        # Load the model now so missing traineddata surfaces at start-up
+        self._api()
+
+    def _parse_config(self, config):
+        psm = re.search(r'--psm\s+(\d+)', config)
+        oem = re.search(r'--oem\s+(\d+)', config)
+        return (
+            int(psm.group(1)) if psm else self._tesserocr.PSM.AUTO,
+            int(oem.group(1)) if oem else self._tesserocr.OEM.DEFAULT,
+        )
+
+    def _api(self):
+        api = getattr(self._local, 'api', None)
+        if api is None or self._local.pid != os.getpid():
+            kwargs = {'lang': self.lang, 'psm': self.psm, 'oem': self.oem}
+            if self.tessdata_path:
+                kwargs['path'] = self.tessdata_path
+            api = self._tesserocr.PyTessBaseAPI(**kwargs)
+            self._local.api = api
+            self._local.pid = os.getpid()
+        return api
+
+    def image_to_string(self, image):
+        api = self._api()
+        try:
+            api.SetImage(_to_pil(image))
+            return api.GetUTF8Text()
+        finally:
+            # Drop the image and recognition results but keep the loaded model
+            api.Clear()
+
+    def image_to_data(self, image):
+        """Word boxes in the same dict layout as ``pytesseract.image_to_data``"""
+        tesserocr = self._tesserocr
+        RIL = tesserocr.RIL
+        data = {key: [] for key in ['block_num', 'par_num', 'line_num', 'word_num',
+                                    'left', 'top', 'width', 'height', 'conf', 'text']}
+        api = self._api()
+        try:
+            api.SetImage(_to_pil(image))
+            api.Recognize()
+            block = par = line = word = 0
+            for result in tesserocr.iterate_level(api.GetIterator(), RIL.WORD):
+                if result.IsAtBeginningOf(RIL.BLOCK):
+                    block, par, line = block + 1, 0, 0
+                if result.IsAtBeginningOf(RIL.PARA):
+                    par, line = par + 1, 0
+                if result.IsAtBeginningOf(RIL.TEXTLINE):
+                    line, word = line + 1, 0
+                word += 1
+                box = result.BoundingBox(RIL.WORD)
+                if box is None:
+                    continue
+                x1, y1, x2, y2 = box
+                data['block_num'].append(block)
+                data['par_num'].append(par)
+                data['line_num'].append(line)
+                data['word_num'].append(word)
+                data['left'].append(x1)
+                data['top'].append(y1)
+                data['width'].append(x2 - x1)
+                data['height'].append(y2 - y1)
+                data['conf'].append(result.Confidence(RIL.WORD))
+                data['text'].append(result.GetUTF8Text(RIL.WORD) or '')
+            return data
+        finally:
+            api.Clear()
+
+    def close(self):
+        api = getattr(self._local, 'api', None)
+        if api is not None:
+            api.End()
+            self._local.api = None
+
+ENGINES = {
+    SubprocessTesseractEngine.name: SubprocessTesseractEngine,
+    TesserocrEngine.name: TesserocrEngine,
+}
+
+def get_ocr_engine(name=None, config=DEFAULT_CONFIG):
+    """Build the configured engine, falling back to the subprocess engine"""
+    name = name or getattr(settings, 'OCR_ENGINE', SubprocessTesseractEngine.name)
+    lang = getattr(settings, 'OCR_LANGUAGE', 'eng')
+    engine_class = ENGINES.get(name)
+    if engine_class is None:
+        raise ValueError(f"Unknown OCR engine: {name}")
+    try:
+        return engine_class(config=config, lang=lang)
+    except Exception as e:
+        if engine_class is SubprocessTesseractEngine:
+            raise
+        logger.warning(f"OCR engine {name} unavailable, using subprocess Tesseract: {e}")
+        return SubprocessTesseractEngine(config=config, lang=lang)
@@ -0,0 +1,34 @@
+"""Page-at-a-time PDF text extraction.
+
+pdfplumber caches every parsed character and layout object on its ``Page``
+until the page is closed, so walking ``pdf.pages`` inside one ``with`` block
+keeps the whole document's layout alive. ``iter_pdf_text`` yields one page's
+text at a time and releases that page's caches before moving on, so peak
+memory tracks the largest page rather than the page count.
+"""
+import pdfplumber
+import logging
+
+logger = logging.getLogger(__name__)
+
+def iter_pdf_text(file_path, pages=None, stop=None, on_page=None, x_tolerance=2, y_tolerance=2):
+    """Yield ``(page_index, text)`` for each page, or for ``pages`` if given.
+
+    ``stop(page_index, text)`` is called after each page is yielded; returning
+    True ends the iteration without parsing the remaining pages.
+    ``on_page(page_index, page)`` runs before the page is released, for
+    callers that need more than the text (e.g. word boxes).
+    """
+    with pdfplumber.open(file_path) as pdf:
+        indexes = range(len(pdf.pages)) if pages is None else pages
+        for index in indexes:
+            page = pdf.pages[index]
+            try:
+                text = page.extract_text(x_tolerance=x_tolerance, y_tolerance=y_tolerance) or ''
+                if on_page is not None:
+                    on_page(index, page)
+            finally:
+                page.close()
+            yield index, text
+            if stop is not None and stop(index, text):
+                return
@@ -0,0 +1,103 @@
+"""Per-page triage of PDFs into text extraction or OCR.
+
+pdfplumber's layout analysis is the slowest way to find out that a page has
+no text layer. pdfium answers that from its character count and the image
+objects on the page in a fraction of the time, so every page is routed first:
+
+* ``text``  - enough characters in the text layer, extract with pdfplumber
+* ``ocr``   - little or no text but images covering the page, render and OCR
+* ``empty`` - neither, skipped
+
+The routing is stored on the document and reused when it is reprocessed.
+"""
+from django.conf import settings
+import pypdfium2 as pdfium
+import pypdfium2.raw as pdfium_c
+import os
+import logging
+
+logger = logging.getLogger(__name__)
+
+ROUTING_VERSION = 1
+
+def _image_coverage(page, page_area):
+    covered = 0.0
+    width, height = page.get_size()
+    for obj in page.get_objects(filter=(pdfium_c.FPDF_PAGEOBJ_IMAGE,)):
+        # get_pos() was renamed get_bounds() in pypdfium2 5
+        bounds = obj.get_bounds if hasattr(obj, 'get_bounds') else obj.get_pos
+        left, bottom, right, top = bounds()
+        # Clip to the page; scanners sometimes place images past the edges
+        left, right = max(left, 0), min(right, width)
+        bottom, top = max(bottom, 0), min(top, height)
+        if right > left and top > bottom:
+            covered += (right - left) * (top - bottom)
+    return min(covered / page_area, 1.0) if page_area else 0.0
+
+def triage_pdf(file_path, min_chars=None, min_image_coverage=None):
+    """Route every page of a PDF; returns the routing dict stored on the document"""
+    config = getattr(settings, 'PDF_TRIAGE', {})
+    min_chars = min_chars if min_chars is not None else config.get('min_chars', 20)
+    if min_image_coverage is None:
+        min_image_coverage = config.get('min_image_coverage', 0.1)
+
+    pages, chars, coverage = [], [], []
+    pdf = pdfium.PdfDocument(file_path)
+    try:
+        for index in range(len(pdf)):
+            page = pdf[index]
+            try:
+                textpage = page.get_textpage()
+                try:
+                    char_count = textpage.count_chars()
+                finally:
+                    textpage.close()
+                width, height = page.get_size()
+                image_coverage = _image_coverage(page, width * height)
+            finally:
+                page.close()
+
+            if char_count >= min_chars:
+                route = 'text'
+            elif image_coverage >= min_image_coverage:
+                route = 'ocr'
+            else:
+                route = 'empty'
+            pages.append(route)
+            chars.append(char_count)
+            coverage.append(round(image_coverage, 3))
+    finally:
+        pdf.close()
+
+    return {
+        'version': ROUTING_VERSION,
+        'file_size': os.path.getsize(file_path),
+        'pages': pages,
+        'chars': chars,
+        'image_coverage': coverage,
+    }
+
+def routing_is_valid(routing, file_path):
+    """A cached routing is reused only for the same triage rules and file"""
+    return bool(
+        routing
+        and routing.get('version') == ROUTING_VERSION
+        and routing.get('file_size') == os.path.getsize(file_path)
+        and routing.get('pages')
+    )
+
+def render_pdf_pages(file_path, indexes, dpi=300):
+    """Yield (index, grayscale numpy array) for the given pages, for OCR"""
+    pdf = pdfium.PdfDocument(file_path)
+    try:
+        for index in indexes:
+            page = pdf[index]
+            try:
+                bitmap = page.render(scale=dpi / 72, grayscale=True)
+                # Copy out of pdfium's buffer before the bitmap is released
+                image = bitmap.to_numpy().copy()
+            finally:
+                page.close()
+            yield index, image.reshape(image.shape[:2])
+    finally:
+        pdf.close()
@@ -1,5 +1,8 @@
 from rest_framework import serializers
+from django.db.models import Count, OuterRef, Subquery
+from django.db.models.functions import Coalesce
 from .models import ChatSession, ChatMessage, AIInsight, AIModel
+from taxora.fieldsets import ValuesListSerializer
 
 class ChatMessageSerializer(serializers.ModelSerializer):
     class Meta:
@@ -34,6 +37,29 @@ class AIInsightSerializer(serializers.ModelSerializer):
                  'confidence_score', 'ai_model_name', 'created_at', 'expires_at']
         read_only_fields = ['id', 'confidence_score', 'ai_model_name', 'created_at']
 
+def _link_count(through):
+    """Number of ``through`` rows pointing at the outer insight, as a subquery"""
+    counts = (
+        through.objects.filter(aiinsight_id=OuterRef('pk'))
+        .order_by()
+        .values('aiinsight_id')
+        .annotate(total=Count('pk'))
+        .values('total')
+    )
+    return Coalesce(Subquery(counts), 0)
+
+class AIInsightListSerializer(ValuesListSerializer):
+    """Insight list rows with the relation counts computed in the same query"""
+    fields = {
+        'id': None, 'insight_type': None, 'title': None, 'description': None, 'priority': None,
+        'action_required': None, 'is_read': None, 'is_dismissed': None,
+        'related_transaction_count': _link_count(AIInsight.related_transactions.through),
+        'related_document_count': _link_count(AIInsight.related_documents.through),
+        'confidence_score': None, 'ai_model_name': 'ai_model__name',
+        'created_at': None, 'expires_at': None,
+    }
+    nullable_relation_fields = {'ai_model_name'}
+
 class AIModelSerializer(serializers.ModelSerializer):
     class Meta:
         model = AIModel
@@ -1,124 +1,346 @@
+from django.conf import settings
 from django.utils import timezone
+from django.db import transaction as db_transaction
+from django.db.models import Q
 from datetime import timedelta
+from itertools import islice
 import logging
 from .ai_utils import invoice_extractor, ai_advisor, compliance_analyzer
-from .models import AIInsight
+from .instrumentation import PipelineTrace, stage, summarize_stage_timings
+from .deferred import CoalescingExecutor, DeferredTask
+from .insight_writer import BulkInsightWriter
+from .models import AIInsight, AIModel, DocumentStageMetric
 
 logger = logging.getLogger(__name__)
 
+PIPELINE_MODEL_NAME = 'document_pipeline'
+
 def process_document(document_id: str) -> None:
     """Process uploaded document with OCR and AI"""
+    from apps.documents.events import publish_document_status
+    trace = PipelineTrace()
     try:
         from apps.documents.models import Document
         document = Document.objects.get(id=document_id)
+        trace.on_stage = lambda name: publish_document_status(document, stage=name)
         
         # Update status to processing
         document.status = 'processing'
         document.save()
+        publish_document_status(document, progress=0.0)
         
-        # Extract data using AI
-        extracted_data = invoice_extractor.extract_invoice_data(document.file.path)
-        
-        if extracted_data:
-            document.extracted_text = extracted_data.get('raw_text', '')
-            document.extracted_data = extracted_data
-            document.confidence_score = extracted_data.get('confidence', 0.8)
+        with trace:
+            if document.category == 'bank_statement':
+                # Statement rows become transactions instead of invoice fields
+                publish_document_status(document, stage='importing', progress=0.1)
+                import_bank_statement(document, trace)
+            else:
+                # Extract data using AI
+                publish_document_status(document, stage='extracting', progress=0.1)
+                extracted_data, failure_reason, partial = extract_document_data(document, trace)
             
-            # Generate AI summary
-            summary = ai_advisor.get_tax_advice(
-                f"Summarize this {document.category} document",
-                {'document_data': extracted_data}
-            )
-            document.ai_summary = summary
+                if extracted_data:
+                    document.page_routing = extracted_data.pop('page_routing', document.page_routing)
+                    document.extracted_text = extracted_data.get('raw_text', '')
+                    document.extracted_data = extracted_data
+                    document.confidence_score = extracted_data.get('confidence', 0.8)
+                    document.failure_reason = ''
+                    document.populate_invoice_fields()
+                
+                    # Generate AI summary
+                    publish_document_status(document, stage='summarizing', progress=0.7)
+                    with stage('summary'):
+                        summary = ai_advisor.get_tax_advice(
+                            f"Summarize this {document.category} document",
+                            {'document_data': extracted_data}
+                        )
+                    document.ai_summary = summary
+                
+                    document.status = 'completed'
+                else:
+                    document.status = 'failed'
+                    document.failure_reason = failure_reason or 'No text could be extracted'
+                    if partial.get('raw_text'):
+                        # Keep what the worker got before it was stopped
+                        document.extracted_text = partial['raw_text']
+                        document.extracted_data = {'partial': True, **partial}
             
-            document.status = 'completed'
-        else:
-            document.status = 'failed'
-        
-        document.processed_at = timezone.now()
-        document.save()
+            document.processed_at = timezone.now()
+            document.save()
+            
+            # Link the invoice to its transaction when the match is unambiguous
+            if document.status == 'completed' and document.category != 'bank_statement':
+                publish_document_status(document, stage='matching', progress=0.9)
+                try:
+                    from apps.transactions.matching import match_documents_for_user
+                    with stage('matching'):
+                        match_documents_for_user(
+                            document.user,
+                            document_ids=[document.id],
+                            apply=True,
+                            auto_apply_score=settings.INVOICE_MATCH_AUTO_APPLY_SCORE
+                        )
+                except Exception as e:
+                    logger.error(f"Error matching document {document_id} to transactions: {e}")
         
-        logger.info(f"Successfully processed document {document_id}")
+        publish_document_status(document, progress=1.0)
+        logger.info(
+            f"Successfully processed document {document_id} in {trace.total_wall_ms():.0f}ms"
+        )
         
     except Exception as e:
         logger.error(f"Error processing document {document_id}: {e}")
         try:
             document = Document.objects.get(id=document_id)
             document.status = 'failed'
+            document.failure_reason = str(e)
             document.save()
+            publish_document_status(document, progress=1.0)
         except:
             pass
+    finally:
+        save_stage_metrics(document_id, trace.stages)
 
-def analyze_transaction_task(transaction_id: str) -> None:
-    """Analyze transaction for compliance and insights"""
+def extract_document_data(document, trace=None):
+    """Extract a document's data, in a sandboxed worker when isolation is on.
+
+    Returns ``(data, failure_reason, partial)``; ``partial`` holds what the
+    worker produced before it failed.
+    """
+    if not settings.EXTRACTION_ISOLATION:
+        data = invoice_extractor.extract_invoice_data(
+            document.file.path, page_routing=document.page_routing
+        )
+        return data, '', {}
+    
+    from .workers import get_extraction_pool
+    result = get_extraction_pool().extract(
+        document.file.path, page_routing=document.page_routing, trace=trace
+    )
+    if not result.ok:
+        logger.error(f"Extraction failed for document {document.id}: {result.failure_reason}")
+    elif result.data:
+        # Workers skip NER so they never load the model; the parent holds it
+        result.data['entities'] = invoice_extractor.ner.extract_entities(result.data.get('raw_text', ''))
+    return result.data, result.failure_reason, result.partial
+
+def import_bank_statement(document, trace=None):
+    """Create transactions from a statement's rows and record the import stats.
+
+    PDF statements are parsed in a sandboxed extraction worker when isolation
+    is on; its rows are written here a chunk at a time as they arrive.
+    """
+    from apps.transactions.statements import import_statement
+    parse = None
+    if settings.EXTRACTION_ISOLATION and document.file.path.lower().endswith('.pdf'):
+        from .workers import get_extraction_pool
+
+        def parse(write):
+            result = get_extraction_pool().parse_statement(document.file.path, write, trace=trace)
+            if not result.ok:
+                # Rolls back the rows written so far
+                raise RuntimeError(result.failure_reason)
+            return result.data
+    with stage('statement_import', input_bytes=document.file_size) as metrics:
+        stats = import_statement(document, parse=parse)
+        metrics['details'].update(rows=stats['rows'], rows_per_second=stats['rows_per_second'])
+    
+    document.extracted_data = {'statement': stats}
+    document.confidence_score = 1.0
+    document.failure_reason = ''
+    document.status = 'completed'
+
+def save_stage_metrics(document_id: str, stages: list) -> None:
+    """Persist the stage timings recorded while processing a document"""
+    if not stages:
+        return
     try:
-        from apps.transactions.models import Transaction
-        transaction = Transaction.objects.get(id=transaction_id)
-        
-        # Prepare transaction data for analysis
-        transaction_data = {
-            'amount': float(transaction.amount),
-            'type': transaction.type,
-            'category': transaction.category,
-            'gst_number': transaction.gst_number,
-            'cgst_amount': float(transaction.cgst_amount),
-            'sgst_amount': float(transaction.sgst_amount),
-            'igst_amount': float(transaction.igst_amount),
-            'tds_amount': float(transaction.tds_amount),
-        }
-        
-        # Analyze for compliance issues
-        insights = compliance_analyzer.analyze_transaction(transaction_data)
-        
-        # Create AI insights
-        for insight_data in insights:
-            ai_insight = AIInsight.objects.create(
-                user=transaction.user,
+        DocumentStageMetric.objects.bulk_create([
+            DocumentStageMetric(
+                document_id=document_id,
+                stage=metrics['stage'],
+                wall_time_ms=metrics['wall_time_ms'],
+                cpu_time_ms=metrics['cpu_time_ms'],
+                page_count=metrics.get('page_count'),
+                input_bytes=metrics.get('input_bytes'),
+                details=metrics.get('details') or {}
+            )
+            for metrics in stages
+        ])
+    except Exception as e:
+        logger.error(f"Error saving stage metrics for document {document_id}: {e}")
+
+def aggregate_pipeline_metrics(days: int = 7) -> dict:
+    """Roll recent stage timings up into p50/p95/p99 on the pipeline AIModel"""
+    cutoff = timezone.now() - timedelta(days=days)
+    rows = DocumentStageMetric.objects.filter(created_at__gte=cutoff).values_list(
+        'stage', 'wall_time_ms', 'cpu_time_ms'
+    ).iterator(chunk_size=5000)
+    
+    metrics = {
+        'window_days': days,
+        'computed_at': timezone.now().isoformat(),
+        'stages': summarize_stage_timings(rows),
+    }
+    
+    pipeline_model, _ = AIModel.objects.get_or_create(
+        name=PIPELINE_MODEL_NAME,
+        defaults={'version': '1', 'model_type': 'PIPELINE'}
+    )
+    pipeline_model.performance_metrics = metrics
+    pipeline_model.save(update_fields=['performance_metrics'])
+    
+    logger.info(f"Aggregated pipeline metrics for {len(metrics['stages'])} stages")
+    return metrics
+
+COMPLIANCE_FIELDS = [
+    'id', 'user_id', 'amount', 'type', 'category', 'gst_number',
+    'cgst_amount', 'sgst_amount', 'igst_amount', 'tds_amount',
+]
+
+def _apply_compliance_results(rows: list, results: dict, writer, clear: bool = False) -> int:
+    """Queue batch analysis insights on ``writer`` and update the transaction flags.
+    
+    With ``clear`` (a re-scan), transactions that no longer raise anything
+    have their analysis cleared. Returns the number of flagged transactions.
+    """
+    from apps.transactions.models import Transaction
+    updated = []
+    
+    for row in rows:
+        found = results[row['id']]
+        for insight_data in found:
+            writer.add(
+                row['user_id'],
                 insight_type=insight_data['type'],
                 title=insight_data['title'],
                 description=insight_data['description'],
                 priority=insight_data['priority'],
                 action_required=insight_data.get('action_required', False),
-                confidence_score=0.85
+                confidence_score=0.85,
+                transaction_ids=[row['id']]
             )
-            ai_insight.related_transactions.add(transaction)
-        
-        # Update transaction with AI analysis
-        if insights:
-            analysis_text = f"Found {len(insights)} compliance points to review."
-            anomaly_flags = [insight['type'] for insight in insights if insight['priority'] == 'high']
-            
-            transaction.ai_analysis = analysis_text
-            transaction.anomaly_flags = anomaly_flags
-            transaction.confidence_score = 0.9
-            transaction.save()
         
-        logger.info(f"Successfully analyzed transaction {transaction_id}")
+        if found:
+            updated.append(Transaction(
+                id=row['id'],
+                ai_analysis=f"Found {len(found)} compliance points to review.",
+                anomaly_flags=[i['type'] for i in found if i['priority'] == 'high'],
+                confidence_score=0.9
+            ))
+        elif clear:
+            updated.append(Transaction(id=row['id'], ai_analysis='', anomaly_flags=[],
+                                       confidence_score=0.0))
+    
+    Transaction.objects.bulk_update(
+        updated, ['ai_analysis', 'anomaly_flags', 'confidence_score'], batch_size=500
+    )
+    return sum(1 for row in rows if results[row['id']])
+
+def analyze_transactions(transaction_ids: list, chunk_size: int = 1000) -> dict:
+    """Analyze many transactions at once, writing insights and updates in bulk.
+    
+    Errors propagate to the caller; the analysis executor logs them.
+    """
+    from apps.transactions.models import Transaction
+    analyzed = flagged = 0
+    
+    with BulkInsightWriter() as writer:
+        for start in range(0, len(transaction_ids), chunk_size):
+            rows = list(Transaction.objects.filter(
+                id__in=transaction_ids[start:start + chunk_size]
+            ).values(*COMPLIANCE_FIELDS))
+            results = compliance_analyzer.analyze_batch(rows)
+            flagged += _apply_compliance_results(rows, results, writer)
+            analyzed += len(rows)
+    
+    logger.info(f"Analyzed {analyzed} transactions, {flagged} with compliance points")
+    return {'analyzed': analyzed, 'flagged': flagged}
+
+def make_transaction_analysis_executor() -> CoalescingExecutor:
+    return CoalescingExecutor(
+        analyze_transactions,
+        name='transaction-analysis',
+        mode=settings.TRANSACTION_ANALYSIS_MODE,
+        window_seconds=settings.TRANSACTION_ANALYSIS_WINDOW_SECONDS,
+        max_batch=settings.TRANSACTION_ANALYSIS_MAX_BATCH,
+    )
+
+def _analyze_transaction(transaction_id: str) -> None:
+    """Analyze transaction for compliance and insights"""
+    analyze_transactions([transaction_id])
+
+# analyze_transaction_task.delay(id) queues the id; ids queued close together
+# are analyzed in one batch once the creating transaction commits
+analyze_transaction_task = DeferredTask(_analyze_transaction, make_transaction_analysis_executor)
+
+def rescan_compliance(user_id: str = None, chunk_size: int = 5000, dry_run: bool = False) -> dict:
+    """Re-run the compliance rules over stored transactions, e.g. after a rule change.
+    
+    Insights an earlier analysis attached to the scanned transactions are
+    replaced, except ones the user has already read or dismissed. Only
+    insights built from the analyzer's templates (matched on type and
+    title) are replaced; other generators' insights are left alone.
+    """
+    from apps.transactions.models import Transaction
+    queryset = Transaction.objects.all()
+    if user_id:
+        queryset = queryset.filter(user_id=user_id)
+    analyzer_insights = Q()
+    for template in compliance_analyzer.TEMPLATES:
+        analyzer_insights |= Q(insight_type=template['type'], title=template['title'])
+    
+    summary = {'scanned': 0, 'flagged': 0, 'insights': 0}
+    rows = queryset.order_by('id').values(*COMPLIANCE_FIELDS).iterator(chunk_size=chunk_size)
+    while True:
+        chunk = list(islice(rows, chunk_size))
+        if not chunk:
+            break
+        results = compliance_analyzer.analyze_batch(chunk)
+        summary['scanned'] += len(chunk)
+        summary['insights'] += sum(len(found) for found in results.values())
+        if dry_run:
+            summary['flagged'] += sum(1 for found in results.values() if found)
+            continue
         
-    except Exception as e:
-        logger.error(f"Error analyzing transaction {transaction_id}: {e}")
+        with BulkInsightWriter() as writer:
+            AIInsight.objects.filter(
+                analyzer_insights,
+                related_transactions__in=[row['id'] for row in chunk],
+                is_read=False,
+                is_dismissed=False,
+            ).delete()
+            summary['flagged'] += _apply_compliance_results(chunk, results, writer, clear=True)
+    
+    logger.info(
+        f"Compliance re-scan{' (dry run)' if dry_run else ''}: {summary['scanned']} transactions, "
+        f"{summary['flagged']} flagged, {summary['insights']} insights"
+    )
+    return summary
 
 def generate_user_insights(user_id: str) -> None:
     """Generate personalized insights for user"""
     try:
         from django.contrib.auth import get_user_model
-        from apps.transactions.models import Transaction
+        from apps.transactions.models import LedgerRollup
         from django.db.models import Sum
-        from datetime import datetime, timedelta
         
         User = get_user_model()
         user = User.objects.get(id=user_id)
         
-        # Get recent transactions
-        last_month = timezone.now() - timedelta(days=30)
-        recent_transactions = Transaction.objects.filter(
+        # This month's expense totals, read from the monthly ledger rollup
+        this_month = timezone.localdate().replace(day=1)
+        expenses = LedgerRollup.objects.filter(
             user=user,
-            created_at__gte=last_month
+            month=this_month,
+            type='expense'
+        ).aggregate(
+            total=Sum('amount'),
+            cgst=Sum('cgst_amount'),
+            sgst=Sum('sgst_amount'),
+            igst=Sum('igst_amount')
         )
-        
-        # Calculate expense trends
-        total_expenses = recent_transactions.filter(type='expense').aggregate(
-            total=Sum('amount'))['total'] or 0
+        total_expenses = expenses['total'] or 0
         
         # Generate insights based on spending patterns
         insights_to_create = []
@@ -134,12 +356,7 @@ def generate_user_insights(user_id: str) -> None:
             })
         
         # GST credit opportunity
-        gst_paid = recent_transactions.filter(type='expense').aggregate(
-            cgst=Sum('cgst_amount'),
-            sgst=Sum('sgst_amount'),
-            igst=Sum('igst_amount')
-        )
-        total_gst_paid = (gst_paid['cgst'] or 0) + (gst_paid['sgst'] or 0) + (gst_paid['igst'] or 0)
+        total_gst_paid = (expenses['cgst'] or 0) + (expenses['sgst'] or 0) + (expenses['igst'] or 0)
         
         if total_gst_paid > 10000:
             insights_to_create.append({
@@ -151,13 +368,14 @@ def generate_user_insights(user_id: str) -> None:
             })
         
         # Create insights
-        for insight_data in insights_to_create:
-            AIInsight.objects.create(
-                user=user,
-                **insight_data,
-                confidence_score=0.8,
-                expires_at=timezone.now() + timedelta(days=30)
-            )
+        with BulkInsightWriter() as writer:
+            for insight_data in insights_to_create:
+                writer.add(
+                    user.id,
+                    **insight_data,
+                    confidence_score=0.8,
+                    expires_at=timezone.now() + timedelta(days=30)
+                )
         
         logger.info(f"Generated {len(insights_to_create)} insights for user {user_id}")
         
@@ -188,46 +406,44 @@ def send_compliance_reminders() -> None:
     """Send compliance reminders to users"""
     try:
         from django.contrib.auth import get_user_model
-        from datetime import datetime
         
         User = get_user_model()
-        users = User.objects.filter(is_active=True)
-        
         current_date = timezone.now().date()
+        reminders = []
         
-        for user in users:
-            reminders = []
-            
-            # GST return reminder (20th of each month)
-            if current_date.day == 18:  # 2 days before due date
-                reminders.append({
-                    'insight_type': 'compliance_reminder',
-                    'title': 'GST Return Due Soon',
-                    'description': 'GSTR-3B return is due on 20th. Prepare and file your GST return.',
-                    'priority': 'high',
-                    'action_required': True
-                })
-            
-            # TDS return reminder (quarterly)
-            if current_date.day == 28 and current_date.month in [1, 4, 7, 10]:
-                reminders.append({
-                    'insight_type': 'compliance_reminder',
-                    'title': 'TDS Return Due',
-                    'description': 'Quarterly TDS return is due on 31st. File Form 24Q/26Q.',
-                    'priority': 'high',
-                    'action_required': True
-                })
-            
-            # Create reminder insights
-            for reminder in reminders:
-                AIInsight.objects.create(
-                    user=user,
-                    **reminder,
-                    confidence_score=1.0,
-                    expires_at=timezone.now() + timedelta(days=7)
-                )
+        # GST return reminder (20th of each month)
+        if current_date.day == 18:  # 2 days before due date
+            reminders.append({
+                'insight_type': 'compliance_reminder',
+                'title': 'GST Return Due Soon',
+                'description': 'GSTR-3B return is due on 20th. Prepare and file your GST return.',
+                'priority': 'high',
+                'action_required': True
+            })
+        
+        # TDS return reminder (quarterly)
+        if current_date.day == 28 and current_date.month in [1, 4, 7, 10]:
+            reminders.append({
+                'insight_type': 'compliance_reminder',
+                'title': 'TDS Return Due',
+                'description': 'Quarterly TDS return is due on 31st. File Form 24Q/26Q.',
+                'priority': 'high',
+                'action_required': True
+            })
+        
+        # The reminders are the same for every user, so skip the user scan
+        # entirely on days without any
+        user_count = 0
+        if reminders:
+            expires_at = timezone.now() + timedelta(days=7)
+            user_ids = User.objects.filter(is_active=True).values_list('id', flat=True)
+            with BulkInsightWriter() as writer:
+                for user_id in user_ids.iterator(chunk_size=2000):
+                    user_count += 1
+                    for reminder in reminders:
+                        writer.add(user_id, **reminder, confidence_score=1.0, expires_at=expires_at)
         
-        logger.info(f"Sent compliance reminders to {len(users)} users")
+        logger.info(f"Sent compliance reminders to {user_count} users")
         
     except Exception as e:
-        logger.error(f"Error sending compliance reminders: {e}")
\ No newline at end of file
+        logger.error(f"Error sending compliance reminders: {e}")
@@ -10,4 +10,5 @@ urlpatterns = [
     path('insights/<uuid:insight_id>/dismiss/', views.dismiss_insight, name='dismiss_insight'),
     path('analytics/', views.ai_analytics, name='ai_analytics'),
     path('analyze-documents/', views.analyze_documents, name='analyze_documents'),
+    path('pipeline-metrics/', views.pipeline_metrics, name='pipeline_metrics'),
 ]
\ No newline at end of file
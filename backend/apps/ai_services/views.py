@@ -2,15 +2,17 @@ from rest_framework import generics, status, permissions
 from rest_framework.decorators import api_view, permission_classes
 from rest_framework.response import Response
 from django.shortcuts import get_object_or_404
-from .models import ChatSession, ChatMessage, AIInsight
+from .models import ChatSession, ChatMessage, AIInsight, AIModel, DocumentStageMetric
 from .serializers import (
     ChatSessionSerializer, ChatMessageSerializer, AIInsightSerializer,
-    ChatCreateSerializer
+    ChatCreateSerializer, AIInsightListSerializer
 )
 from .ai_utils import ai_advisor
+from .tasks import aggregate_pipeline_metrics, PIPELINE_MODEL_NAME
 from apps.users.models import AuditLog
 from apps.transactions.models import Transaction
 from apps.documents.models import Document
+from taxora.fieldsets import ValuesListMixin
 import uuid
 
 class ChatSessionListView(generics.ListCreateAPIView):
@@ -125,9 +127,10 @@ def chat_with_ai(request):
             status=status.HTTP_500_INTERNAL_SERVER_ERROR
         )
 
-class AIInsightListView(generics.ListAPIView):
+class AIInsightListView(ValuesListMixin, generics.ListAPIView):
     serializer_class = AIInsightSerializer
     permission_classes = [permissions.IsAuthenticated]
+    values_serializer_class = AIInsightListSerializer
     
     def get_queryset(self):
         queryset = AIInsight.objects.filter(user=self.request.user)
@@ -258,4 +261,37 @@ def analyze_documents(request):
         return Response(
             {'error': 'Failed to analyze documents. Please try again.'},
             status=status.HTTP_500_INTERNAL_SERVER_ERROR
-        )
\ No newline at end of file
+        )
+
+@api_view(['GET'])
+@permission_classes([permissions.IsAdminUser])
+def pipeline_metrics(request):
+    """Get per-stage p50/p95/p99 timings of the document pipeline"""
+    document_id = request.query_params.get('document_id')
+    if document_id:
+        try:
+            document_id = str(uuid.UUID(document_id))
+        except ValueError:
+            return Response({'error': 'Invalid document_id'}, 
+                           status=status.HTTP_400_BAD_REQUEST)
+        stages = DocumentStageMetric.objects.filter(document_id=document_id).order_by('created_at')
+        return Response({
+            'document_id': document_id,
+            'stages': list(stages.values(
+                'stage', 'wall_time_ms', 'cpu_time_ms', 'page_count', 
+                'input_bytes', 'details', 'created_at'
+            ))
+        })
+    
+    refresh = request.query_params.get('refresh', '').lower() == 'true'
+    pipeline_model = AIModel.objects.filter(name=PIPELINE_MODEL_NAME).first()
+    
+    if refresh or pipeline_model is None or not pipeline_model.performance_metrics:
+        try:
+            days = int(request.query_params.get('days', 7))
+        except ValueError:
+            return Response({'error': 'days must be an integer'}, 
+                           status=status.HTTP_400_BAD_REQUEST)
+        return Response(aggregate_pipeline_metrics(days=days))
+    
+    return Response(pipeline_model.performance_metrics)
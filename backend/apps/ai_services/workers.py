@@ -0,0 +1,309 @@
+"""Sandboxed extraction workers.
+
+Document extraction runs in child processes so that a PDF that hangs
+pdfplumber or a scan that balloons Tesseract's memory only costs that child.
+The parent sends one job at a time over a pipe and watches the child:
+
+* a job that runs past ``timeout`` seconds is killed,
+* a child whose RSS goes over ``max_rss_mb`` is killed,
+* a child that dies (segfault, OOM killer) is noticed,
+* a child is retired after ``max_jobs`` jobs to shed leaked memory.
+
+The child streams stage timings and the raw text back while it works, so a
+killed job still leaves its partial results and trace behind. Statement jobs
+stream their rows the same way, a chunk per message, to an ``on_rows``
+callback in the parent.
+
+Children only OCR and parse; NER runs in the parent, which already holds
+the model, so a child does not load its own copy of BERT and
+``max_rss_mb`` only has to cover OCR and PDF parsing.
+"""
+from dataclasses import dataclass, field
+from importlib import import_module
+from typing import Optional
+from django.conf import settings
+import multiprocessing
+import threading
+import time
+import os
+import logging
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_HANDLER = 'apps.ai_services.workers.run_job'
+
+POLL_SECONDS = 0.1
+
+_PAGE_SIZE = os.sysconf('SC_PAGE_SIZE') if hasattr(os, 'sysconf') else 4096
+
+@dataclass
+class ExtractionResult:
+    data: Optional[dict] = None
+    partial: dict = field(default_factory=dict)
+    failure_reason: str = ''
+
+    @property
+    def ok(self):
+        return not self.failure_reason
+
+def extract_invoice(job, send):
+    """Default handler: run the invoice extractor without NER, streaming progress to the parent"""
+    from .ai_utils import invoice_extractor
+    return invoice_extractor.extract_invoice_data(
+        job['file_path'],
+        page_routing=job.get('page_routing'),
+        on_text=lambda text: send(('partial', {'raw_text': text})),
+        with_entities=False,
+    )
+
+def parse_statement(job, send):
+    """Parse a bank statement, streaming its rows to the parent, which writes the transactions"""
+    from apps.transactions.statements import read_statement
+    from .instrumentation import stage
+    with stage('statement_parse', input_bytes=os.path.getsize(job['file_path'])) as metrics:
+        totals = read_statement(
+            job['file_path'], lambda rows: send(('rows', rows)), chunk_size=job.get('chunk_size')
+        )
+        metrics['details']['rows'] = totals['rows']
+    return totals
+
+JOB_HANDLERS = {
+    'invoice': extract_invoice,
+    'statement': parse_statement,
+}
+
+def run_job(job, send):
+    """Default handler: dispatch on the job's ``kind``, invoice extraction when absent"""
+    return JOB_HANDLERS[job.get('kind', 'invoice')](job, send)
+
+# Load the OCR engine before the worker reports ready, so start-up never
+# counts against the first job's timeout
+run_job.warm_up = lambda: import_module('apps.ai_services.ai_utils')
+
+def _worker_main(conn, handler_path):
+    import django
+    django.setup()
+    from .instrumentation import PipelineTrace
+
+    module_name, _, function_name = handler_path.rpartition('.')
+    handler = getattr(import_module(module_name), function_name)
+    if hasattr(handler, 'warm_up'):
+        handler.warm_up()
+    conn.send(('ready', os.getpid()))
+
+    while True:
+        try:
+            job = conn.recv()
+        except (EOFError, KeyboardInterrupt):
+            break
+        if job is None:
+            break
+        trace = PipelineTrace(
+            on_stage=lambda name: conn.send(('stage_start', name)),
+            on_stage_end=lambda metrics: conn.send(('stage', metrics)),
+        )
+        try:
+            with trace:
+                data = handler(job, conn.send)
+            conn.send(('result', data))
+        except Exception as e:
+            conn.send(('error', f"{type(e).__name__}: {e}"))
+
+class ExtractionWorker:
+    """One child process and the pipe to it"""
+
+    def __init__(self, context, handler_path=DEFAULT_HANDLER, start_timeout=300):
+        self.conn, child_conn = context.Pipe()
+        self.process = context.Process(
+            target=_worker_main, args=(child_conn, handler_path), daemon=True
+        )
+        self.process.start()
+        child_conn.close()
+        self.jobs = 0
+        self.start_timeout = start_timeout
+        self.ready = False
+
+    def rss_mb(self):
+        try:
+            with open(f'/proc/{self.process.pid}/statm') as f:
+                return int(f.read().split()[1]) * _PAGE_SIZE / (1024 * 1024)
+        except (OSError, ValueError, IndexError):
+            return 0.0
+
+    def wait_ready(self):
+        """Wait out django.setup and model loading before any job clock starts"""
+        if self.ready:
+            return
+        if not self.conn.poll(self.start_timeout):
+            raise RuntimeError(f'worker did not start within {self.start_timeout}s')
+        message = self.conn.recv()
+        if message[0] != 'ready':
+            raise RuntimeError(f'unexpected worker message {message[0]}')
+        self.ready = True
+
+    def run(self, job, timeout, max_rss_mb=None, trace=None, on_rows=None):
+        result = ExtractionResult()
+        try:
+            self.wait_ready()
+        except (RuntimeError, EOFError, OSError) as e:
+            self.kill()
+            result.failure_reason = f'Extraction worker failed to start: {e}'
+            return result
+
+        self.jobs += 1
+        self.conn.send(job)
+        deadline = time.monotonic() + timeout
+        while True:
+            try:
+                message = self.conn.recv() if self.conn.poll(POLL_SECONDS) else None
+            except (EOFError, OSError):
+                # The child closed its end; let it finish exiting to read the code
+                message = None
+                self.process.join(1)
+
+            if message is not None:
+                kind, payload = message
+                if kind == 'stage_start':
+                    if trace is not None:
+                        trace.started(payload)
+                elif kind == 'stage':
+                    if trace is not None:
+                        trace.stages.append(payload)
+                elif kind == 'partial':
+                    result.partial.update(payload)
+                elif kind == 'rows':
+                    if on_rows is not None:
+                        on_rows(payload)
+                elif kind == 'result':
+                    result.data = payload
+                    return result
+                elif kind == 'error':
+                    result.failure_reason = f'Extraction error: {payload}'
+                    return result
+            elif not self.process.is_alive():
+                result.failure_reason = f'Extraction worker exited with code {self.process.exitcode}'
+                return result
+
+            # Checked after every message too, so a child that keeps sending
+            # progress is still stopped
+            if time.monotonic() > deadline:
+                self.kill()
+                result.failure_reason = f'Extraction timed out after {timeout}s'
+                return result
+            if max_rss_mb:
+                rss = self.rss_mb()
+                if rss > max_rss_mb:
+                    self.kill()
+                    result.failure_reason = (
+                        f'Extraction exceeded memory limit ({rss:.0f}MB > {max_rss_mb}MB)'
+                    )
+                    return result
+
+    @property
+    def alive(self):
+        return self.process.is_alive()
+
+    def kill(self):
+        if self.process.is_alive():
+            self.process.kill()
+        self.process.join(5)
+        self.conn.close()
+
+    def stop(self):
+        """Ask the worker to exit, killing it if it does not"""
+        if self.process.is_alive():
+            try:
+                self.conn.send(None)
+            except (OSError, BrokenPipeError):
+                pass
+            self.process.join(5)
+        self.kill()
+
+class ExtractionPool:
+    """Bounded set of reusable workers shared by the threads of one web process"""
+
+    def __init__(self, max_workers=None, max_jobs=None, timeout=None, max_rss_mb=None,
+                 handler_path=DEFAULT_HANDLER, start_method=None, start_timeout=None):
+        self.max_workers = max_workers or settings.EXTRACTION_MAX_WORKERS
+        self.max_jobs = max_jobs or settings.EXTRACTION_MAX_JOBS_PER_WORKER
+        self.timeout = timeout or settings.EXTRACTION_TIMEOUT_SECONDS
+        self.max_rss_mb = max_rss_mb if max_rss_mb is not None else settings.EXTRACTION_MAX_RSS_MB
+        self.start_timeout = start_timeout or settings.EXTRACTION_WORKER_START_TIMEOUT
+        self.handler_path = handler_path
+        # spawn keeps torch and open database connections out of the child
+        self.context = multiprocessing.get_context(start_method or settings.EXTRACTION_START_METHOD)
+        self._idle = []
+        self._busy = 0
+        self._condition = threading.Condition()
+
+    def _acquire(self):
+        with self._condition:
+            while not self._idle and self._busy >= self.max_workers:
+                self._condition.wait()
+            self._busy += 1
+            if self._idle:
+                return self._idle.pop()
+        try:
+            return ExtractionWorker(self.context, self.handler_path, self.start_timeout)
+        except Exception:
+            self._release(None)
+            raise
+
+    def _release(self, worker):
+        with self._condition:
+            self._busy -= 1
+            if worker is not None:
+                self._idle.append(worker)
+            self._condition.notify()
+
+    def extract(self, file_path, page_routing=None, trace=None, timeout=None):
+        """Run one invoice extraction job in a worker and return an ``ExtractionResult``"""
+        return self.run({'kind': 'invoice', 'file_path': file_path, 'page_routing': page_routing},
+                        trace=trace, timeout=timeout)
+
+    def parse_statement(self, file_path, on_rows, chunk_size=None, trace=None, timeout=None):
+        """Parse a bank statement in a worker, passing each chunk of row tuples to ``on_rows``.
+
+        ``data`` is ``read_statement``'s totals.
+        """
+        return self.run({'kind': 'statement', 'file_path': file_path, 'chunk_size': chunk_size},
+                        trace=trace, timeout=timeout, on_rows=on_rows)
+
+    def run(self, job, trace=None, timeout=None, on_rows=None):
+        """Run one job in a worker and return an ``ExtractionResult``"""
+        worker = self._acquire()
+        try:
+            result = worker.run(
+                job,
+                timeout=timeout or self.timeout,
+                max_rss_mb=self.max_rss_mb,
+                trace=trace,
+                on_rows=on_rows,
+            )
+        except Exception as e:
+            worker.kill()
+            self._release(None)
+            return ExtractionResult(failure_reason=f'Extraction worker error: {e}')
+
+        if not worker.alive or not result.ok or worker.jobs >= self.max_jobs:
+            # Recycle after failures too; a worker that errored may be in a bad state
+            worker.stop()
+            worker = None
+        self._release(worker)
+        return result
+
+    def shutdown(self):
+        with self._condition:
+            idle, self._idle = self._idle, []
+        for worker in idle:
+            worker.stop()
+
+_pool = None
+_pool_lock = threading.Lock()
+
+def get_extraction_pool():
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = ExtractionPool()
+        return _pool
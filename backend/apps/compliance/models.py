@@ -43,6 +43,10 @@ class ComplianceCalendar(models.Model):
         db_table = 'compliance_calendar'
         ordering = ['due_date']
         unique_together = ['user', 'rule', 'due_date']
+        indexes = [
+            # Upcoming and overdue items: open items by due date
+            models.Index(fields=['user', 'is_completed', 'due_date']),
+        ]
     
     def __str__(self):
         return f"{self.title} - {self.due_date}"
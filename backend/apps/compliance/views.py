@@ -1,6 +1,7 @@
 from rest_framework import generics, status, permissions
 from rest_framework.decorators import api_view, permission_classes
 from rest_framework.response import Response
+from django.db.models import Sum
 from django.utils import timezone
 from datetime import datetime, timedelta, date
 from decimal import Decimal
@@ -267,34 +268,34 @@ def generate_gstr3b_data(request):
     
     try:
         month, year = period.split('-')
-        month = int(month)
-        year = int(year)
+        period_start = date(int(year), int(month), 1)
     except (ValueError, IndexError):
         return Response({'error': 'Invalid period format. Use MM-YYYY'}, 
                        status=status.HTTP_400_BAD_REQUEST)
     
-    # Get user's transactions for the period
-    from apps.transactions.models import Transaction
-    transactions = Transaction.objects.filter(
+    # Approved totals for the period come from the monthly ledger rollup
+    from apps.transactions.models import LedgerRollup
+    rollups = LedgerRollup.objects.filter(
         user=request.user,
-        date__year=year,
-        date__month=month,
+        month=period_start,
         status='approved'
     )
     
     # Calculate GST summary
-    outward_supplies = transactions.filter(type='income').aggregate(
-        taxable_value=models.Sum('amount'),
-        cgst=models.Sum('cgst_amount'),
-        sgst=models.Sum('sgst_amount'),
-        igst=models.Sum('igst_amount')
+    outward_supplies = rollups.filter(type='income').aggregate(
+        taxable_value=Sum('amount'),
+        cgst=Sum('cgst_amount'),
+        sgst=Sum('sgst_amount'),
+        igst=Sum('igst_amount'),
+        count=Sum('count')
     )
     
-    inward_supplies = transactions.filter(type='expense').aggregate(
-        taxable_value=models.Sum('amount'),
-        cgst=models.Sum('cgst_amount'),
-        sgst=models.Sum('sgst_amount'),
-        igst=models.Sum('igst_amount')
+    inward_supplies = rollups.filter(type='expense').aggregate(
+        taxable_value=Sum('amount'),
+        cgst=Sum('cgst_amount'),
+        sgst=Sum('sgst_amount'),
+        igst=Sum('igst_amount'),
+        count=Sum('count')
     )
     
     # Calculate net GST liability
@@ -331,7 +332,7 @@ def generate_gstr3b_data(request):
             'input_tax_credit': float(input_tax),
             'net_tax_payable': float(net_liability)
         },
-        'transaction_count': transactions.count()
+        'transaction_count': (outward_supplies['count'] or 0) + (inward_supplies['count'] or 0)
     }
     
     return Response(gstr3b_data)
\ No newline at end of file
@@ -3,9 +3,9 @@ from .models import Document, DocumentShare, DocumentVersion
 
 @admin.register(Document)
 class DocumentAdmin(admin.ModelAdmin):
-    list_display = ['name', 'category', 'user', 'status', 'created_at']
+    list_display = ['name', 'category', 'user', 'status', 'invoice_number', 'created_at']
     list_filter = ['category', 'status', 'created_at']
-    search_fields = ['name', 'user__username']
+    search_fields = ['name', 'user__username', 'invoice_number', 'gst_number']
     readonly_fields = ['id', 'file_size', 'mime_type', 'created_at', 'updated_at']
 
 @admin.register(DocumentShare)
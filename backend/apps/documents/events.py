@@ -0,0 +1,186 @@
+"""Publish/subscribe of document processing status for the event stream endpoint.
+
+The default broker fans events out to subscribers inside the current process.
+With DOCUMENT_EVENTS_BACKEND = 'postgres' events are sent through NOTIFY
+instead, and each process relays them to its local subscribers from a single
+LISTEN connection, so streams see documents processed by other workers.
+
+Browsers open the stream with ``EventSource``, which cannot send an
+``Authorization`` header, so the stream also accepts a short-lived signed
+``?token=`` issued by an authenticated request. The token only opens event
+streams; it is not a JWT.
+"""
+from collections import defaultdict
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core import signing
+from django.db import connection
+from django.utils import timezone
+from rest_framework.authentication import BaseAuthentication
+from rest_framework.exceptions import AuthenticationFailed
+from rest_framework.renderers import BaseRenderer
+import json
+import queue
+import select
+import threading
+import logging
+
+logger = logging.getLogger(__name__)
+
+NOTIFY_CHANNEL = 'document_events'
+STREAM_TOKEN_SALT = 'apps.documents.events.stream'
+
+class DocumentEventBroker:
+    """Fan document events out to per-user subscriber queues"""
+
+    def __init__(self, max_queue_size=1000):
+        self.max_queue_size = max_queue_size
+        self._lock = threading.Lock()
+        self._subscribers = defaultdict(set)
+
+    def subscribe(self, user_id):
+        subscriber = queue.Queue(maxsize=self.max_queue_size)
+        with self._lock:
+            self._subscribers[str(user_id)].add(subscriber)
+        return subscriber
+
+    def unsubscribe(self, user_id, subscriber):
+        with self._lock:
+            subscribers = self._subscribers.get(str(user_id))
+            if subscribers is not None:
+                subscribers.discard(subscriber)
+                if not subscribers:
+                    del self._subscribers[str(user_id)]
+
+    def publish(self, user_id, event):
+        self.dispatch(user_id, event)
+
+    def dispatch(self, user_id, event):
+        with self._lock:
+            subscribers = list(self._subscribers.get(str(user_id), ()))
+        for subscriber in subscribers:
+            try:
+                subscriber.put_nowait(event)
+            except queue.Full:
+                # A stalled client must not block document processing
+                logger.warning(f"Dropping document event for slow subscriber of user {user_id}")
+
+class PostgresNotifyBroker(DocumentEventBroker):
+    """Broker that relays events between processes with LISTEN/NOTIFY"""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._listener = None
+
+    def subscribe(self, user_id):
+        self._ensure_listener()
+        return super().subscribe(user_id)
+
+    def publish(self, user_id, event):
+        payload = json.dumps({'user_id': str(user_id), 'event': event})
+        with connection.cursor() as cursor:
+            cursor.execute('SELECT pg_notify(%s, %s)', [NOTIFY_CHANNEL, payload])
+
+    def _ensure_listener(self):
+        with self._lock:
+            if self._listener is None or not self._listener.is_alive():
+                self._listener = threading.Thread(
+                    target=self._listen, name='document-events-listener', daemon=True
+                )
+                self._listener.start()
+
+    def _listen(self):
+        import psycopg2
+        db = settings.DATABASES['default']
+        conn = psycopg2.connect(
+            dbname=db['NAME'], user=db['USER'], password=db['PASSWORD'],
+            host=db['HOST'], port=db['PORT']
+        )
+        conn.set_isolation_level(psycopg2.extensions.ISOLATION_LEVEL_AUTOCOMMIT)
+        try:
+            with conn.cursor() as cursor:
+                cursor.execute(f'LISTEN {NOTIFY_CHANNEL}')
+            while True:
+                if select.select([conn], [], [], 30) == ([], [], []):
+                    continue
+                conn.poll()
+                while conn.notifies:
+                    notify = conn.notifies.pop(0)
+                    try:
+                        message = json.loads(notify.payload)
+                        self.dispatch(message['user_id'], message['event'])
+                    except (ValueError, KeyError) as e:
+                        logger.error(f"Invalid document event payload: {e}")
+        except Exception as e:
+            logger.error(f"Document event listener stopped: {e}")
+        finally:
+            conn.close()
+
+def _create_broker():
+    backend = getattr(settings, 'DOCUMENT_EVENTS_BACKEND', 'local')
+    if backend == 'postgres':
+        return PostgresNotifyBroker()
+    return DocumentEventBroker()
+
+broker = _create_broker()
+
+def publish_document_status(document, stage=None, progress=None, **extra):
+    """Publish the current status of a document to its owner's event streams"""
+    event = {
+        'document_id': str(document.id),
+        'status': document.status,
+        'stage': stage or document.status,
+        'progress': progress,
+        'timestamp': timezone.now().isoformat(),
+    }
+    if document.status == 'failed' and getattr(document, 'failure_reason', ''):
+        event['failure_reason'] = document.failure_reason
+    event.update(extra)
+    try:
+        broker.publish(document.user_id, event)
+    except Exception as e:
+        logger.error(f"Error publishing event for document {document.id}: {e}")
+    return event
+
+def format_sse(data, event=None):
+    """Encode one server-sent event frame"""
+    message = ''
+    if event:
+        message += f'event: {event}\n'
+    message += f'data: {json.dumps(data)}\n\n'
+    return message
+
+class EventStreamRenderer(BaseRenderer):
+    """Lets DRF negotiate text/event-stream; error payloads become an error event"""
+    media_type = 'text/event-stream'
+    format = 'event-stream'
+    charset = 'utf-8'
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+        return format_sse(data, event='error').encode(self.charset)
+
+def make_stream_token(user):
+    """A signed token that opens ``user``'s event stream for ``DOCUMENT_EVENTS_TOKEN_MAX_AGE`` seconds"""
+    return signing.dumps({'user_id': str(user.pk)}, salt=STREAM_TOKEN_SALT)
+
+class EventStreamTokenAuthentication(BaseAuthentication):
+    """Authenticate an event stream by its ``?token=`` query parameter"""
+
+    def authenticate(self, request):
+        token = request.query_params.get('token')
+        if not token:
+            return None
+        try:
+            payload = signing.loads(
+                token, salt=STREAM_TOKEN_SALT, max_age=settings.DOCUMENT_EVENTS_TOKEN_MAX_AGE
+            )
+        except signing.SignatureExpired:
+            raise AuthenticationFailed('Stream token has expired')
+        except signing.BadSignature:
+            raise AuthenticationFailed('Invalid stream token')
+        user = get_user_model().objects.filter(pk=payload.get('user_id'), is_active=True).first()
+        if user is None:
+            raise AuthenticationFailed('Invalid stream token')
+        return (user, None)
@@ -0,0 +1,40 @@
+from django.core.management.base import BaseCommand
+from apps.documents.models import Document
+
+INVOICE_FIELDS = ['invoice_number', 'gst_number', 'invoice_date', 'invoice_amount']
+
+class Command(BaseCommand):
+    help = 'Populate indexed invoice columns from extracted_data for existing documents'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--chunk-size', type=int, default=500,
+                            help='Number of documents loaded and updated per batch')
+        parser.add_argument('--only-missing', action='store_true',
+                            help='Skip documents that already have an invoice number')
+
+    def handle(self, *args, **options):
+        chunk_size = options['chunk_size']
+        queryset = Document.objects.filter(status='completed').exclude(extracted_data={})
+        if options['only_missing']:
+            queryset = queryset.filter(invoice_number='')
+
+        # Walk the table by primary key so each chunk is an index range scan
+        queryset = queryset.order_by('pk').only('id', 'extracted_data', *INVOICE_FIELDS)
+
+        last_pk = None
+        total = 0
+        while True:
+            chunk = queryset if last_pk is None else queryset.filter(pk__gt=last_pk)
+            documents = list(chunk[:chunk_size])
+            if not documents:
+                break
+
+            for document in documents:
+                document.populate_invoice_fields()
+
+            Document.objects.bulk_update(documents, INVOICE_FIELDS)
+            last_pk = documents[-1].pk
+            total += len(documents)
+            self.stdout.write(f"Backfilled {total} documents...")
+
+        self.stdout.write(self.style.SUCCESS(f"Backfilled invoice fields for {total} documents"))
@@ -1,5 +1,7 @@
 from django.db import models
 from django.contrib.auth import get_user_model
+from django.utils.dateparse import parse_date
+from decimal import Decimal, InvalidOperation
 import uuid
 import os
 
@@ -43,6 +45,16 @@ class Document(models.Model):
     extracted_data = models.JSONField(default=dict, blank=True)
     ai_summary = models.TextField(blank=True)
     confidence_score = models.FloatField(default=0.0)
+    # Why extraction failed (timeout, memory limit, worker crash, ...)
+    failure_reason = models.TextField(blank=True)
+    # Per-page text/ocr routing from PDF triage, reused on reprocessing
+    page_routing = models.JSONField(default=dict, blank=True)
+    
+    # Key invoice fields promoted out of extracted_data for indexed lookups
+    invoice_number = models.CharField(max_length=100, blank=True)
+    gst_number = models.CharField(max_length=15, blank=True)
+    invoice_date = models.DateField(null=True, blank=True)
+    invoice_amount = models.DecimalField(max_digits=15, decimal_places=2, null=True, blank=True)
     
     # Metadata
     created_at = models.DateTimeField(auto_now_add=True)
@@ -52,10 +64,38 @@ class Document(models.Model):
     class Meta:
         db_table = 'documents'
         ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['user', 'gst_number', 'invoice_number']),
+            models.Index(fields=['user', 'invoice_number']),
+            models.Index(fields=['user', 'invoice_date']),
+            models.Index(fields=['user', 'invoice_amount']),
+            # Keyset pagination of the document list
+            models.Index(fields=['user', '-created_at', '-id']),
+        ]
     
     def __str__(self):
         return f"{self.name} - {self.category}"
     
+    def populate_invoice_fields(self):
+        """Copy the key invoice fields from extracted_data into their indexed columns"""
+        data = self.extracted_data or {}
+        
+        self.invoice_number = str(data.get('invoice_number') or '').strip()[:100]
+        
+        gst_number = str(data.get('gst_number') or '').strip().upper()
+        self.gst_number = gst_number if len(gst_number) == 15 else ''
+        
+        try:
+            self.invoice_date = parse_date(str(data.get('date') or ''))
+        except ValueError:
+            self.invoice_date = None
+        
+        try:
+            amount = Decimal(str(data.get('amount') or 0)).quantize(Decimal('0.01'))
+            self.invoice_amount = amount if 0 < amount < Decimal('1e13') else None
+        except (InvalidOperation, ValueError):
+            self.invoice_amount = None
+    
     @property
     def file_extension(self):
         return os.path.splitext(self.file.name)[1].lower()
@@ -1,5 +1,6 @@
 from rest_framework import serializers
 from .models import Document, DocumentShare, DocumentVersion
+from taxora.fieldsets import ValuesListSerializer
 
 class DocumentSerializer(serializers.ModelSerializer):
     file_url = serializers.SerializerMethodField()
@@ -8,12 +9,14 @@ class DocumentSerializer(serializers.ModelSerializer):
     class Meta:
         model = Document
         fields = ['id', 'name', 'category', 'file', 'file_url', 'file_size', 
-                 'mime_type', 'status', 'extracted_text', 'extracted_data', 
-                 'ai_summary', 'confidence_score', 'owner_name', 'created_at', 
+                 'mime_type', 'status', 'failure_reason', 'extracted_text', 'extracted_data', 
+                 'ai_summary', 'confidence_score', 'invoice_number', 'gst_number', 
+                 'invoice_date', 'invoice_amount', 'owner_name', 'created_at', 
                  'updated_at', 'processed_at']
-        read_only_fields = ['id', 'file_size', 'mime_type', 'status', 
+        read_only_fields = ['id', 'file_size', 'mime_type', 'status', 'failure_reason', 
                            'extracted_text', 'extracted_data', 'ai_summary', 
-                           'confidence_score', 'processed_at']
+                           'confidence_score', 'invoice_number', 'gst_number', 
+                           'invoice_date', 'invoice_amount', 'processed_at']
     
     def get_file_url(self, obj):
         request = self.context.get('request')
@@ -21,6 +24,38 @@ class DocumentSerializer(serializers.ModelSerializer):
             return request.build_absolute_uri(obj.file.url)
         return None
 
+class DocumentListSerializer(ValuesListSerializer):
+    """Document list rows; extracted text and data only when asked for"""
+    fields = {
+        'id': None, 'name': None, 'category': None, 'file_size': None, 'mime_type': None,
+        'status': None, 'failure_reason': None, 'extracted_text': None, 'extracted_data': None,
+        'ai_summary': None, 'confidence_score': None, 'invoice_number': None, 'gst_number': None,
+        'invoice_date': None, 'invoice_amount': None, 'created_at': None, 'updated_at': None,
+        'processed_at': None,
+    }
+    method_fields = {
+        'file': ['file'],
+        'file_url': ['file'],
+        'owner_name': ['user__first_name', 'user__last_name'],
+    }
+    heavy_fields = {'extracted_text', 'extracted_data'}
+    raw_fields = {'extracted_data'}
+
+    def _file_url(self, row):
+        request = self.context.get('request')
+        if not row['file'] or not request:
+            return None
+        return request.build_absolute_uri(Document._meta.get_field('file').storage.url(row['file']))
+
+    def get_file(self, row):
+        return self._file_url(row)
+
+    def get_file_url(self, row):
+        return self._file_url(row)
+
+    def get_owner_name(self, row):
+        return f"{row['user__first_name']} {row['user__last_name']}".strip()
+
 class DocumentUploadSerializer(serializers.ModelSerializer):
     class Meta:
         model = Document
@@ -7,4 +7,6 @@ urlpatterns = [
     path('<uuid:document_id>/share/', views.share_document, name='share_document'),
     path('shared/', views.shared_documents, name='shared_documents'),
     path('analytics/', views.document_analytics, name='document_analytics'),
+    path('events/', views.document_events, name='document_events'),
+    path('events/token/', views.document_events_token, name='document_events_token'),
 ]
\ No newline at end of file
@@ -1,20 +1,64 @@
 from rest_framework import generics, status, permissions
-from rest_framework.decorators import api_view, permission_classes
+from rest_framework.decorators import (
+    api_view, authentication_classes, permission_classes, renderer_classes
+)
+from rest_framework.renderers import JSONRenderer
 from rest_framework.response import Response
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from django.conf import settings
+from django.http import StreamingHttpResponse
 from django.shortcuts import get_object_or_404
+from django.utils.dateparse import parse_date
 from .models import Document, DocumentShare
 from .serializers import (
-    DocumentSerializer, DocumentUploadSerializer, DocumentShareSerializer
+    DocumentSerializer, DocumentUploadSerializer, DocumentShareSerializer,
+    DocumentListSerializer
+)
+from .events import (
+    broker, publish_document_status, format_sse, EventStreamRenderer,
+    EventStreamTokenAuthentication, make_stream_token
 )
 from apps.ai_services.tasks import process_document
 from apps.users.models import AuditLog
+from taxora.fieldsets import ValuesListMixin
+from taxora.pagination import KeysetPagination
+import queue
+import time
+import uuid
 
-class DocumentListCreateView(generics.ListCreateAPIView):
+class DocumentListCreateView(ValuesListMixin, generics.ListCreateAPIView):
     serializer_class = DocumentSerializer
     permission_classes = [permissions.IsAuthenticated]
+    pagination_class = KeysetPagination
+    keyset_ordering = ['-created_at', '-id']
+    values_serializer_class = DocumentListSerializer
     
     def get_queryset(self):
-        return Document.objects.filter(user=self.request.user)
+        queryset = Document.objects.filter(user=self.request.user)
+        
+        # Filtering on the indexed invoice fields
+        invoice_number = self.request.query_params.get('invoice_number')
+        gst_number = self.request.query_params.get('gst_number')
+        invoice_date_from = self.request.query_params.get('invoice_date_from')
+        invoice_date_to = self.request.query_params.get('invoice_date_to')
+        
+        if invoice_number:
+            queryset = queryset.filter(invoice_number=invoice_number)
+        
+        if gst_number:
+            queryset = queryset.filter(gst_number=gst_number.upper())
+        
+        if invoice_date_from:
+            invoice_date_from = parse_date(invoice_date_from)
+            if invoice_date_from:
+                queryset = queryset.filter(invoice_date__gte=invoice_date_from)
+        
+        if invoice_date_to:
+            invoice_date_to = parse_date(invoice_date_to)
+            if invoice_date_to:
+                queryset = queryset.filter(invoice_date__lte=invoice_date_to)
+        
+        return queryset
     
     def get_serializer_class(self):
         if self.request.method == 'POST':
@@ -34,6 +78,7 @@ class DocumentListCreateView(generics.ListCreateAPIView):
             resource_id=str(document.id),
             details={'name': document.name, 'category': document.category}
         )
+        publish_document_status(document, progress=0.0)
 
         # Process synchronously
         process_document(str(document.id))
@@ -120,4 +165,75 @@ def document_analytics(request):
         if count > 0:
             analytics['by_status'][status_val] = count
     
-    return Response(analytics)
\ No newline at end of file
+    return Response(analytics)
+
+@api_view(['POST'])
+@permission_classes([permissions.IsAuthenticated])
+def document_events_token(request):
+    """Issue a short-lived token for opening the event stream with EventSource"""
+    return Response({
+        'token': make_stream_token(request.user),
+        'expires_in': settings.DOCUMENT_EVENTS_TOKEN_MAX_AGE,
+    })
+
+@api_view(['GET'])
+@authentication_classes([JWTAuthentication, EventStreamTokenAuthentication])
+@permission_classes([permissions.IsAuthenticated])
+@renderer_classes([EventStreamRenderer, JSONRenderer])
+def document_events(request):
+    """Stream processing status changes of the user's documents as server-sent events.
+
+    Accepts the usual JWT header, or ``?token=`` from ``document_events_token``
+    for browser ``EventSource`` clients.
+    """
+    user_id = request.user.id
+    document_id = request.query_params.get('document_id')
+    if document_id:
+        try:
+            document_id = str(uuid.UUID(document_id))
+        except ValueError:
+            return Response({'error': 'Invalid document_id'}, 
+                           status=status.HTTP_400_BAD_REQUEST)
+    
+    keepalive = settings.DOCUMENT_EVENTS_KEEPALIVE_SECONDS
+    max_seconds = settings.DOCUMENT_EVENTS_MAX_STREAM_SECONDS
+    
+    def stream():
+        # Subscribe before taking the snapshot so no transition falls in between
+        subscriber = broker.subscribe(user_id)
+        try:
+            yield f'retry: {keepalive * 1000}\n\n'
+            
+            in_flight = Document.objects.filter(
+                user_id=user_id, status__in=['pending', 'processing']
+            )
+            if document_id:
+                in_flight = in_flight.filter(id=document_id)
+            for row in in_flight.values('id', 'status', 'updated_at'):
+                yield format_sse({
+                    'document_id': str(row['id']),
+                    'status': row['status'],
+                    'stage': row['status'],
+                    'progress': None,
+                    'timestamp': row['updated_at'].isoformat(),
+                }, event='status')
+            
+            # Streams are bounded so they don't pin a worker thread forever;
+            # EventSource clients reconnect automatically after `retry`
+            deadline = time.monotonic() + max_seconds
+            while time.monotonic() < deadline:
+                try:
+                    event = subscriber.get(timeout=keepalive)
+                except queue.Empty:
+                    yield ': keepalive\n\n'
+                    continue
+                if document_id and event['document_id'] != document_id:
+                    continue
+                yield format_sse(event, event='status')
+        finally:
+            broker.unsubscribe(user_id, subscriber)
+    
+    response = StreamingHttpResponse(stream(), content_type='text/event-stream')
+    response['Cache-Control'] = 'no-cache'
+    response['X-Accel-Buffering'] = 'no'
+    return response
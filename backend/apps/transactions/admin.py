@@ -1,5 +1,5 @@
 from django.contrib import admin
-from .models import Transaction, TransactionCategory, RecurringTransaction, BankAccount
+from .models import Transaction, TransactionCategory, RecurringTransaction, BankAccount, LedgerRollup
 
 @admin.register(Transaction)
 class TransactionAdmin(admin.ModelAdmin):
@@ -16,4 +16,10 @@ class TransactionCategoryAdmin(admin.ModelAdmin):
 @admin.register(BankAccount)
 class BankAccountAdmin(admin.ModelAdmin):
     list_display = ['account_name', 'bank_name', 'user', 'account_type', 'is_primary']
-    list_filter = ['account_type', 'is_primary', 'is_active']
\ No newline at end of file
+    list_filter = ['account_type', 'is_primary', 'is_active']
+
+@admin.register(LedgerRollup)
+class LedgerRollupAdmin(admin.ModelAdmin):
+    list_display = ['user', 'month', 'type', 'category', 'status', 'amount', 'count']
+    list_filter = ['type', 'status', 'month']
+    readonly_fields = ['updated_at']
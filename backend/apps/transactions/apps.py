@@ -1,5 +1,13 @@
 from django.apps import AppConfig
+from django.db.models.signals import post_migrate
 
 class TransactionsConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
-    name = 'apps.transactions'
\ No newline at end of file
+    name = 'apps.transactions'
+
+    def ready(self):
+        # Connects the signal handlers that keep LedgerRollup current
+        from . import rollups
+        from .search import install_search_index
+        post_migrate.connect(install_search_index, sender=self)
+        post_migrate.connect(rollups.backfill_rollups, sender=self)
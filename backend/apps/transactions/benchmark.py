@@ -0,0 +1,95 @@
+"""Export benchmark: bytes and seconds per million rows for each format.
+
+Synthetic transactions are inserted for a throwaway user inside a
+transaction that is rolled back afterwards, so the benchmark can run
+against any database without leaving rows behind.
+"""
+from datetime import date, timedelta
+from decimal import Decimal
+import random
+import tempfile
+import time
+import uuid
+
+from django.contrib.auth import get_user_model
+from django.db import transaction as db_transaction
+
+from .exporters import EXPORT_FORMATS, ExportFormatError, write_by_financial_year
+from .models import Transaction
+
+CATEGORIES = ['Sales', 'Rent', 'Professional', 'Travel', 'Utilities', 'Equipment']
+
+def generate_transactions(user, rows, seed=0, batch_size=5000):
+    rng = random.Random(seed)
+    start = date(2021, 4, 1)
+    batch = []
+    for index in range(rows):
+        amount = Decimal(rng.randint(100, 5_000_000)) / 100
+        half_gst = (amount * Decimal('0.09')).quantize(Decimal('0.01'))
+        batch.append(Transaction(
+            user=user,
+            date=start + timedelta(days=rng.randint(0, 4 * 365)),
+            description=f'Benchmark transaction {index}',
+            amount=amount,
+            type=rng.choice(['income', 'expense']),
+            category=rng.choice(CATEGORIES),
+            vendor_name=f'Vendor {rng.randint(1, 500)}',
+            invoice_number=f'INV-{index:08d}',
+            gst_number='27AAPFU0939F1ZV',
+            cgst_amount=half_gst,
+            sgst_amount=half_gst,
+            tds_amount=(amount * Decimal('0.01')).quantize(Decimal('0.01')),
+        ))
+        if len(batch) >= batch_size:
+            Transaction.objects.bulk_create(batch)
+            batch = []
+    if batch:
+        Transaction.objects.bulk_create(batch)
+
+def _measure(write, rows):
+    with tempfile.TemporaryFile() as output:
+        started = time.perf_counter()
+        write(output)
+        seconds = time.perf_counter() - started
+        size = output.tell()
+    scale = 1_000_000 / rows
+    return {
+        'bytes': size,
+        'seconds': round(seconds, 3),
+        'bytes_per_million_rows': round(size * scale),
+        'seconds_per_million_rows': round(seconds * scale, 3),
+    }
+
+def benchmark_exports(rows=100_000, formats=None, partition=False, log=None):
+    """Export ``rows`` synthetic transactions in each format and compare against CSV"""
+    formats = formats or list(EXPORT_FORMATS)
+    report = {'rows': rows, 'formats': {}}
+    User = get_user_model()
+    with db_transaction.atomic():
+        user = User.objects.create_user(
+            username=f'export-benchmark-{uuid.uuid4().hex[:8]}',
+            email='export-benchmark@example.com',
+            password=None,
+        )
+        generate_transactions(user, rows)
+        queryset = Transaction.objects.filter(user=user).order_by('-date')
+        for name in formats:
+            try:
+                if partition:
+                    write = lambda output, name=name: write_by_financial_year(queryset, name, output)
+                else:
+                    write = lambda output, name=name: EXPORT_FORMATS[name]['writer'](queryset, output)
+                result = _measure(write, rows)
+            except (ExportFormatError, KeyError) as e:
+                result = {'error': str(e)}
+            report['formats'][name] = result
+            if log:
+                log(f'{name}: {result}')
+        db_transaction.set_rollback(True)
+
+    baseline = report['formats'].get('csv', {})
+    for result in report['formats'].values():
+        if baseline.get('bytes') and 'bytes' in result:
+            result['size_vs_csv'] = round(result['bytes'] / baseline['bytes'], 3)
+            result['time_vs_csv'] = round(result['seconds'] / max(baseline['seconds'], 1e-9), 3)
+    return report
@@ -0,0 +1,179 @@
+"""Transaction exports as CSV, XLSX and Parquet.
+
+Rows are read as ``values_list`` tuples through ``QuerySet.iterator`` (a
+server-side cursor on PostgreSQL), ``TRANSACTION_EXPORT_CHUNK_SIZE`` at a
+time, with the total tax and net amount computed in SQL. CSV is yielded a
+line at a time so the response starts immediately and memory does not grow
+with the number of rows exported.
+
+XLSX is written with openpyxl's write-only workbook, which streams rows to
+the sheet XML instead of keeping cells in memory. Parquet keeps dates and
+amounts typed (``date32`` and ``decimal128``) and is written one row group
+per ``TRANSACTION_EXPORT_ROW_GROUP_SIZE`` rows. Both formats need a
+seekable file, so they are written to a temporary file and then served.
+
+Any format can be split by financial year (April to March) into a ZIP
+holding one file per year.
+"""
+from datetime import date
+from itertools import islice
+import csv
+import io
+import shutil
+import tempfile
+import zipfile
+
+from django.conf import settings
+from django.db.models import F, Max, Min
+
+EXPORT_COLUMNS = [
+    ('Date', 'date'),
+    ('Description', 'description'),
+    ('Amount', 'amount'),
+    ('Type', 'type'),
+    ('Category', 'category'),
+    ('Status', 'status'),
+    ('Invoice Number', 'invoice_number'),
+    ('Vendor Name', 'vendor_name'),
+    ('GST Number', 'gst_number'),
+    ('CGST', 'cgst_amount'),
+    ('SGST', 'sgst_amount'),
+    ('IGST', 'igst_amount'),
+    ('TDS', 'tds_amount'),
+    ('Total Tax', 'export_total_tax'),
+    ('Net Amount', 'export_net_amount'),
+]
+
+# Precision of each decimal column, matching the model fields
+DECIMAL_COLUMNS = {
+    'amount': (15, 2),
+    'cgst_amount': (10, 2),
+    'sgst_amount': (10, 2),
+    'igst_amount': (10, 2),
+    'tds_amount': (10, 2),
+    'export_total_tax': (12, 2),
+    'export_net_amount': (16, 2),
+}
+
+class ExportFormatError(ValueError):
+    pass
+
+class Echo:
+    """A file-like object whose ``write`` returns the line instead of storing it"""
+
+    def write(self, value):
+        return value
+
+def export_rows(queryset, chunk_size=None):
+    """Yield one tuple per transaction in ``EXPORT_COLUMNS`` order"""
+    chunk_size = chunk_size or settings.TRANSACTION_EXPORT_CHUNK_SIZE
+    rows = queryset.annotate(
+        export_total_tax=F('cgst_amount') + F('sgst_amount') + F('igst_amount'),
+        export_net_amount=F('amount') - F('tds_amount'),
+    ).values_list(*[field for _, field in EXPORT_COLUMNS])
+    return rows.iterator(chunk_size=chunk_size)
+
+def iter_csv(queryset, chunk_size=None):
+    """Yield the export as CSV text, the header first and then a line per row"""
+    writer = csv.writer(Echo())
+    yield writer.writerow([title for title, _ in EXPORT_COLUMNS])
+    for row in export_rows(queryset, chunk_size):
+        yield writer.writerow(row)
+
+def write_csv(queryset, out, chunk_size=None):
+    text = io.TextIOWrapper(out, encoding='utf-8', newline='', write_through=True)
+    try:
+        for line in iter_csv(queryset, chunk_size):
+            text.write(line)
+    finally:
+        text.detach()
+
+def write_xlsx(queryset, out, chunk_size=None):
+    try:
+        from openpyxl import Workbook
+    except ImportError:
+        raise ExportFormatError('openpyxl is required for XLSX exports')
+    workbook = Workbook(write_only=True)
+    sheet = workbook.create_sheet('Transactions')
+    sheet.append([title for title, _ in EXPORT_COLUMNS])
+    for row in export_rows(queryset, chunk_size):
+        sheet.append(row)
+    workbook.save(out)
+
+def parquet_schema():
+    try:
+        import pyarrow as pa
+    except ImportError:
+        raise ExportFormatError('pyarrow is required for Parquet exports')
+    fields = []
+    for _, field in EXPORT_COLUMNS:
+        if field == 'date':
+            column_type = pa.date32()
+        elif field in DECIMAL_COLUMNS:
+            column_type = pa.decimal128(*DECIMAL_COLUMNS[field])
+        else:
+            column_type = pa.string()
+        fields.append(pa.field(field.replace('export_', ''), column_type))
+    return pa.schema(fields)
+
+def write_parquet(queryset, out, chunk_size=None, row_group_size=None):
+    schema = parquet_schema()
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+    row_group_size = row_group_size or settings.TRANSACTION_EXPORT_ROW_GROUP_SIZE
+    rows = export_rows(queryset, chunk_size)
+    with pq.ParquetWriter(out, schema, compression='snappy') as writer:
+        while True:
+            block = list(islice(rows, row_group_size))
+            if not block:
+                break
+            arrays = [
+                pa.array(values, type=field.type)
+                for values, field in zip(zip(*block), schema)
+            ]
+            writer.write_table(pa.Table.from_arrays(arrays, schema=schema), row_group_size=len(block))
+
+EXPORT_FORMATS = {
+    'csv': {'writer': write_csv, 'extension': 'csv', 'content_type': 'text/csv'},
+    'xlsx': {
+        'writer': write_xlsx,
+        'extension': 'xlsx',
+        'content_type': 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet',
+    },
+    'parquet': {'writer': write_parquet, 'extension': 'parquet', 'content_type': 'application/vnd.apache.parquet'},
+}
+
+def get_export_format(name):
+    export_format = EXPORT_FORMATS.get(name)
+    if export_format is None:
+        raise ExportFormatError(f"Unknown export format '{name}'. Use one of: {', '.join(EXPORT_FORMATS)}")
+    return export_format
+
+def financial_year(day):
+    """The starting calendar year of the April-March financial year holding ``day``"""
+    return day.year if day.month >= 4 else day.year - 1
+
+def financial_year_label(start):
+    return f'FY{start}-{(start + 1) % 100:02d}'
+
+def write_by_financial_year(queryset, format_name, out, basename='transactions', chunk_size=None):
+    """Write a ZIP with one ``format_name`` file per financial year in ``queryset``"""
+    export_format = get_export_format(format_name)
+    bounds = queryset.aggregate(first=Min('date'), last=Max('date'))
+    if bounds['first'] is None:
+        years = []
+    else:
+        years = range(financial_year(bounds['first']), financial_year(bounds['last']) + 1)
+    # XLSX and Parquet are compressed already
+    compression = zipfile.ZIP_DEFLATED if format_name == 'csv' else zipfile.ZIP_STORED
+    with zipfile.ZipFile(out, 'w', compression=compression) as archive:
+        for start in years:
+            part = queryset.filter(date__gte=date(start, 4, 1), date__lte=date(start + 1, 3, 31))
+            if not part.exists():
+                continue
+            name = f"{basename}_{financial_year_label(start)}.{export_format['extension']}"
+            with tempfile.TemporaryFile() as scratch:
+                export_format['writer'](part, scratch, chunk_size)
+                scratch.seek(0)
+                with archive.open(name, 'w') as member:
+                    shutil.copyfileobj(scratch, member)
@@ -0,0 +1,35 @@
+from django.utils.dateparse import parse_date
+from .search import search_transactions
+
+def filter_transactions(queryset, params):
+    """Apply the list view's query parameters (type, status, category, dates, search)"""
+    transaction_type = params.get('type')
+    status_filter = params.get('status')
+    category = params.get('category')
+    date_from = params.get('date_from')
+    date_to = params.get('date_to')
+    search = params.get('search')
+    
+    if transaction_type:
+        queryset = queryset.filter(type=transaction_type)
+    
+    if status_filter:
+        queryset = queryset.filter(status=status_filter)
+    
+    if category:
+        queryset = queryset.filter(category__icontains=category)
+    
+    if date_from:
+        date_from = parse_date(date_from)
+        if date_from:
+            queryset = queryset.filter(date__gte=date_from)
+    
+    if date_to:
+        date_to = parse_date(date_to)
+        if date_to:
+            queryset = queryset.filter(date__lte=date_to)
+    
+    if search:
+        queryset = search_transactions(queryset, search)
+    
+    return queryset
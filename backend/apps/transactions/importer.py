@@ -0,0 +1,261 @@
+"""Bulk transaction import from CSV and XLSX files.
+
+Files are read in chunks of ``TRANSACTION_IMPORT_CHUNK_SIZE`` rows (pandas'
+``chunksize`` for CSV, openpyxl's read-only row iterator for XLSX) and each
+chunk is validated as whole columns: dates, amounts, GSTIN format and tax
+sums are checked with vectorized pandas operations rather than a serializer
+per row. Rows that fail are reported with their line number and reasons;
+the rest are written with ``bulk_create`` and added to the monthly ledger
+rollups.
+"""
+from decimal import Decimal
+from itertools import islice
+from pathlib import Path
+from xml.etree.ElementTree import ParseError
+from zipfile import BadZipFile
+import time
+import logging
+
+import numpy as np
+import pandas as pd
+from django.conf import settings
+from django.db import transaction as db_transaction
+
+from .models import Transaction
+from .rollups import record_transactions
+
+logger = logging.getLogger(__name__)
+
+REQUIRED_COLUMNS = ['date', 'description', 'amount', 'type', 'category']
+TAX_COLUMNS = ['cgst_amount', 'sgst_amount', 'igst_amount', 'tds_amount']
+
+# Header spellings seen in exported books -> model field
+COLUMN_ALIASES = {
+    'transaction_date': 'date',
+    'narration': 'description',
+    'particulars': 'description',
+    'transaction_type': 'type',
+    'vendor': 'vendor_name',
+    'party_name': 'vendor_name',
+    'invoice_no': 'invoice_number',
+    'gstin': 'gst_number',
+    'gst_no': 'gst_number',
+    'cgst': 'cgst_amount',
+    'sgst': 'sgst_amount',
+    'igst': 'igst_amount',
+    'tds': 'tds_amount',
+}
+
+DATE_FORMATS = ['%Y-%m-%d', '%d/%m/%Y', '%d-%m-%Y', '%d-%b-%Y']
+GSTIN_PATTERN = r'^[0-9]{2}[A-Z]{5}[0-9]{4}[A-Z][1-9A-Z]Z[0-9A-Z]$'
+
+# Largest values the model's DecimalFields can hold
+MAX_AMOUNT = 10 ** 13
+MAX_TAX_AMOUNT = 10 ** 8
+FIELD_LENGTHS = {'description': 255, 'category': 50, 'invoice_number': 100,
+                 'vendor_name': 200, 'gst_number': 15}
+
+class ImportFormatError(ValueError):
+    pass
+
+def normalize_columns(columns):
+    names = []
+    for column in columns:
+        name = '_'.join(str(column or '').strip().lower().replace('.', ' ').split())
+        names.append(COLUMN_ALIASES.get(name, name))
+    return names
+
+def read_csv_chunks(file, chunk_size):
+    reader = pd.read_csv(file, chunksize=chunk_size, dtype=str, keep_default_na=False,
+                         skipinitialspace=True, encoding='utf-8-sig')
+    for chunk in reader:
+        yield chunk
+
+def read_xlsx_chunks(file, chunk_size):
+    from openpyxl import load_workbook
+    from openpyxl.utils.exceptions import InvalidFileException
+    # A corrupt workbook, or another file renamed to .xlsx, fails as a bad
+    # zip, a missing part (KeyError) or unparseable sheet XML
+    unreadable = (BadZipFile, InvalidFileException, KeyError, ParseError)
+    try:
+        workbook = load_workbook(file, read_only=True, data_only=True)
+    except unreadable as e:
+        raise ImportFormatError(f'Could not read file: {e}')
+    try:
+        rows = workbook.active.iter_rows(values_only=True)
+        header = next(rows, None)
+        if header is None:
+            return
+        start = 0
+        while True:
+            block = list(islice(rows, chunk_size))
+            if not block:
+                break
+            chunk = pd.DataFrame(block, columns=list(header), dtype=object)
+            chunk.index = pd.RangeIndex(start, start + len(block))
+            start += len(block)
+            yield chunk
+    except unreadable as e:
+        raise ImportFormatError(f'Could not read file: {e}')
+    finally:
+        workbook.close()
+
+READERS = {
+    '.csv': read_csv_chunks,
+    '.xlsx': read_xlsx_chunks,
+    '.xlsm': read_xlsx_chunks,
+}
+
+def _text(chunk, column):
+    if column not in chunk:
+        return pd.Series('', index=chunk.index, dtype=object)
+    return chunk[column].fillna('').astype(str).str.strip()
+
+def _parse_dates(values):
+    """Parse a column of dates, trying each accepted format on what is still unparsed"""
+    if pd.api.types.is_datetime64_any_dtype(values):
+        return values
+    dates = pd.Series(pd.NaT, index=values.index, dtype='datetime64[ns]')
+    is_datetime = pd.Series(False, index=values.index)
+    if values.dtype == object:
+        # XLSX cells may already hold datetimes
+        is_datetime = values.map(lambda value: hasattr(value, 'year'))
+    if is_datetime.any():
+        dates[is_datetime] = pd.to_datetime(values[is_datetime])
+    text = values.where(~is_datetime, '').fillna('').astype(str).str.strip()
+    for fmt in DATE_FORMATS:
+        missing = dates.isna() & (text != '')
+        if not missing.any():
+            break
+        dates[missing] = pd.to_datetime(text[missing], format=fmt, errors='coerce')
+    return dates
+
+def _parse_amounts(values):
+    """Parse a column of amounts, rounded to paise so checks see the stored value"""
+    text = values.fillna('').astype(str).str.replace(',', '', regex=False).str.strip()
+    return pd.to_numeric(text.replace('', np.nan), errors='coerce').round(2)
+
+def validate_chunk(chunk):
+    """Return ``(frame, errors)`` for one chunk.
+
+    ``frame`` holds the parsed columns and an ``ok`` flag per row; ``errors``
+    maps each failing row's index to its error messages.
+    """
+    frame = pd.DataFrame(index=chunk.index)
+    frame['date'] = _parse_dates(chunk['date'])
+    frame['amount'] = _parse_amounts(chunk['amount'])
+    for column in TAX_COLUMNS:
+        frame[column] = (_parse_amounts(chunk[column]) if column in chunk
+                         else pd.Series(0.0, index=chunk.index))
+    for column in ('description', 'category', 'invoice_number', 'vendor_name'):
+        frame[column] = _text(chunk, column)
+    frame['type'] = _text(chunk, 'type').str.lower()
+    frame['gst_number'] = _text(chunk, 'gst_number').str.upper()
+
+    blank_tax = {column: frame[column].isna() & (_text(chunk, column) == '') for column in TAX_COLUMNS}
+    for column in TAX_COLUMNS:
+        frame.loc[blank_tax[column], column] = 0.0
+    total_gst = frame['cgst_amount'] + frame['sgst_amount'] + frame['igst_amount']
+
+    checks = {
+        'Invalid or missing date': frame['date'].isna(),
+        'Invalid or missing amount': frame['amount'].isna(),
+        'Amount must be greater than zero': frame['amount'] <= 0,
+        'Amount is too large': frame['amount'] >= MAX_AMOUNT,
+        "Type must be 'income' or 'expense'": ~frame['type'].isin(['income', 'expense']),
+        'Description is required': frame['description'] == '',
+        'Category is required': frame['category'] == '',
+        'Invalid GSTIN format': (frame['gst_number'] != '')
+            & ~frame['gst_number'].str.match(GSTIN_PATTERN),
+        'CGST and SGST must be equal': (frame['cgst_amount'] - frame['sgst_amount']).abs() > 0.01,
+        'IGST cannot be combined with CGST/SGST': (frame['igst_amount'] > 0)
+            & ((frame['cgst_amount'] > 0) | (frame['sgst_amount'] > 0)),
+        'GST exceeds the amount': total_gst > frame['amount'],
+        'TDS exceeds the amount': frame['tds_amount'] > frame['amount'],
+    }
+    for column in TAX_COLUMNS:
+        label = column.replace('_amount', '').upper()
+        checks[f'Invalid {label} amount'] = frame[column].isna() | (frame[column] < 0)
+        checks[f'{label} amount is too large'] = frame[column] >= MAX_TAX_AMOUNT
+    for column, length in FIELD_LENGTHS.items():
+        checks[f'{column} is longer than {length} characters'] = frame[column].str.len() > length
+
+    failed = pd.DataFrame({message: mask.fillna(False).astype(bool) for message, mask in checks.items()})
+    frame['ok'] = ~failed.any(axis=1)
+
+    errors = {}
+    bad = failed[~frame['ok']]
+    if not bad.empty:
+        messages = np.array(bad.columns)
+        for index, flags in zip(bad.index, bad.to_numpy()):
+            errors[index] = messages[flags].tolist()
+    return frame, errors
+
+def _decimal(value):
+    return Decimal(f'{value:.2f}')
+
+def import_transactions(user, file, filename, chunk_size=None, dry_run=False):
+    """Validate and bulk-create transactions from an uploaded CSV or XLSX file.
+
+    Valid rows are imported even when others fail; ``dry_run`` only
+    validates. Returns a summary with the created ids and per-row errors
+    (row numbers are file lines, the header being line 1).
+    """
+    chunk_size = chunk_size or settings.TRANSACTION_IMPORT_CHUNK_SIZE
+    max_errors = settings.TRANSACTION_IMPORT_MAX_ERRORS
+    reader = READERS.get(Path(filename).suffix.lower())
+    if reader is None:
+        raise ImportFormatError('Only CSV and XLSX files can be imported')
+
+    summary = {'rows': 0, 'created': 0, 'error_count': 0, 'errors': [], 'transaction_ids': []}
+    started = time.perf_counter()
+    try:
+        chunks = reader(file, chunk_size)
+        with db_transaction.atomic():
+            for chunk in chunks:
+                chunk.columns = normalize_columns(chunk.columns)
+                missing = [column for column in REQUIRED_COLUMNS if column not in chunk.columns]
+                if missing:
+                    raise ImportFormatError(f"Missing required columns: {', '.join(missing)}")
+
+                frame, errors = validate_chunk(chunk)
+                summary['rows'] += len(frame)
+                summary['error_count'] += len(errors)
+                for index, messages in errors.items():
+                    if len(summary['errors']) < max_errors:
+                        summary['errors'].append({'row': int(index) + 2, 'errors': messages})
+
+                valid = frame[frame['ok']]
+                if dry_run or valid.empty:
+                    continue
+                transactions = [
+                    Transaction(
+                        user=user,
+                        date=row.date.date(),
+                        description=row.description,
+                        amount=_decimal(row.amount),
+                        type=row.type,
+                        category=row.category,
+                        invoice_number=row.invoice_number,
+                        vendor_name=row.vendor_name,
+                        gst_number=row.gst_number,
+                        cgst_amount=_decimal(row.cgst_amount),
+                        sgst_amount=_decimal(row.sgst_amount),
+                        igst_amount=_decimal(row.igst_amount),
+                        tds_amount=_decimal(row.tds_amount),
+                    )
+                    for row in valid.itertuples()
+                ]
+                Transaction.objects.bulk_create(transactions)
+                record_transactions(transactions)
+                summary['created'] += len(transactions)
+                summary['transaction_ids'].extend(str(txn.id) for txn in transactions)
+    except (pd.errors.ParserError, pd.errors.EmptyDataError, UnicodeDecodeError) as e:
+        raise ImportFormatError(f'Could not read file: {e}')
+
+    summary['seconds'] = round(time.perf_counter() - started, 3)
+    logger.info(
+        f"Imported {summary['created']} of {summary['rows']} transactions for user {user.id} "
+        f"in {summary['seconds']}s ({summary['error_count']} rows rejected)"
+    )
+    return summary
@@ -0,0 +1,36 @@
+import json
+from django.core.management.base import BaseCommand, CommandError
+from apps.transactions.benchmark import benchmark_exports
+from apps.transactions.exporters import EXPORT_FORMATS
+
+class Command(BaseCommand):
+    help = 'Time CSV, XLSX and Parquet transaction exports on synthetic rows and emit a JSON report'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=100000,
+                            help='Synthetic transactions to export (rolled back afterwards)')
+        parser.add_argument('--formats', default=','.join(EXPORT_FORMATS),
+                            help='Comma separated formats to compare')
+        parser.add_argument('--partition', action='store_true',
+                            help='Export a ZIP split by financial year instead of one file')
+        parser.add_argument('--output', help='Write the JSON report to this path')
+
+    def handle(self, *args, **options):
+        if options['rows'] < 1:
+            raise CommandError('--rows must be at least 1')
+        formats = [name.strip() for name in options['formats'].split(',') if name.strip()]
+        unknown = [name for name in formats if name not in EXPORT_FORMATS]
+        if unknown:
+            raise CommandError(f"Unknown formats: {', '.join(unknown)}")
+
+        report = benchmark_exports(
+            rows=options['rows'],
+            formats=formats,
+            partition=options['partition'],
+            log=self.stdout.write,
+        )
+        output = json.dumps(report, indent=2)
+        if options['output']:
+            with open(options['output'], 'w') as f:
+                f.write(output)
+        self.stdout.write(output)
@@ -0,0 +1,26 @@
+from django.core.management.base import BaseCommand, CommandError
+from apps.transactions.rollups import rebuild_rollups, verify_rollups
+
+class Command(BaseCommand):
+    help = 'Check the monthly ledger rollups against transactions, or rebuild them'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--user', dest='user_id', default=None,
+                            help='Only this user\'s rollups (default: all users)')
+        parser.add_argument('--verify', action='store_true',
+                            help='Report drifted rollup rows without changing anything')
+
+    def handle(self, *args, **options):
+        if options['verify']:
+            mismatches = verify_rollups(user_id=options['user_id'])
+            for mismatch in mismatches:
+                self.stdout.write(
+                    f"{mismatch['key']}: expected {mismatch['expected']}, stored {mismatch['stored']}"
+                )
+            if mismatches:
+                raise CommandError(f'{len(mismatches)} rollup rows do not match their transactions')
+            self.stdout.write(self.style.SUCCESS('Ledger rollups match transactions'))
+            return
+
+        rows = rebuild_rollups(user_id=options['user_id'])
+        self.stdout.write(self.style.SUCCESS(f'Rebuilt {rows} ledger rollup rows'))
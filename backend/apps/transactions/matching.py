@@ -0,0 +1,254 @@
+"""Automatic matching of processed invoice documents to transactions.
+
+Candidates are found through in-memory indexes rather than by comparing every
+document with every transaction: a hash index on (GSTIN, invoice number) and on
+invoice number alone, plus a per-day hash of transactions kept sorted by amount
+so an amount tolerance becomes a bisect range lookup inside the date window.
+"""
+from bisect import bisect_left, bisect_right
+from collections import defaultdict
+from dataclasses import dataclass, field
+from datetime import timedelta
+from decimal import Decimal
+import re
+import logging
+
+from django.conf import settings
+from django.db.models import Q, Value
+from django.db.models.functions import Replace, Upper
+
+from .models import Transaction
+from apps.documents.models import Document
+
+logger = logging.getLogger(__name__)
+
+MATCHABLE_CATEGORIES = ['invoice', 'receipt', 'purchase_order']
+
+# Separators stripped in SQL when pre-filtering on invoice numbers; anything
+# rarer is still caught by the date window and the in-memory index
+INVOICE_NUMBER_SEPARATORS = ['-', '/', ' ', '.', '_', '#', '\\']
+
+def normalize_invoice_number(value):
+    """Upper-case and strip separators so 'inv-001' and 'INV/001' compare equal"""
+    return re.sub(r'[^A-Z0-9]', '', (value or '').upper())
+
+def normalized_invoice_number_sql(field='invoice_number'):
+    """SQL expression approximating ``normalize_invoice_number`` for a column"""
+    expression = Upper(field)
+    for separator in INVOICE_NUMBER_SEPARATORS:
+        expression = Replace(expression, Value(separator), Value(''))
+    return expression
+
+def to_paise(amount):
+    return int((Decimal(amount) * 100).to_integral_value())
+
+@dataclass
+class MatchCandidate:
+    document_id: str
+    transaction_id: str
+    score: float
+    reasons: list = field(default_factory=list)
+
+    def as_dict(self):
+        return {
+            'document_id': self.document_id,
+            'transaction_id': self.transaction_id,
+            'score': round(self.score, 3),
+            'reasons': self.reasons,
+        }
+
+class InvoiceMatcher:
+    """Pair invoice documents with transactions by GSTIN, number, amount and date"""
+
+    INVOICE_NUMBER_WEIGHT = 0.5
+    GST_NUMBER_WEIGHT = 0.2
+    AMOUNT_WEIGHT = 0.2
+    DATE_WEIGHT = 0.1
+
+    def __init__(self, amount_tolerance=None, date_window_days=None, min_score=None):
+        self.amount_tolerance = Decimal(str(
+            amount_tolerance if amount_tolerance is not None
+            else getattr(settings, 'INVOICE_MATCH_AMOUNT_TOLERANCE', 0.01)
+        ))
+        self.date_window_days = int(
+            date_window_days if date_window_days is not None
+            else getattr(settings, 'INVOICE_MATCH_DATE_WINDOW_DAYS', 7)
+        )
+        self.min_score = float(
+            min_score if min_score is not None
+            else getattr(settings, 'INVOICE_MATCH_MIN_SCORE', 0.5)
+        )
+        self._rows = []
+        self._by_gst_and_number = defaultdict(list)
+        self._by_number = defaultdict(list)
+        self._by_day = {}
+
+    def build_index(self, transactions):
+        """Index transaction rows of (id, gst_number, invoice_number, date, amount)"""
+        by_day = defaultdict(list)
+        for row_index, (txn_id, gst_number, invoice_number, txn_date, amount) in enumerate(transactions):
+            number = normalize_invoice_number(invoice_number)
+            gst_number = (gst_number or '').upper()
+            self._rows.append((str(txn_id), gst_number, number, txn_date, to_paise(amount)))
+
+            if number:
+                self._by_number[number].append(row_index)
+                if gst_number:
+                    self._by_gst_and_number[(gst_number, number)].append(row_index)
+            by_day[txn_date.toordinal()].append((self._rows[-1][4], row_index))
+
+        # Each day bucket is sorted by amount so tolerance checks are bisect ranges
+        for day, entries in by_day.items():
+            entries.sort()
+            self._by_day[day] = ([amount for amount, _ in entries], [idx for _, idx in entries])
+        return self
+
+    def _tolerance_paise(self, amount_paise):
+        # Tolerance is relative to the invoice amount, with a floor of one rupee
+        return max(100, int(amount_paise * self.amount_tolerance))
+
+    def _candidate_rows(self, gst_number, number, invoice_date, amount_paise):
+        rows = set()
+        if number:
+            rows.update(self._by_gst_and_number.get((gst_number, number), ()))
+            rows.update(self._by_number.get(number, ()))
+
+        if invoice_date is not None and amount_paise:
+            tolerance = self._tolerance_paise(amount_paise)
+            center = invoice_date.toordinal()
+            for day in range(center - self.date_window_days, center + self.date_window_days + 1):
+                bucket = self._by_day.get(day)
+                if not bucket:
+                    continue
+                amounts, indexes = bucket
+                lo = bisect_left(amounts, amount_paise - tolerance)
+                hi = bisect_right(amounts, amount_paise + tolerance)
+                rows.update(indexes[lo:hi])
+        return rows
+
+    def _score(self, document_row, transaction_row):
+        _, gst_number, number, invoice_date, amount_paise = document_row
+        _, txn_gst, txn_number, txn_date, txn_amount = transaction_row
+        score = 0.0
+        reasons = []
+
+        if number and number == txn_number:
+            score += self.INVOICE_NUMBER_WEIGHT
+            reasons.append('invoice_number')
+        if gst_number and gst_number == txn_gst:
+            score += self.GST_NUMBER_WEIGHT
+            reasons.append('gst_number')
+        if amount_paise and abs(amount_paise - txn_amount) <= self._tolerance_paise(amount_paise):
+            score += self.AMOUNT_WEIGHT
+            reasons.append('amount')
+        if invoice_date is not None and abs((invoice_date - txn_date).days) <= self.date_window_days:
+            score += self.DATE_WEIGHT
+            reasons.append('date')
+        return score, reasons
+
+    def match(self, documents, existing_links=()):
+        """Return one-to-one match candidates for document rows
+
+        ``documents`` yields (id, gst_number, invoice_number, invoice_date,
+        invoice_amount) and ``existing_links`` holds (document_id,
+        transaction_id) pairs that are already linked. A document or
+        transaction in any existing link is not matched again.
+        """
+        linked_documents, linked_transactions = set(), set()
+        for doc_id, txn_id in existing_links:
+            linked_documents.add(str(doc_id))
+            linked_transactions.add(str(txn_id))
+        candidates = []
+
+        for doc_id, gst_number, invoice_number, invoice_date, amount in documents:
+            if str(doc_id) in linked_documents:
+                continue
+            document_row = (
+                str(doc_id),
+                (gst_number or '').upper(),
+                normalize_invoice_number(invoice_number),
+                invoice_date,
+                to_paise(amount) if amount is not None else 0,
+            )
+            for row_index in self._candidate_rows(*document_row[1:]):
+                transaction_row = self._rows[row_index]
+                if transaction_row[0] in linked_transactions:
+                    continue
+                score, reasons = self._score(document_row, transaction_row)
+                if score >= self.min_score:
+                    candidates.append(MatchCandidate(document_row[0], transaction_row[0], score, reasons))
+
+        # Greedy assignment, best scores first, so each side is used at most once
+        candidates.sort(key=lambda candidate: candidate.score, reverse=True)
+        used_documents, used_transactions, matches = set(), set(), []
+        for candidate in candidates:
+            if candidate.document_id in used_documents or candidate.transaction_id in used_transactions:
+                continue
+            used_documents.add(candidate.document_id)
+            used_transactions.add(candidate.transaction_id)
+            matches.append(candidate)
+        return matches
+
+def link_matches(matches, batch_size=1000):
+    """Create Transaction.documents links for matches in bulk"""
+    through = Transaction.documents.through
+    links = [
+        through(transaction_id=match.transaction_id, document_id=match.document_id)
+        for match in matches
+    ]
+    through.objects.bulk_create(links, batch_size=batch_size, ignore_conflicts=True)
+    return len(links)
+
+def match_documents_for_user(user, document_ids=None, apply=False, auto_apply_score=None, **matcher_options):
+    """Match a user's processed invoice documents to their transactions
+
+    Returns the proposed matches and, when ``apply`` is set, links every
+    proposal scoring at least ``auto_apply_score`` (all proposals by default).
+    """
+    # Documents and transactions that already have a link are never re-matched
+    documents = Document.objects.filter(
+        user=user,
+        status='completed',
+        category__in=MATCHABLE_CATEGORIES,
+        linked_transactions__isnull=True,
+    ).filter(
+        Q(invoice_amount__isnull=False) | ~Q(invoice_number='')
+    )
+    if document_ids is not None:
+        documents = documents.filter(id__in=document_ids)
+
+    document_rows = list(documents.values_list(
+        'id', 'gst_number', 'invoice_number', 'invoice_date', 'invoice_amount'
+    ))
+    if not document_rows:
+        return {'matches': [], 'applied': 0}
+
+    matcher = InvoiceMatcher(**matcher_options)
+
+    # Only load transactions that could fall inside an index lookup: those sharing
+    # a normalized invoice number, or dated inside the window around the documents' dates
+    transactions = Transaction.objects.filter(user=user, documents__isnull=True)
+    window = timedelta(days=matcher.date_window_days)
+    invoice_dates = [row[3] for row in document_rows if row[3] is not None]
+    numbers = {normalize_invoice_number(row[2]) for row in document_rows} - {''}
+    candidate_filter = Q(pk__in=[])
+    if numbers:
+        transactions = transactions.alias(normalized_number=normalized_invoice_number_sql())
+        candidate_filter |= Q(normalized_number__in=numbers)
+    if invoice_dates:
+        candidate_filter |= Q(date__range=(min(invoice_dates) - window, max(invoice_dates) + window))
+    transactions = transactions.filter(candidate_filter)
+
+    matcher.build_index(transactions.values_list(
+        'id', 'gst_number', 'invoice_number', 'date', 'amount'
+    ).iterator(chunk_size=5000))
+
+    matches = matcher.match(document_rows)
+
+    applied = 0
+    if apply:
+        threshold = matcher.min_score if auto_apply_score is None else auto_apply_score
+        applied = link_matches([match for match in matches if match.score >= threshold])
+
+    logger.info(f"Matched {len(matches)} documents for user {user.id}, linked {applied}")
+    return {'matches': [match.as_dict() for match in matches], 'applied': applied}
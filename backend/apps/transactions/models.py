@@ -57,6 +57,13 @@ class Transaction(models.Model):
     class Meta:
         db_table = 'transactions'
         ordering = ['-date', '-created_at']
+        indexes = [
+            # Keyset pagination of the transaction list and date-range summaries
+            models.Index(fields=['user', '-date', '-created_at', '-id']),
+            # List filters and review queues: equality columns first, then the range
+            models.Index(fields=['user', 'status', 'date']),
+            models.Index(fields=['user', 'type', 'date']),
+        ]
     
     def __str__(self):
         return f"{self.description} - {self.amount}"
@@ -125,4 +132,33 @@ class BankAccount(models.Model):
         db_table = 'bank_accounts'
     
     def __str__(self):
-        return f"{self.bank_name} - {self.account_number[-4:]}"
\ No newline at end of file
+        return f"{self.bank_name} - {self.account_number[-4:]}"
+
+class LedgerRollup(models.Model):
+    """Per-user monthly totals of transactions by type, category and status.
+
+    Kept current by the signal handlers in ``rollups`` so summaries read a
+    few rows per month instead of every transaction.
+    """
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='ledger_rollups')
+    month = models.DateField()  # first day of the month
+    type = models.CharField(max_length=10, choices=Transaction.TYPE_CHOICES)
+    category = models.CharField(max_length=50)
+    status = models.CharField(max_length=10, choices=Transaction.STATUS_CHOICES)
+    
+    amount = models.DecimalField(max_digits=17, decimal_places=2, default=0)
+    cgst_amount = models.DecimalField(max_digits=17, decimal_places=2, default=0)
+    sgst_amount = models.DecimalField(max_digits=17, decimal_places=2, default=0)
+    igst_amount = models.DecimalField(max_digits=17, decimal_places=2, default=0)
+    tds_amount = models.DecimalField(max_digits=17, decimal_places=2, default=0)
+    count = models.IntegerField(default=0)
+    
+    updated_at = models.DateTimeField(auto_now=True)
+    
+    class Meta:
+        db_table = 'ledger_rollups'
+        unique_together = ['user', 'month', 'type', 'category', 'status']
+        ordering = ['month', 'type', 'category']
+    
+    def __str__(self):
+        return f"{self.user_id} {self.month:%Y-%m} {self.type} {self.category}: {self.amount}"
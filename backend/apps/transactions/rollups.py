@@ -0,0 +1,183 @@
+"""Incremental maintenance of the monthly ``LedgerRollup`` table.
+
+Each transaction contributes its amount, taxes and a count of one to the
+rollup row for (user, month, type, category, status). Saving a transaction
+moves its contribution from the old row to the new one, deleting removes
+it, and bulk paths that skip model signals (``bulk_create`` in the
+importers) call ``record_transactions`` themselves. Deltas are applied with
+``F()`` updates, so concurrent writers do not overwrite each other.
+
+``rebuild_rollups`` recomputes the table from ``Transaction`` and
+``verify_rollups`` reports rows that have drifted. After ``migrate``,
+``backfill_rollups`` builds the table once if it is empty while
+transactions exist, so rows written before the rollups were introduced
+are counted.
+"""
+from collections import defaultdict
+from decimal import Decimal
+import logging
+
+from django.db import DatabaseError, IntegrityError, transaction as db_transaction
+from django.db.models import Count, F, Sum
+from django.db.models.functions import TruncMonth
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+from django.utils.dateparse import parse_date
+
+from .models import LedgerRollup, Transaction
+
+logger = logging.getLogger(__name__)
+
+KEY_FIELDS = ['user_id', 'month', 'type', 'category', 'status']
+AMOUNT_FIELDS = ['amount', 'cgst_amount', 'sgst_amount', 'igst_amount', 'tds_amount']
+ROLLUP_SOURCE_FIELDS = {'user', 'user_id', 'date', 'type', 'category', 'status', *AMOUNT_FIELDS}
+
+def rollup_key(transaction):
+    day = transaction.date
+    if isinstance(day, str):
+        day = parse_date(day)
+    return (
+        transaction.user_id,
+        day.replace(day=1),
+        transaction.type,
+        transaction.category,
+        transaction.status,
+    )
+
+def _contribution(transaction):
+    return [Decimal(str(getattr(transaction, field) or 0)) for field in AMOUNT_FIELDS] + [1]
+
+def _add(deltas, key, values, sign):
+    totals = deltas[key]
+    for index, value in enumerate(values):
+        totals[index] += sign * value
+
+def apply_deltas(deltas):
+    """Add ``{key: [amount, cgst, sgst, igst, tds, count]}`` to the rollup rows"""
+    with db_transaction.atomic():
+        for key, values in deltas.items():
+            if not any(values):
+                continue
+            lookup = dict(zip(KEY_FIELDS, key))
+            changes = {field: F(field) + value for field, value in zip(AMOUNT_FIELDS + ['count'], values)}
+            if LedgerRollup.objects.filter(**lookup).update(**changes):
+                continue
+            if values[-1] <= 0:
+                # Removing from a row that is not there: the rollup was deleted
+                # with its user, or predates a rebuild. Never create a
+                # negative row.
+                continue
+            try:
+                with db_transaction.atomic():
+                    LedgerRollup.objects.create(
+                        **lookup, **dict(zip(AMOUNT_FIELDS + ['count'], values))
+                    )
+            except IntegrityError:
+                # Another writer created the row first
+                LedgerRollup.objects.filter(**lookup).update(**changes)
+
+def record_transactions(transactions, sign=1):
+    """Add (or with ``sign=-1`` remove) transactions that bypassed the model signals"""
+    deltas = defaultdict(lambda: [Decimal('0')] * len(AMOUNT_FIELDS) + [0])
+    for transaction in transactions:
+        _add(deltas, rollup_key(transaction), _contribution(transaction), sign)
+    apply_deltas(deltas)
+
+@receiver(pre_save, sender=Transaction)
+def remember_rollup_contribution(sender, instance, raw=False, update_fields=None, **kwargs):
+    instance._rollup_previous = None
+    if raw or instance._state.adding:
+        return
+    if update_fields is not None and not ROLLUP_SOURCE_FIELDS.intersection(update_fields):
+        return
+    previous = Transaction.objects.filter(pk=instance.pk).only(
+        'user_id', 'date', 'type', 'category', 'status', *AMOUNT_FIELDS
+    ).first()
+    if previous is not None:
+        instance._rollup_previous = (rollup_key(previous), _contribution(previous))
+
+@receiver(post_save, sender=Transaction)
+def update_rollup_on_save(sender, instance, created, raw=False, update_fields=None, **kwargs):
+    if raw:
+        return
+    previous = getattr(instance, '_rollup_previous', None)
+    if not created and previous is None:
+        # Either a save that touched no rollup field or a row we could not read
+        return
+    deltas = defaultdict(lambda: [Decimal('0')] * len(AMOUNT_FIELDS) + [0])
+    if previous is not None:
+        _add(deltas, previous[0], previous[1], -1)
+    _add(deltas, rollup_key(instance), _contribution(instance), 1)
+    apply_deltas(deltas)
+    instance._rollup_previous = None
+
+@receiver(post_delete, sender=Transaction)
+def update_rollup_on_delete(sender, instance, **kwargs):
+    record_transactions([instance], sign=-1)
+
+def _expected_rollups(user_id=None, using='default'):
+    queryset = Transaction.objects.using(using)
+    if user_id is not None:
+        queryset = queryset.filter(user_id=user_id)
+    rows = (
+        queryset.order_by()
+        .annotate(month=TruncMonth('date'))
+        .values('user_id', 'month', 'type', 'category', 'status')
+        .annotate(count=Count('id'), **{field + '_total': Sum(field) for field in AMOUNT_FIELDS})
+    )
+    return {
+        tuple(row[field] for field in KEY_FIELDS):
+            [row[field + '_total'] or Decimal('0') for field in AMOUNT_FIELDS] + [row['count']]
+        for row in rows
+    }
+
+def _stored_rollups(user_id=None):
+    queryset = LedgerRollup.objects.all()
+    if user_id is not None:
+        queryset = queryset.filter(user_id=user_id)
+    return {
+        tuple(row[field] for field in KEY_FIELDS): [row[field] for field in AMOUNT_FIELDS] + [row['count']]
+        for row in queryset.values(*KEY_FIELDS, *AMOUNT_FIELDS, 'count')
+        if row['count'] or any(row[field] for field in AMOUNT_FIELDS)
+    }
+
+def rebuild_rollups(user_id=None, using='default'):
+    """Recompute the rollup rows from Transaction; returns the number of rows written"""
+    expected = _expected_rollups(user_id, using)
+    with db_transaction.atomic(using=using):
+        queryset = LedgerRollup.objects.using(using)
+        if user_id is not None:
+            queryset = queryset.filter(user_id=user_id)
+        queryset.delete()
+        LedgerRollup.objects.using(using).bulk_create([
+            LedgerRollup(**dict(zip(KEY_FIELDS, key)), **dict(zip(AMOUNT_FIELDS + ['count'], values)))
+            for key, values in expected.items()
+        ], batch_size=1000)
+    return len(expected)
+
+def backfill_rollups(using='default', **kwargs):
+    """Build the rollups if none exist yet but transactions do; connected to ``post_migrate``"""
+    try:
+        if LedgerRollup.objects.using(using).exists() or not Transaction.objects.using(using).exists():
+            return
+        rows = rebuild_rollups(using=using)
+    except DatabaseError as e:
+        logger.error(f"Could not backfill ledger rollups on '{using}': {e}")
+        return
+    logger.info(f"Backfilled {rows} ledger rollup rows on '{using}'")
+
+def verify_rollups(user_id=None):
+    """List rollup keys whose stored totals differ from the transactions"""
+    expected = _expected_rollups(user_id)
+    stored = _stored_rollups(user_id)
+    zero = [Decimal('0')] * len(AMOUNT_FIELDS) + [0]
+    mismatches = []
+    for key in sorted(set(expected) | set(stored), key=str):
+        want, have = expected.get(key, zero), stored.get(key, zero)
+        if any(abs(Decimal(a) - Decimal(b)) >= Decimal('0.01') for a, b in zip(want, have)):
+            mismatches.append({
+                'key': dict(zip(KEY_FIELDS, key)),
+                'expected': dict(zip(AMOUNT_FIELDS + ['count'], want)),
+                'stored': dict(zip(AMOUNT_FIELDS + ['count'], have)),
+            })
+    return mismatches
@@ -0,0 +1,169 @@
+"""Indexed, ranked transaction search.
+
+The list search used to OR three ``icontains`` predicates, which reads every
+one of the user's transactions. Instead the search text is split into
+words and each word is matched as a prefix, all words required, against an
+index over description, vendor name and invoice number:
+
+* PostgreSQL: a GIN index on the ``to_tsvector('simple', ...)`` of the three
+  columns, queried with ``to_tsquery('simple', 'word:* & ...')`` and ranked
+  with ``ts_rank``. Being an expression index it is maintained by the
+  database on every write.
+* SQLite: an FTS5 table kept in sync by triggers, so rows written with
+  ``bulk_create`` or raw SQL are indexed too. Ranked with ``bm25``, invoice
+  number hits counting most. ``transactions`` has a UUID primary key, and
+  its implicit ``rowid`` may be renumbered by ``VACUUM``, so index rows are
+  keyed through ``transactions_fts_keys``. That table maps each transaction
+  id to an explicit ``INTEGER PRIMARY KEY``, which ``VACUUM`` keeps.
+
+Both are installed after ``migrate``. Other databases, an SQLite build
+without FTS5, or ``TRANSACTION_SEARCH_BACKEND = 'basic'`` use the old
+``icontains`` filter.
+"""
+import re
+import logging
+
+from django.conf import settings
+from django.db import DatabaseError, connections
+from django.db.models import BooleanField, FloatField, Q
+from django.db.models.expressions import RawSQL
+
+logger = logging.getLogger(__name__)
+
+FTS_TABLE = 'transactions_fts'
+FTS_KEYS_TABLE = 'transactions_fts_keys'
+SEARCH_COLUMNS = ['description', 'vendor_name', 'invoice_number']
+MAX_SEARCH_TERMS = 8
+
+# Relative weight of a hit in each column, in SEARCH_COLUMNS order
+BM25_WEIGHTS = '1.0, 2.0, 4.0'
+
+POSTGRES_VECTOR = (
+    "to_tsvector('simple', coalesce(\"transactions\".\"description\", '') || ' ' || "
+    "coalesce(\"transactions\".\"vendor_name\", '') || ' ' || "
+    "coalesce(\"transactions\".\"invoice_number\", ''))"
+)
+
+POSTGRES_SETUP = [
+    f'CREATE INDEX IF NOT EXISTS transactions_search_idx ON transactions USING gin ({POSTGRES_VECTOR})',
+]
+
+SQLITE_SETUP = [
+    f"""CREATE TABLE {FTS_KEYS_TABLE} (
+        key INTEGER PRIMARY KEY,
+        transaction_id char(32) NOT NULL UNIQUE
+    )""",
+    f"""CREATE VIRTUAL TABLE {FTS_TABLE} USING fts5(
+        description, vendor_name, invoice_number,
+        tokenize='unicode61 remove_diacritics 2', prefix='2 3'
+    )""",
+    f"""CREATE TRIGGER {FTS_TABLE}_insert AFTER INSERT ON transactions BEGIN
+        INSERT INTO {FTS_KEYS_TABLE}(transaction_id) VALUES (new.id);
+        INSERT INTO {FTS_TABLE}(rowid, description, vendor_name, invoice_number)
+        VALUES ((SELECT key FROM {FTS_KEYS_TABLE} WHERE transaction_id = new.id),
+                new.description, new.vendor_name, new.invoice_number);
+    END""",
+    f"""CREATE TRIGGER {FTS_TABLE}_delete AFTER DELETE ON transactions BEGIN
+        DELETE FROM {FTS_TABLE}
+        WHERE rowid = (SELECT key FROM {FTS_KEYS_TABLE} WHERE transaction_id = old.id);
+        DELETE FROM {FTS_KEYS_TABLE} WHERE transaction_id = old.id;
+    END""",
+    f"""CREATE TRIGGER {FTS_TABLE}_update AFTER UPDATE OF description, vendor_name, invoice_number
+    ON transactions BEGIN
+        UPDATE {FTS_TABLE}
+        SET description = new.description, vendor_name = new.vendor_name, invoice_number = new.invoice_number
+        WHERE rowid = (SELECT key FROM {FTS_KEYS_TABLE} WHERE transaction_id = new.id);
+    END""",
+    # Index rows that existed before the tables were created
+    f"INSERT INTO {FTS_KEYS_TABLE}(transaction_id) SELECT id FROM transactions",
+    f"""INSERT INTO {FTS_TABLE}(rowid, description, vendor_name, invoice_number)
+        SELECT k.key, t.description, t.vendor_name, t.invoice_number
+        FROM transactions t JOIN {FTS_KEYS_TABLE} k ON k.transaction_id = t.id""",
+]
+
+# The earlier index was keyed on the implicit rowid of ``transactions``
+SQLITE_TEARDOWN = [
+    f'DROP TRIGGER IF EXISTS {FTS_TABLE}_insert',
+    f'DROP TRIGGER IF EXISTS {FTS_TABLE}_delete',
+    f'DROP TRIGGER IF EXISTS {FTS_TABLE}_update',
+    f'DROP TABLE IF EXISTS {FTS_TABLE}',
+]
+
+# Database alias -> 'postgres', 'fts5' or 'basic'
+_backends = {}
+
+def install_search_index(using='default', **kwargs):
+    """Create the search index for ``using``; connected to ``post_migrate``"""
+    connection = connections[using]
+    _backends.pop(using, None)
+    try:
+        with connection.cursor() as cursor:
+            if connection.vendor == 'postgresql':
+                for statement in POSTGRES_SETUP:
+                    cursor.execute(statement)
+            elif connection.vendor == 'sqlite':
+                cursor.execute("SELECT 1 FROM sqlite_master WHERE name = %s", [FTS_KEYS_TABLE])
+                if cursor.fetchone() is None:
+                    for statement in SQLITE_TEARDOWN + SQLITE_SETUP:
+                        cursor.execute(statement)
+    except DatabaseError as e:
+        logger.error(f"Could not install transaction search index on '{using}': {e}")
+
+def search_backend(using='default'):
+    if settings.TRANSACTION_SEARCH_BACKEND == 'basic':
+        return 'basic'
+    if using not in _backends:
+        connection = connections[using]
+        backend = 'basic'
+        if connection.vendor == 'postgresql':
+            backend = 'postgres'
+        elif connection.vendor == 'sqlite':
+            with connection.cursor() as cursor:
+                cursor.execute("SELECT 1 FROM sqlite_master WHERE name = %s", [FTS_KEYS_TABLE])
+                if cursor.fetchone() is not None:
+                    backend = 'fts5'
+        _backends[using] = backend
+    return _backends[using]
+
+def search_terms(text):
+    """Lower-cased words of ``text``; punctuation such as invoice dashes separates words"""
+    return re.findall(r'\w+', text.lower())[:MAX_SEARCH_TERMS]
+
+def basic_search(queryset, text):
+    return queryset.filter(
+        Q(description__icontains=text) |
+        Q(vendor_name__icontains=text) |
+        Q(invoice_number__icontains=text)
+    )
+
+def search_transactions(queryset, text):
+    """Filter ``queryset`` to transactions matching every word of ``text`` as a prefix.
+
+    Indexed backends annotate ``search_rank`` (higher is better) and order by it.
+    """
+    terms = search_terms(text)
+    backend = search_backend(queryset.db)
+    if not terms or backend == 'basic':
+        return basic_search(queryset, text)
+
+    if backend == 'postgres':
+        query = ' & '.join(f'{term}:*' for term in terms)
+        matches = RawSQL(f"{POSTGRES_VECTOR} @@ to_tsquery('simple', %s)", [query],
+                         output_field=BooleanField())
+        rank = RawSQL(f"ts_rank({POSTGRES_VECTOR}, to_tsquery('simple', %s))", [query],
+                      output_field=FloatField())
+    else:
+        query = ' '.join(f'"{term}"*' for term in terms)
+        matches = RawSQL(
+            f'"transactions"."id" IN (SELECT transaction_id FROM {FTS_KEYS_TABLE} WHERE key IN '
+            f'(SELECT rowid FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %s))',
+            [query], output_field=BooleanField()
+        )
+        # A MATCH with a rowid constraint seeks straight to that row in FTS5
+        rank = RawSQL(
+            f'(SELECT -bm25({FTS_TABLE}, {BM25_WEIGHTS}) FROM {FTS_TABLE} '
+            f'WHERE {FTS_TABLE} MATCH %s AND rowid = '
+            f'(SELECT key FROM {FTS_KEYS_TABLE} WHERE transaction_id = "transactions"."id"))',
+            [query], output_field=FloatField()
+        )
+    return queryset.filter(matches).annotate(search_rank=rank).order_by('-search_rank', '-date', '-created_at')
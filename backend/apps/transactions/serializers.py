@@ -1,6 +1,9 @@
 from rest_framework import serializers
+from django.db.models import F
 from .models import Transaction, TransactionCategory, RecurringTransaction, BankAccount
+from apps.documents.models import Document
 from apps.documents.serializers import DocumentSerializer
+from taxora.fieldsets import ValuesListSerializer
 
 class TransactionCategorySerializer(serializers.ModelSerializer):
     class Meta:
@@ -25,6 +28,47 @@ class TransactionSerializer(serializers.ModelSerializer):
         read_only_fields = ['id', 'ai_analysis', 'confidence_score', 'anomaly_flags', 
                            'reviewed_by_name', 'reviewed_at', 'created_at', 'updated_at']
 
+class TransactionListSerializer(ValuesListSerializer):
+    """Transaction list rows; documents only with ?expand=documents"""
+    fields = {
+        'id': None, 'date': None, 'description': None, 'amount': None, 'type': None,
+        'category': None, 'category_name': 'category', 'status': None,
+        'invoice_number': None, 'vendor_name': None, 'gst_number': None,
+        'cgst_amount': None, 'sgst_amount': None, 'igst_amount': None, 'tds_amount': None,
+        'total_tax_amount': F('cgst_amount') + F('sgst_amount') + F('igst_amount'),
+        'net_amount': F('amount') - F('tds_amount'),
+        'ai_analysis': None, 'confidence_score': None, 'anomaly_flags': None,
+        'reviewed_at': None, 'review_notes': None, 'created_at': None, 'updated_at': None,
+    }
+    method_fields = {'reviewed_by_name': ['reviewed_by__first_name', 'reviewed_by__last_name']}
+    expandable = {'documents'}
+    raw_fields = {'anomaly_flags', 'total_tax_amount', 'net_amount'}
+    nullable_relation_fields = {'reviewed_by_name'}
+
+    def get_reviewed_by_name(self, row):
+        if row['reviewed_by__first_name'] is None:
+            return None
+        return f"{row['reviewed_by__first_name']} {row['reviewed_by__last_name']}".strip()
+
+    def expand_documents(self, rows):
+        links = list(Transaction.documents.through.objects.filter(
+            transaction_id__in=[row['id'] for row in rows]
+        ).order_by('-document__created_at').values_list('transaction_id', 'document_id'))
+        documents = {
+            document.id: document for document in
+            Document.objects.filter(id__in={document_id for _, document_id in links}).select_related('user')
+        }
+        serialized = {
+            document_id: data for document_id, data in zip(
+                documents, DocumentSerializer(documents.values(), many=True, context=self.context).data
+            )
+        }
+        by_transaction = {}
+        for transaction_id, document_id in links:
+            by_transaction.setdefault(transaction_id, []).append(serialized[document_id])
+        for row in rows:
+            row['documents'] = by_transaction.get(row['id'], [])
+
 class TransactionCreateSerializer(serializers.ModelSerializer):
     document_ids = serializers.ListField(child=serializers.UUIDField(), required=False)
     
@@ -68,6 +112,18 @@ class BankAccountSerializer(serializers.ModelSerializer):
         validated_data['user'] = self.context['request'].user
         return super().create(validated_data)
 
+class TransactionSummaryBreakdownSerializer(serializers.Serializer):
+    month = serializers.DateField()
+    category = serializers.CharField()
+    total_income = serializers.DecimalField(max_digits=15, decimal_places=2)
+    total_expenses = serializers.DecimalField(max_digits=15, decimal_places=2)
+    net_profit = serializers.DecimalField(max_digits=15, decimal_places=2)
+    total_gst_collected = serializers.DecimalField(max_digits=15, decimal_places=2)
+    total_gst_paid = serializers.DecimalField(max_digits=15, decimal_places=2)
+    total_tds = serializers.DecimalField(max_digits=15, decimal_places=2)
+    transaction_count = serializers.IntegerField()
+    pending_reviews = serializers.IntegerField()
+
 class TransactionSummarySerializer(serializers.Serializer):
     total_income = serializers.DecimalField(max_digits=15, decimal_places=2)
     total_expenses = serializers.DecimalField(max_digits=15, decimal_places=2)
@@ -76,4 +132,5 @@ class TransactionSummarySerializer(serializers.Serializer):
     total_gst_paid = serializers.DecimalField(max_digits=15, decimal_places=2)
     total_tds = serializers.DecimalField(max_digits=15, decimal_places=2)
     transaction_count = serializers.IntegerField()
-    pending_reviews = serializers.IntegerField()
\ No newline at end of file
+    pending_reviews = serializers.IntegerField()
+    breakdown = TransactionSummaryBreakdownSerializer(many=True, required=False)
@@ -0,0 +1,426 @@
+"""Bank statement import.
+
+Statements are read one row at a time: ``csv.reader`` for CSV, openpyxl's
+read-only worksheet for XLSX and ``iter_pdf_text`` a page at a time for PDF.
+Each row is normalized into a ``StatementRow`` and written as a ``Transaction``
+with ``bulk_create`` in chunks of ``STATEMENT_IMPORT_CHUNK_SIZE``, so memory
+is bounded by one chunk however long the statement is.
+
+Debit and credit come from separate columns, a signed amount, or a Dr/Cr
+marker. PDF text loses empty columns, so a lone amount there is signed by how
+it moved the running balance.
+
+PDF statements are untrusted input for pdfplumber, so with
+``EXTRACTION_ISOLATION`` they are parsed by ``read_statement`` in an
+extraction worker. The worker sends the rows back over its pipe a chunk at a
+time, and ``import_statement`` writes each chunk as it arrives, so neither
+process holds the whole statement.
+"""
+from dataclasses import dataclass
+from datetime import date, datetime
+from decimal import Decimal, InvalidOperation
+from itertools import islice
+from pathlib import Path
+from typing import Optional
+import csv
+import re
+import time
+import logging
+
+from django.conf import settings
+from django.db import transaction as db_transaction
+
+from .models import Transaction
+from .rollups import record_transactions
+
+logger = logging.getLogger(__name__)
+
+STATEMENT_CATEGORY = 'Uncategorized'
+
+# Normalized header text -> statement field
+COLUMN_ALIASES = {
+    'date': ['date', 'txn date', 'tran date', 'transaction date', 'posting date', 'value date'],
+    'description': ['description', 'narration', 'particulars', 'details', 'remarks',
+                    'transaction details', 'transaction remarks'],
+    'debit': ['debit', 'debits', 'withdrawal', 'withdrawals', 'withdrawal amt', 'debit amount',
+              'debit amt', 'dr amount'],
+    'credit': ['credit', 'credits', 'deposit', 'deposits', 'deposit amt', 'credit amount',
+               'credit amt', 'cr amount'],
+    'amount': ['amount', 'transaction amount', 'txn amount'],
+    'direction': ['dr/cr', 'cr/dr', 'debit/credit', 'type'],
+    'balance': ['balance', 'closing balance', 'running balance', 'balance amt', 'available balance'],
+}
+HEADER_FIELDS = {alias: name for name, aliases in COLUMN_ALIASES.items() for alias in aliases}
+
+DATE_FORMATS = ['%d/%m/%Y', '%d-%m-%Y', '%d/%m/%y', '%d-%m-%y', '%d-%b-%Y', '%d %b %Y',
+                '%d-%b-%y', '%d %b %y', '%Y-%m-%d', '%d.%m.%Y']
+
+DATE_TOKEN = r'\d{1,2}[/.-]\d{1,2}[/.-]\d{2,4}|\d{1,2}[ -][A-Za-z]{3}[ -]\d{2,4}|\d{4}-\d{2}-\d{2}'
+LINE_DATE = re.compile(rf'^\s*(?P<date>{DATE_TOKEN})\s+(?:(?:{DATE_TOKEN})\s+)?(?P<rest>.*)$')
+AMOUNT_TOKEN = re.compile(r'^\(?-?[\d,]*\d\.\d{2}\)?(?:Cr|Dr|CR|DR)?$')
+MARKER = re.compile(r'(?<![A-Za-z])(Cr|Dr|CR|DR)\.?\s*$')
+OPENING_BALANCE = re.compile(r'opening balance\D*?([\d,]+\.\d{2})', re.IGNORECASE)
+IGNORED_LINE = re.compile(r'\bpage \d+|\bclosing balance|\btotal\b|\bstatement of account', re.IGNORECASE)
+
+class StatementFormatError(ValueError):
+    pass
+
+@dataclass
+class StatementRow:
+    date: date
+    description: str
+    amount: Decimal
+    type: str
+    balance: Optional[Decimal] = None
+
+def normalize_header(cell):
+    text = re.sub(r'\(.*?\)', ' ', str(cell or '').lower())
+    text = re.sub(r'[^a-z/ ]', ' ', text)
+    return ' '.join(text.split())
+
+def parse_amount(value):
+    """Decimal from '1,234.50', '(200.00)', '-75', '500.00 Cr'; None if blank"""
+    if value is None:
+        return None
+    if isinstance(value, (int, float, Decimal)):
+        return Decimal(str(value))
+    text = str(value).strip().replace(',', '').replace('₹', '')
+    text = MARKER.sub('', text).strip()
+    if not text or text == '-':
+        return None
+    negative = text.startswith('(') and text.endswith(')')
+    try:
+        amount = Decimal(text.strip('()'))
+    except InvalidOperation:
+        return None
+    return -amount if negative else amount
+
+def _marker(value):
+    """'cr' or 'dr' from a Dr/Cr column value or an amount's suffix"""
+    text = str(value or '').strip().lower().rstrip('.')
+    if text in ('cr', 'credit', 'c'):
+        return 'cr'
+    if text in ('dr', 'debit', 'd'):
+        return 'dr'
+    match = MARKER.search(str(value or ''))
+    return match.group(1).lower() if match else None
+
+class StatementParser:
+    """Turn statement cells or text lines into ``StatementRow``s.
+
+    The parser keeps the little state a statement needs across rows: the
+    column map from the header, the date format that worked last and the
+    previous running balance.
+    """
+
+    def __init__(self):
+        self.columns = None
+        self.date_format = None
+        self.previous_balance = None
+        self.skipped = 0
+        self._pending = None
+
+    def parse_date(self, value):
+        if isinstance(value, datetime):
+            return value.date()
+        if isinstance(value, date):
+            return value
+        text = str(value or '').strip()
+        if not text:
+            return None
+        # Statements use one format throughout; try the last one that worked first
+        formats = [self.date_format] + DATE_FORMATS if self.date_format else DATE_FORMATS
+        for fmt in formats:
+            try:
+                parsed = datetime.strptime(text, fmt).date()
+            except ValueError:
+                continue
+            self.date_format = fmt
+            return parsed
+        return None
+
+    def _direction(self, amount, balance, marker):
+        """'income' or 'expense' for an unsigned amount"""
+        if balance is not None and self.previous_balance is not None:
+            delta = balance - self.previous_balance
+            if abs(abs(delta) - amount) < Decimal('0.01'):
+                return 'income' if delta > 0 else 'expense'
+        if marker == 'cr':
+            return 'income'
+        return 'expense'
+
+    def _row(self, row_date, description, debit, credit, amount, balance, marker):
+        if debit:
+            amount, kind = abs(debit), 'expense'
+        elif credit:
+            amount, kind = abs(credit), 'income'
+        elif amount:
+            if amount < 0:
+                amount, kind = -amount, 'expense'
+            else:
+                kind = self._direction(amount, balance, marker)
+        else:
+            self.skipped += 1
+            return None
+        if balance is not None:
+            self.previous_balance = balance
+        return StatementRow(row_date, ' '.join(description.split()), amount, kind, balance)
+
+    # Tabular statements (CSV, XLSX)
+
+    def detect_header(self, cells):
+        columns = {}
+        for index, cell in enumerate(cells):
+            name = HEADER_FIELDS.get(normalize_header(cell))
+            # The first date column is the transaction date; value date comes later
+            if name and name not in columns:
+                columns[name] = index
+        if 'date' in columns and ('amount' in columns or 'debit' in columns or 'credit' in columns):
+            return columns
+        return None
+
+    def feed_cells(self, cells):
+        """Parse one table row; rows before the header are statement preamble"""
+        if self.columns is None:
+            self.columns = self.detect_header(cells)
+            if self.columns is None:
+                balance = OPENING_BALANCE.search(' '.join(str(cell) for cell in cells if cell))
+                if balance:
+                    self.previous_balance = parse_amount(balance.group(1))
+            return None
+
+        def cell(name):
+            index = self.columns.get(name)
+            return cells[index] if index is not None and index < len(cells) else None
+
+        row_date = self.parse_date(cell('date'))
+        if row_date is None:
+            if any(cells):
+                self.skipped += 1
+            return None
+        amount_cell = cell('amount')
+        return self._row(
+            row_date,
+            str(cell('description') or ''),
+            parse_amount(cell('debit')),
+            parse_amount(cell('credit')),
+            parse_amount(amount_cell),
+            parse_amount(cell('balance')),
+            _marker(cell('direction')) or _marker(amount_cell),
+        )
+
+    # Text statements (PDF)
+
+    def feed_line(self, line):
+        """Parse one line of statement text.
+
+        A row is held back until the next dated line arrives, so narration
+        that wraps onto following lines is appended to it. Returns the
+        completed row, if any.
+        """
+        match = LINE_DATE.match(line)
+        row_date = self.parse_date(match.group('date')) if match else None
+        if row_date is None:
+            opening = OPENING_BALANCE.search(line)
+            if opening and self._pending is None:
+                self.previous_balance = parse_amount(opening.group(1))
+            elif self._pending is not None and line.strip() and not IGNORED_LINE.search(line):
+                self._pending[1].append(line.strip())
+            return None
+
+        tokens = match.group('rest').split()
+        amounts = []
+        while tokens and len(amounts) < 3:
+            token = tokens[-1]
+            if token.lower() in ('cr', 'dr') and len(tokens) > 1 and AMOUNT_TOKEN.match(tokens[-2]):
+                tokens[-2:] = [tokens[-2] + token]
+                continue
+            if not AMOUNT_TOKEN.match(token):
+                break
+            amounts.insert(0, tokens.pop())
+
+        completed = self.flush()
+        if amounts:
+            self._pending = (row_date, [' '.join(tokens)], amounts)
+        else:
+            self.skipped += 1
+        return completed
+
+    def flush(self):
+        """Complete the row held back by ``feed_line``"""
+        if self._pending is None:
+            return None
+        row_date, description, amounts = self._pending
+        self._pending = None
+        debit = credit = balance = None
+        marker = _marker(amounts[0])
+        if len(amounts) == 3:
+            debit, credit, balance = (parse_amount(value) for value in amounts)
+            amount = None
+        elif len(amounts) == 2:
+            amount, balance = parse_amount(amounts[0]), parse_amount(amounts[1])
+        else:
+            amount = parse_amount(amounts[0])
+        return self._row(row_date, ' '.join(description), debit, credit, amount, balance, marker)
+
+def iter_csv_rows(file_path, parser):
+    with open(file_path, newline='', encoding='utf-8-sig', errors='replace') as f:
+        sample = f.read(4096)
+        f.seek(0)
+        try:
+            dialect = csv.Sniffer().sniff(sample, delimiters=',;\t|')
+        except csv.Error:
+            dialect = csv.excel
+        for cells in csv.reader(f, dialect):
+            row = parser.feed_cells([cell.strip() for cell in cells])
+            if row is not None:
+                yield row
+
+def iter_xlsx_rows(file_path, parser):
+    try:
+        from openpyxl import load_workbook
+    except ImportError:
+        raise StatementFormatError('openpyxl is required to import XLSX statements')
+    # read_only streams rows from the sheet XML instead of building every cell
+    workbook = load_workbook(file_path, read_only=True, data_only=True)
+    try:
+        for cells in workbook.active.iter_rows(values_only=True):
+            row = parser.feed_cells(list(cells))
+            if row is not None:
+                yield row
+    finally:
+        workbook.close()
+
+def iter_pdf_rows(file_path, parser):
+    from apps.ai_services.pdf_text import iter_pdf_text
+    for _, text in iter_pdf_text(file_path):
+        for line in text.splitlines():
+            row = parser.feed_line(line)
+            if row is not None:
+                yield row
+    row = parser.flush()
+    if row is not None:
+        yield row
+
+STATEMENT_READERS = {
+    '.csv': iter_csv_rows,
+    '.txt': iter_csv_rows,
+    '.xlsx': iter_xlsx_rows,
+    '.xlsm': iter_xlsx_rows,
+    '.pdf': iter_pdf_rows,
+}
+
+def iter_statement_rows(file_path, parser=None):
+    """Yield normalized ``StatementRow``s from a CSV, XLSX or PDF statement"""
+    reader = STATEMENT_READERS.get(Path(file_path).suffix.lower())
+    if reader is None:
+        raise StatementFormatError(f'Unsupported statement format: {Path(file_path).suffix}')
+    return reader(file_path, parser or StatementParser())
+
+def read_statement(file_path, on_rows, chunk_size=None):
+    """Parse a statement and pass its rows to ``on_rows`` in lists of ``chunk_size``.
+
+    Used inside extraction workers, so rows are plain tuples of picklable
+    values. Returns the totals ``import_statement`` needs once the rows are in.
+    """
+    chunk_size = chunk_size or settings.STATEMENT_IMPORT_CHUNK_SIZE
+    parser = StatementParser()
+    rows = iter_statement_rows(file_path, parser)
+    count = 0
+    while True:
+        chunk = [
+            (row.date, row.description, row.amount, row.type, row.balance)
+            for row in islice(rows, chunk_size)
+        ]
+        if not chunk:
+            break
+        on_rows(chunk)
+        count += len(chunk)
+    return {'rows': count, 'skipped': parser.skipped, 'closing_balance': parser.previous_balance}
+
+class StatementWriter:
+    """Write statement rows as transactions linked to ``document``, totalling them up"""
+
+    def __init__(self, document):
+        self.document = document
+        self.link_model = Transaction.documents.through
+        self.stats = {'rows': 0, 'credits': Decimal('0'), 'debits': Decimal('0'),
+                      'first_date': None, 'last_date': None}
+
+    def write(self, rows):
+        transactions = [
+            Transaction(
+                user=self.document.user,
+                date=row.date,
+                description=row.description[:255],
+                amount=row.amount,
+                type=row.type,
+                category=STATEMENT_CATEGORY,
+            )
+            for row in rows
+        ]
+        Transaction.objects.bulk_create(transactions)
+        record_transactions(transactions)
+        self.link_model.objects.bulk_create([
+            self.link_model(transaction_id=txn.id, document_id=self.document.id) for txn in transactions
+        ])
+
+        stats = self.stats
+        stats['rows'] += len(rows)
+        for row in rows:
+            stats['credits' if row.type == 'income' else 'debits'] += row.amount
+            if stats['first_date'] is None or row.date < stats['first_date']:
+                stats['first_date'] = row.date
+            if stats['last_date'] is None or row.date > stats['last_date']:
+                stats['last_date'] = row.date
+
+def import_statement(document, chunk_size=None, parse=None):
+    """Create a transaction per statement row, linked to ``document``.
+
+    Rows are read from the document's file unless ``parse`` is given. It is
+    called with a function that writes a list of ``read_statement`` row
+    tuples, and returns ``read_statement``'s totals. Re-importing a statement
+    replaces the transactions it created before, except those already
+    reviewed. Returns import statistics, including the rows per second
+    achieved.
+    """
+    chunk_size = chunk_size or settings.STATEMENT_IMPORT_CHUNK_SIZE
+    writer = StatementWriter(document)
+    started = time.perf_counter()
+    with db_transaction.atomic():
+        Transaction.objects.filter(
+            user=document.user, documents=document, category=STATEMENT_CATEGORY, status='pending'
+        ).delete()
+        if parse is None:
+            parser = StatementParser()
+            rows = iter_statement_rows(document.file.path, parser)
+            while True:
+                chunk = list(islice(rows, chunk_size))
+                if not chunk:
+                    break
+                writer.write(chunk)
+            skipped, closing_balance = parser.skipped, parser.previous_balance
+        else:
+            totals = parse(lambda rows: writer.write([StatementRow(*row) for row in rows]))
+            skipped, closing_balance = totals['skipped'], totals['closing_balance']
+
+        if not writer.stats['rows']:
+            raise StatementFormatError('No transaction rows found in statement')
+
+    stats = writer.stats
+    seconds = time.perf_counter() - started
+    stats.update({
+        'skipped': skipped,
+        'closing_balance': str(closing_balance) if closing_balance is not None else None,
+        'credits': str(stats['credits']),
+        'debits': str(stats['debits']),
+        'first_date': stats['first_date'].isoformat() if stats['first_date'] else None,
+        'last_date': stats['last_date'].isoformat() if stats['last_date'] else None,
+        'seconds': round(seconds, 3),
+        'rows_per_second': round(stats['rows'] / seconds, 1) if seconds else None,
+    })
+    logger.info(
+        f"Imported {stats['rows']} statement rows for document {document.id} "
+        f"({stats['rows_per_second']} rows/s, {skipped} skipped)"
+    )
+    return stats
@@ -0,0 +1,80 @@
+"""Transaction totals computed with conditional aggregation.
+
+Every figure on the dashboard summary is a filtered SUM or COUNT over the
+same rows, so they are computed together in one query with
+``Sum(..., filter=Q(...))`` instead of one query per figure. The optional
+breakdown groups the same aggregates by month and category; the overall
+totals are then added up from the groups, so it is still one query.
+
+The same figures can be read from ``LedgerRollup``, whose rows carry the
+same amount columns plus a count, when the period covers whole months.
+"""
+from datetime import timedelta
+from decimal import Decimal
+from django.db.models import Count, DecimalField, F, Q, Sum, Value
+from django.db.models.functions import Coalesce, TruncMonth
+
+ZERO = Value(Decimal('0'), output_field=DecimalField(max_digits=15, decimal_places=2))
+
+INCOME = Q(type='income')
+EXPENSE = Q(type='expense')
+TOTAL_GST = F('cgst_amount') + F('sgst_amount') + F('igst_amount')
+
+def _sum(expression, condition=None):
+    return Coalesce(Sum(expression, filter=condition), ZERO)
+
+AMOUNT_AGGREGATES = {
+    'total_income': _sum('amount', INCOME),
+    'total_expenses': _sum('amount', EXPENSE),
+    'total_gst_collected': _sum(TOTAL_GST, INCOME),
+    'total_gst_paid': _sum(TOTAL_GST, EXPENSE),
+    'total_tds': _sum('tds_amount'),
+}
+
+SUMMARY_AGGREGATES = {
+    **AMOUNT_AGGREGATES,
+    'transaction_count': Count('id'),
+    'pending_reviews': Count('id', filter=Q(status='pending')),
+}
+
+ROLLUP_AGGREGATES = {
+    **AMOUNT_AGGREGATES,
+    'transaction_count': Coalesce(Sum('count'), 0),
+    'pending_reviews': Coalesce(Sum('count', filter=Q(status='pending')), 0),
+}
+
+def _with_net_profit(totals):
+    totals['net_profit'] = totals['total_income'] - totals['total_expenses']
+    return totals
+
+def _summarize(queryset, aggregates, breakdown):
+    if not breakdown:
+        return _with_net_profit(queryset.aggregate(**aggregates))
+
+    groups = list(
+        queryset.order_by()
+        .values('month', 'category')
+        .annotate(**aggregates)
+        .order_by('month', 'category')
+    )
+    totals = _with_net_profit({
+        name: sum(group[name] for group in groups) for name in aggregates
+    })
+    totals['breakdown'] = [_with_net_profit(group) for group in groups]
+    return totals
+
+def summarize_transactions(queryset, breakdown=False):
+    """Summary totals for ``queryset``; with ``breakdown`` also per month and category"""
+    if breakdown:
+        queryset = queryset.annotate(month=TruncMonth('date'))
+    return _summarize(queryset, SUMMARY_AGGREGATES, breakdown)
+
+def summarize_rollups(queryset, breakdown=False):
+    """The same summary read from a ``LedgerRollup`` queryset"""
+    return _summarize(queryset, ROLLUP_AGGREGATES, breakdown)
+
+def covers_whole_months(date_from, date_to):
+    """Whether a date range can be answered from monthly rollups"""
+    starts_on_month = date_from is None or date_from.day == 1
+    ends_on_month = date_to is None or (date_to + timedelta(days=1)).day == 1
+    return starts_on_month and ends_on_month
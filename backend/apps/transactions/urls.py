@@ -6,6 +6,8 @@ urlpatterns = [
     path('<uuid:pk>/', views.TransactionDetailView.as_view(), name='transaction_detail'),
     path('summary/', views.transaction_summary, name='transaction_summary'),
     path('export/', views.export_transactions, name='export_transactions'),
+    path('import/', views.import_transactions, name='import_transactions'),
+    path('match-documents/', views.match_documents, name='match_documents'),
     path('categories/', views.TransactionCategoryListView.as_view(), name='transaction_categories'),
     path('bank-accounts/', views.BankAccountListCreateView.as_view(), name='bank_accounts'),
     path('<uuid:transaction_id>/review/', views.review_transaction, name='review_transaction'),
@@ -1,23 +1,34 @@
-from rest_framework import generics, status, permissions
+from rest_framework import generics, status, permissions, serializers
 from rest_framework.decorators import api_view, permission_classes
 from rest_framework.response import Response
-from django.db.models import Q, Sum, Count
 from django.utils.dateparse import parse_date
-from .models import Transaction, TransactionCategory, BankAccount
+from .models import Transaction, TransactionCategory, BankAccount, LedgerRollup
 from .serializers import (
     TransactionSerializer, TransactionCreateSerializer, 
     TransactionCategorySerializer, BankAccountSerializer,
-    TransactionSummarySerializer
+    TransactionSummarySerializer, TransactionListSerializer
 )
 from apps.users.models import AuditLog
+from taxora.fieldsets import ValuesListMixin
+from taxora.pagination import KeysetPagination
 from apps.ai_services.tasks import analyze_transaction_task
+from .matching import match_documents_for_user
+from .importer import import_transactions as import_transaction_file, ImportFormatError
+from .summary import summarize_transactions, summarize_rollups, covers_whole_months
+from .filters import filter_transactions
+from .exporters import (
+    iter_csv, get_export_format, write_by_financial_year, ExportFormatError
+)
 
-import csv
-from django.http import HttpResponse
+from django.http import FileResponse, StreamingHttpResponse
+import tempfile
 from datetime import datetime, timedelta
 
-class TransactionListCreateView(generics.ListCreateAPIView):
+class TransactionListCreateView(ValuesListMixin, generics.ListCreateAPIView):
     permission_classes = [permissions.IsAuthenticated]
+    pagination_class = KeysetPagination
+    keyset_ordering = ['-date', '-created_at', '-id']
+    values_serializer_class = TransactionListSerializer
     
     def get_serializer_class(self):
         if self.request.method == 'POST':
@@ -27,39 +38,7 @@ class TransactionListCreateView(generics.ListCreateAPIView):
     def get_queryset(self):
         queryset = Transaction.objects.filter(user=self.request.user)
         
-        # Filtering
-        transaction_type = self.request.query_params.get('type')
-        status_filter = self.request.query_params.get('status')
-        category = self.request.query_params.get('category')
-        date_from = self.request.query_params.get('date_from')
-        date_to = self.request.query_params.get('date_to')
-        search = self.request.query_params.get('search')
-        
-        if transaction_type:
-            queryset = queryset.filter(type=transaction_type)
-        
-        if status_filter:
-            queryset = queryset.filter(status=status_filter)
-        
-        if category:
-            queryset = queryset.filter(category__icontains=category)
-        
-        if date_from:
-            date_from = parse_date(date_from)
-            if date_from:
-                queryset = queryset.filter(date__gte=date_from)
-        
-        if date_to:
-            date_to = parse_date(date_to)
-            if date_to:
-                queryset = queryset.filter(date__lte=date_to)
-        
-        if search:
-            queryset = queryset.filter(
-                Q(description__icontains=search) |
-                Q(vendor_name__icontains=search) |
-                Q(invoice_number__icontains=search)
-            )
+        queryset = filter_transactions(queryset, self.request.query_params)
         
         return queryset.select_related('reviewed_by').prefetch_related('documents')
     
@@ -93,50 +72,26 @@ class TransactionDetailView(generics.RetrieveUpdateDestroyAPIView):
 @permission_classes([permissions.IsAuthenticated])
 def transaction_summary(request):
     """Get transaction summary and analytics"""
-    user_transactions = Transaction.objects.filter(user=request.user)
-    
-    # Date filtering for summary
-    date_from = request.query_params.get('date_from')
-    date_to = request.query_params.get('date_to')
+    date_from = parse_date(request.query_params.get('date_from') or '')
+    date_to = parse_date(request.query_params.get('date_to') or '')
+    breakdown = request.query_params.get('breakdown', '').lower() in ('1', 'true', 'yes')
     
-    if date_from:
-        date_from = parse_date(date_from)
+    # Whole months are read from the monthly rollup; any other range is
+    # aggregated from transactions. Either way it is a single query.
+    if covers_whole_months(date_from, date_to):
+        rollups = LedgerRollup.objects.filter(user=request.user)
+        if date_from:
+            rollups = rollups.filter(month__gte=date_from)
+        if date_to:
+            rollups = rollups.filter(month__lte=date_to)
+        summary_data = summarize_rollups(rollups, breakdown=breakdown)
+    else:
+        user_transactions = Transaction.objects.filter(user=request.user)
         if date_from:
             user_transactions = user_transactions.filter(date__gte=date_from)
-    
-    if date_to:
-        date_to = parse_date(date_to)
         if date_to:
             user_transactions = user_transactions.filter(date__lte=date_to)
-    
-    # Calculate summary
-    income_sum = user_transactions.filter(type='income').aggregate(
-        total=Sum('amount'))['total'] or 0
-    
-    expense_sum = user_transactions.filter(type='expense').aggregate(
-        total=Sum('amount'))['total'] or 0
-    
-    gst_collected = user_transactions.filter(type='income').aggregate(
-        total=Sum('cgst_amount') + Sum('sgst_amount') + Sum('igst_amount')
-    )['total'] or 0
-    
-    gst_paid = user_transactions.filter(type='expense').aggregate(
-        total=Sum('cgst_amount') + Sum('sgst_amount') + Sum('igst_amount')
-    )['total'] or 0
-    
-    tds_total = user_transactions.aggregate(
-        total=Sum('tds_amount'))['total'] or 0
-    
-    summary_data = {
-        'total_income': income_sum,
-        'total_expenses': expense_sum,
-        'net_profit': income_sum - expense_sum,
-        'total_gst_collected': gst_collected,
-        'total_gst_paid': gst_paid,
-        'total_tds': tds_total,
-        'transaction_count': user_transactions.count(),
-        'pending_reviews': user_transactions.filter(status='pending').count(),
-    }
+        summary_data = summarize_transactions(user_transactions, breakdown=breakdown)
     
     serializer = TransactionSummarySerializer(summary_data)
     return Response(serializer.data)
@@ -144,62 +99,124 @@ def transaction_summary(request):
 @api_view(['GET'])
 @permission_classes([permissions.IsAuthenticated])
 def export_transactions(request):
-    """Export transactions to CSV"""
+    """Export transactions as CSV, XLSX or Parquet, optionally split by financial year"""
     queryset = Transaction.objects.filter(user=request.user).order_by('-date')
     
     # Apply same filters as list view
-    transaction_type = request.query_params.get('type')
-    status_filter = request.query_params.get('status')
-    date_from = request.query_params.get('date_from')
-    date_to = request.query_params.get('date_to')
+    queryset = filter_transactions(queryset, request.query_params)
     
-    if transaction_type:
-        queryset = queryset.filter(type=transaction_type)
+    # 'format' is taken by DRF's format override, hence 'file_format'
+    format_name = request.query_params.get('file_format', 'csv').lower()
+    by_financial_year = request.query_params.get('partition', '').lower() == 'fy'
+    try:
+        export_format = get_export_format(format_name)
+    except ExportFormatError as e:
+        return Response({'error': str(e)}, 
+                       status=status.HTTP_400_BAD_REQUEST)
     
-    if status_filter:
-        queryset = queryset.filter(status=status_filter)
+    if format_name == 'csv' and not by_financial_year:
+        response = StreamingHttpResponse(iter_csv(queryset), content_type='text/csv')
+        response['Content-Disposition'] = 'attachment; filename="transactions.csv"'
+        return response
     
-    if date_from:
-        date_from = parse_date(date_from)
-        if date_from:
-            queryset = queryset.filter(date__gte=date_from)
+    # XLSX, Parquet and ZIP writers need a seekable file
+    output = tempfile.TemporaryFile()
+    try:
+        if by_financial_year:
+            write_by_financial_year(queryset, format_name, output)
+            filename, content_type = 'transactions.zip', 'application/zip'
+        else:
+            export_format['writer'](queryset, output)
+            filename = f"transactions.{export_format['extension']}"
+            content_type = export_format['content_type']
+    except ExportFormatError as e:
+        output.close()
+        return Response({'error': str(e)}, 
+                       status=status.HTTP_400_BAD_REQUEST)
+    output.seek(0)
+    response = FileResponse(output, as_attachment=True, filename=filename, content_type=content_type)
+    return response
+
+@api_view(['POST'])
+@permission_classes([permissions.IsAuthenticated])
+def import_transactions(request):
+    """Bulk-create transactions from an uploaded CSV or XLSX file"""
+    upload = request.FILES.get('file')
+    if not upload:
+        return Response({'error': 'No file provided'}, 
+                       status=status.HTTP_400_BAD_REQUEST)
     
-    if date_to:
-        date_to = parse_date(date_to)
-        if date_to:
-            queryset = queryset.filter(date__lte=date_to)
+    dry_run = str(request.data.get('dry_run', '')).lower() in ('1', 'true', 'yes')
+    try:
+        result = import_transaction_file(request.user, upload, upload.name, dry_run=dry_run)
+    except ImportFormatError as e:
+        return Response({'error': str(e)}, 
+                       status=status.HTTP_400_BAD_REQUEST)
+    
+    transaction_ids = result.pop('transaction_ids')
+    if transaction_ids:
+        # One audit entry for the whole file; analysis runs in the background
+        # in batches once the rows are committed
+        AuditLog.objects.create(
+            user=request.user,
+            action='CREATE',
+            resource='transaction_import',
+            details={
+                'filename': upload.name,
+                'rows': result['rows'],
+                'created': result['created'],
+                'rejected': result['error_count'],
+            }
+        )
+        analyze_transaction_task.delay_many(transaction_ids)
+    
+    result['analysis_queued'] = len(transaction_ids)
+    result['dry_run'] = dry_run
+    response_status = status.HTTP_201_CREATED if result['created'] else status.HTTP_200_OK
+    return Response(result, status=response_status)
+
+@api_view(['POST'])
+@permission_classes([permissions.IsAuthenticated])
+def match_documents(request):
+    """Propose (and optionally apply) links between invoice documents and transactions"""
+    apply = str(request.data.get('apply', '')).lower() in ('1', 'true', 'yes')
+    
+    document_ids = None
+    if 'document_ids' in request.data:
+        raw_ids = request.data['document_ids']
+        if hasattr(request.data, 'getlist'):
+            raw_ids = request.data.getlist('document_ids')
+        try:
+            document_ids = serializers.ListField(child=serializers.UUIDField()).run_validation(raw_ids)
+        except serializers.ValidationError:
+            return Response({'error': 'document_ids must be a list of document UUIDs'}, 
+                           status=status.HTTP_400_BAD_REQUEST)
     
-    # Create CSV response
-    response = HttpResponse(content_type='text/csv')
-    response['Content-Disposition'] = 'attachment; filename="transactions.csv"'
+    options = {}
+    try:
+        for key in ('amount_tolerance', 'date_window_days', 'min_score'):
+            if request.data.get(key) is not None:
+                options[key] = float(request.data[key])
+    except (TypeError, ValueError):
+        return Response({'error': 'Matching options must be numeric'}, 
+                       status=status.HTTP_400_BAD_REQUEST)
     
-    writer = csv.writer(response)
-    writer.writerow([
-        'Date', 'Description', 'Amount', 'Type', 'Category', 'Status',
-        'Invoice Number', 'Vendor Name', 'GST Number', 'CGST', 'SGST', 
-        'IGST', 'TDS', 'Total Tax', 'Net Amount'
-    ])
+    result = match_documents_for_user(
+        request.user,
+        document_ids=document_ids or None,
+        apply=apply,
+        **options
+    )
     
-    for transaction in queryset:
-        writer.writerow([
-            transaction.date,
-            transaction.description,
-            transaction.amount,
-            transaction.type,
-            transaction.category,
-            transaction.status,
-            transaction.invoice_number,
-            transaction.vendor_name,
-            transaction.gst_number,
-            transaction.cgst_amount,
-            transaction.sgst_amount,
-            transaction.igst_amount,
-            transaction.tds_amount,
-            transaction.total_tax_amount,
-            transaction.net_amount,
-        ])
+    if apply and result['applied']:
+        AuditLog.objects.create(
+            user=request.user,
+            action='UPDATE',
+            resource='transaction_documents',
+            details={'linked': result['applied'], 'proposed': len(result['matches'])}
+        )
     
-    return response
+    return Response(result)
 
 class TransactionCategoryListView(generics.ListAPIView):
     serializer_class = TransactionCategorySerializer
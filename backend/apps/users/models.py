@@ -63,6 +63,10 @@ class AuditLog(models.Model):
     class Meta:
         db_table = 'audit_logs'
         ordering = ['-timestamp']
+        indexes = [
+            # Keyset pagination of the audit log
+            models.Index(fields=['user', '-timestamp', '-id']),
+        ]
 
 class ClientRelationship(models.Model):
     ca = models.ForeignKey(User, on_delete=models.CASCADE, related_name='clients')
@@ -8,6 +8,7 @@ from .serializers import (
     UserRegistrationSerializer, UserLoginSerializer, UserProfileSerializer,
     AuditLogSerializer, ClientRelationshipSerializer
 )
+from taxora.pagination import KeysetPagination
 
 User = get_user_model()
 
@@ -76,6 +77,8 @@ class UserProfileView(generics.RetrieveUpdateAPIView):
 class AuditLogListView(generics.ListAPIView):
     serializer_class = AuditLogSerializer
     permission_classes = [permissions.IsAuthenticated]
+    pagination_class = KeysetPagination
+    keyset_ordering = ['-timestamp', '-id']
     
     def get_queryset(self):
         return AuditLog.objects.filter(user=self.request.user)
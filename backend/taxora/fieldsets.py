@@ -0,0 +1,129 @@
+"""Sparse fieldsets and ``values()``-based list serialization.
+
+List endpoints serialize a page of rows through ``QuerySet.values()`` and a
+handful of type conversions instead of a ``ModelSerializer`` per row, so
+related names come from joins in the same query rather than a lookup per
+row, and no model instances or DRF field objects are built.
+
+``?fields=a,b`` limits each row to the named fields. Heavy fields (large
+text and JSON columns, nested relations) are left out of the default
+payload; they are returned when named in ``?fields=`` or ``?expand=``.
+Relations listed in ``expandable`` are loaded for the whole page at once,
+so their cost does not grow with the page size.
+"""
+from datetime import date, datetime
+from decimal import Decimal
+from uuid import UUID
+
+from django.db.models import F
+from rest_framework import serializers
+from rest_framework.response import Response
+
+_datetime_field = serializers.DateTimeField()
+
+def requested_names(request, param):
+    value = request.query_params.get(param)
+    if not value:
+        return None
+    return [name.strip() for name in value.split(',') if name.strip()]
+
+def format_value(value):
+    """Render a ``values()`` cell the way the equivalent DRF field would"""
+    if isinstance(value, datetime):
+        return _datetime_field.to_representation(value)
+    if isinstance(value, date):
+        return value.isoformat()
+    if isinstance(value, Decimal):
+        return f'{value:f}'
+    if isinstance(value, UUID):
+        return str(value)
+    return value
+
+class ValuesListSerializer:
+    """Declarative, read-only list serializer over ``QuerySet.values()``.
+
+    ``fields`` maps each output name to a model lookup or expression (``None``
+    for a model field of the same name). ``method_fields`` maps names to the
+    lookups that ``get_<name>(row)`` reads. ``expandable`` names relations
+    loaded by ``expand_<name>(rows)``. ``raw_fields`` are passed through
+    without formatting. ``nullable_relation_fields`` are dropped from a row
+    when ``None``, as DRF drops a dotted source that crosses a null relation.
+    """
+    fields = {}
+    method_fields = {}
+    heavy_fields = set()
+    expandable = set()
+    raw_fields = set()
+    nullable_relation_fields = set()
+
+    def __init__(self, request, context=None, always=()):
+        self.request = request
+        self.context = context or {}
+        available = list(self.fields) + list(self.method_fields) + list(self.expandable)
+        fields = requested_names(request, 'fields')
+        expand = requested_names(request, 'expand') or []
+        unknown = [name for name in (fields or []) + expand if name not in available]
+        if unknown:
+            raise serializers.ValidationError({'fields': [f"Unknown field: {name}" for name in unknown]})
+
+        if fields is None:
+            fields = [name for name in available
+                      if name not in self.heavy_fields and name not in self.expandable]
+        self.output = fields + [name for name in expand if name not in fields]
+        # Always read the primary key (for expansions) and anything the caller needs
+        self.lookups = ['id', *always]
+
+    def _values_arguments(self):
+        names, expressions = [], {}
+        wanted = set(self.output)
+        for name, source in self.fields.items():
+            if name not in wanted:
+                continue
+            if source is None:
+                names.append(name)
+            else:
+                expressions[name] = F(source) if isinstance(source, str) else source
+        for name, sources in self.method_fields.items():
+            if name in wanted:
+                names.extend(sources)
+        names.extend(name for name in self.lookups if name not in expressions)
+        return list(dict.fromkeys(names)), expressions
+
+    def values(self, queryset):
+        names, expressions = self._values_arguments()
+        return queryset.prefetch_related(None).values(*names, **expressions)
+
+    def serialize(self, rows):
+        rows = list(rows)
+        for name in self.output:
+            if name in self.expandable:
+                getattr(self, f'expand_{name}')(rows)
+        data = []
+        for row in rows:
+            item = {}
+            for name in self.output:
+                if name in self.method_fields:
+                    item[name] = getattr(self, f'get_{name}')(row)
+                elif name in self.raw_fields or name in self.expandable:
+                    item[name] = row[name]
+                else:
+                    item[name] = format_value(row[name])
+                if item[name] is None and name in self.nullable_relation_fields:
+                    del item[name]
+            data.append(item)
+        return data
+
+class ValuesListMixin:
+    """List action for generic views that serializes with ``values_serializer_class``"""
+    values_serializer_class = None
+
+    def list(self, request, *args, **kwargs):
+        always = [name.lstrip('-') for name in getattr(self, 'keyset_ordering', None) or []]
+        serializer = self.values_serializer_class(
+            request, context=self.get_serializer_context(), always=always
+        )
+        queryset = serializer.values(self.filter_queryset(self.get_queryset()))
+        page = self.paginate_queryset(queryset)
+        if page is not None:
+            return self.get_paginated_response(serializer.serialize(page))
+        return Response(serializer.serialize(queryset))
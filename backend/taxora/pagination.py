@@ -0,0 +1,137 @@
+"""Keyset pagination for long, append-mostly lists.
+
+``PageNumberPagination`` counts every matching row and then skips ``OFFSET``
+rows, so deep pages get slower as history grows. With ``?pagination=cursor``
+views using ``KeysetPagination`` instead return pages that start after the
+last row of the previous one: the cursor holds that row's values for the
+view's ``keyset_ordering`` (which ends in a unique column so ties are
+broken), and the page is a ``WHERE (ordering) < (cursor) ... LIMIT`` over a
+matching composite index. Every page costs the same and no count is run.
+
+Without the flag the response is the usual page-number one, so existing
+clients are unaffected.
+"""
+from base64 import urlsafe_b64decode, urlsafe_b64encode
+from collections import OrderedDict
+import binascii
+import json
+
+from django.core.exceptions import ValidationError
+from django.db.models import Q
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import PageNumberPagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+
+class KeysetPagination(PageNumberPagination):
+    """Page numbers by default, keyset pages when the client asks for them"""
+    mode_query_param = 'pagination'
+    cursor_query_param = 'cursor'
+    invalid_cursor_message = 'Invalid cursor'
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.keyset = (
+            request.query_params.get(self.mode_query_param) == 'cursor'
+            and getattr(view, 'keyset_ordering', None) is not None
+        )
+        if not self.keyset:
+            return super().paginate_queryset(queryset, request, view)
+
+        self.request = request
+        self.ordering = list(view.keyset_ordering)
+        page_size = self.get_page_size(request)
+        position, reverse = self.decode_cursor(request, queryset.model)
+
+        ordering = [self._flip(name) for name in self.ordering] if reverse else self.ordering
+        if position is not None:
+            queryset = queryset.filter(self._after(position, ordering))
+        rows = list(queryset.order_by(*ordering)[:page_size + 1])
+        has_more = len(rows) > page_size
+        rows = rows[:page_size]
+        if reverse:
+            rows.reverse()
+
+        # Walking forwards there is a previous page whenever we started from a
+        # cursor; walking backwards there is always a next page.
+        self.has_next = has_more if not reverse else position is not None
+        self.has_previous = position is not None if not reverse else has_more
+        self.page_rows = rows
+        return rows
+
+    def get_paginated_response(self, data):
+        if not self.keyset:
+            return super().get_paginated_response(data)
+        return Response(OrderedDict([
+            ('next', self.get_next_link()),
+            ('previous', self.get_previous_link()),
+            ('results', data),
+        ]))
+
+    def get_next_link(self):
+        if not self.keyset:
+            return super().get_next_link()
+        if not self.has_next or not self.page_rows:
+            return None
+        return self.encode_cursor(self.page_rows[-1], reverse=False)
+
+    def get_previous_link(self):
+        if not self.keyset:
+            return super().get_previous_link()
+        if not self.has_previous or not self.page_rows:
+            return None
+        return self.encode_cursor(self.page_rows[0], reverse=True)
+
+    @staticmethod
+    def _flip(name):
+        return name[1:] if name.startswith('-') else '-' + name
+
+    @staticmethod
+    def _after(position, ordering):
+        """Rows that sort after ``position`` under ``ordering``, as OR-ed prefixes"""
+        condition = Q()
+        equal = Q()
+        for name, value in zip(ordering, position):
+            field = name.lstrip('-')
+            lookup = 'lt' if name.startswith('-') else 'gt'
+            condition |= equal & Q(**{f'{field}__{lookup}': value})
+            equal &= Q(**{field: value})
+        # Repeat the bound on the leading column so the index range is obvious
+        # to the planner
+        first = ordering[0]
+        bound = Q(**{f"{first.lstrip('-')}__{'lte' if first.startswith('-') else 'gte'}": position[0]})
+        return bound & condition
+
+    @staticmethod
+    def _encode_value(value):
+        # Full precision: DjangoJSONEncoder would cut datetimes to milliseconds
+        if hasattr(value, 'isoformat'):
+            return value.isoformat()
+        if isinstance(value, (int, str)):
+            return value
+        return str(value)
+
+    def encode_cursor(self, row, reverse):
+        # Rows are model instances, or dicts when the view lists through values()
+        get = row.get if isinstance(row, dict) else lambda name: getattr(row, name)
+        values = [self._encode_value(get(name.lstrip('-'))) for name in self.ordering]
+        payload = json.dumps({'p': values, 'r': reverse})
+        token = urlsafe_b64encode(payload.encode()).decode()
+        url = remove_query_param(self.request.build_absolute_uri(), self.page_query_param)
+        return replace_query_param(url, self.cursor_query_param, token)
+
+    def decode_cursor(self, request, model):
+        token = request.query_params.get(self.cursor_query_param)
+        if not token:
+            return None, False
+        try:
+            payload = json.loads(urlsafe_b64decode(token.encode()).decode())
+            values = payload['p']
+            if len(values) != len(self.ordering):
+                raise ValueError(token)
+            position = [
+                model._meta.get_field(name.lstrip('-')).to_python(value)
+                for name, value in zip(self.ordering, values)
+            ]
+            return position, bool(payload.get('r'))
+        except (binascii.Error, UnicodeDecodeError, ValueError, KeyError, TypeError, ValidationError):
+            raise NotFound(self.invalid_cursor_message)
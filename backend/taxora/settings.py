@@ -169,6 +169,99 @@ CORS_ALLOW_CREDENTIALS = True
 GROQ_API_KEY = config('GROQ_API_KEY', default='')
 HUGGING_FACE_TOKEN = config('HUGGING_FACE_TOKEN', default='')
 
+# OCR Settings
+# subprocess runs the tesseract binary per call (pytesseract); tesserocr keeps a
+# loaded Tesseract API per worker thread and needs the optional tesserocr package
+OCR_ENGINE = config('OCR_ENGINE', default='subprocess')
+OCR_LANGUAGE = config('OCR_LANGUAGE', default='eng')
+TESSDATA_PATH = config('TESSDATA_PATH', default=None)
+# full OCRs whole images; roi classifies text blocks with one pass at fast_scale
+# and OCRs only header, tax and totals blocks at full quality. roi needs
+# OCR_ENGINE=tesserocr and falls back to full with the subprocess engine
+OCR_MODE = config('OCR_MODE', default='full')
+OCR_ROI = {
+    'fast_scale': config('OCR_ROI_FAST_SCALE', default=0.5, cast=float),
+    'body': config('OCR_ROI_BODY', default='fast'),  # fast or skip
+}
+OCR_PREPROCESSING = {
+    # Ordered stages run before Tesseract: crop, normalize_dpi, deskew, denoise, threshold
+    'stages': config('OCR_PREPROCESS_STAGES', default='crop,normalize_dpi,deskew,denoise,threshold',
+                     cast=lambda v: [s.strip() for s in v.split(',') if s.strip()]),
+    'target_dpi': config('OCR_TARGET_DPI', default=300, cast=int),
+    'max_upscale': config('OCR_MAX_UPSCALE', default=2.0, cast=float),
+    'max_deskew_angle': config('OCR_MAX_DESKEW_ANGLE', default=15.0, cast=float),
+    'threshold': config('OCR_THRESHOLD', default='otsu'),  # otsu or adaptive
+}
+
+# Build invoice line items from word boxes. Off by default: images and scanned
+# PDF pages are then OCR'd with image_to_data and their text is rebuilt from
+# the word boxes, which changes raw_text compared with image_to_string
+LINE_ITEM_EXTRACTION = config('LINE_ITEM_EXTRACTION', default=False, cast=bool)
+
+# PDF pages with fewer text-layer characters than min_chars are OCR'd when
+# images cover at least min_image_coverage of the page, otherwise skipped
+PDF_TRIAGE = {
+    'min_chars': config('PDF_TRIAGE_MIN_CHARS', default=20, cast=int),
+    'min_image_coverage': config('PDF_TRIAGE_MIN_IMAGE_COVERAGE', default=0.1, cast=float),
+}
+
+# Extraction Worker Settings
+# Run OCR/extraction in child processes that are killed on timeout or when
+# their RSS passes the cap, and recycled after a number of jobs
+EXTRACTION_ISOLATION = config('EXTRACTION_ISOLATION', default=True, cast=bool)
+EXTRACTION_TIMEOUT_SECONDS = config('EXTRACTION_TIMEOUT_SECONDS', default=120, cast=int)
+# Workers do not load the NER model; a ready worker measured ~180MB and peaked
+# at ~200MB on the bundled samples, so the cap leaves room for large scans
+EXTRACTION_MAX_RSS_MB = config('EXTRACTION_MAX_RSS_MB', default=1024, cast=int)
+EXTRACTION_MAX_JOBS_PER_WORKER = config('EXTRACTION_MAX_JOBS_PER_WORKER', default=50, cast=int)
+EXTRACTION_MAX_WORKERS = config('EXTRACTION_MAX_WORKERS', default=2, cast=int)
+EXTRACTION_WORKER_START_TIMEOUT = config('EXTRACTION_WORKER_START_TIMEOUT', default=300, cast=int)
+EXTRACTION_START_METHOD = config('EXTRACTION_START_METHOD', default='spawn')
+
+# Transaction Analysis Settings
+# deferred: analyses requested within the window run as one background batch;
+# eager: run inline when the creating transaction commits
+TRANSACTION_ANALYSIS_MODE = config('TRANSACTION_ANALYSIS_MODE', default='deferred')
+TRANSACTION_ANALYSIS_WINDOW_SECONDS = config('TRANSACTION_ANALYSIS_WINDOW_SECONDS', default=2.0, cast=float)
+TRANSACTION_ANALYSIS_MAX_BATCH = config('TRANSACTION_ANALYSIS_MAX_BATCH', default=1000, cast=int)
+# AIInsight rows (and their links) buffered per bulk_create flush
+INSIGHT_WRITE_BATCH_SIZE = config('INSIGHT_WRITE_BATCH_SIZE', default=5000, cast=int)
+
+# Invoice Matching Settings
+INVOICE_MATCH_AMOUNT_TOLERANCE = config('INVOICE_MATCH_AMOUNT_TOLERANCE', default=0.01, cast=float)  # fraction of invoice amount
+INVOICE_MATCH_DATE_WINDOW_DAYS = config('INVOICE_MATCH_DATE_WINDOW_DAYS', default=7, cast=int)
+INVOICE_MATCH_MIN_SCORE = config('INVOICE_MATCH_MIN_SCORE', default=0.5, cast=float)
+INVOICE_MATCH_AUTO_APPLY_SCORE = config('INVOICE_MATCH_AUTO_APPLY_SCORE', default=0.8, cast=float)
+
+# Bank Statement Import Settings
+# Statement rows are written with bulk_create this many at a time
+STATEMENT_IMPORT_CHUNK_SIZE = config('STATEMENT_IMPORT_CHUNK_SIZE', default=1000, cast=int)
+
+# Transaction Import Settings
+# Uploaded CSV/XLSX files are validated and inserted this many rows at a time
+TRANSACTION_IMPORT_CHUNK_SIZE = config('TRANSACTION_IMPORT_CHUNK_SIZE', default=5000, cast=int)
+TRANSACTION_IMPORT_MAX_ERRORS = config('TRANSACTION_IMPORT_MAX_ERRORS', default=500, cast=int)  # rows reported back
+
+# Transaction Export Settings
+# Rows fetched from the database cursor per round trip while streaming an export
+TRANSACTION_EXPORT_CHUNK_SIZE = config('TRANSACTION_EXPORT_CHUNK_SIZE', default=2000, cast=int)
+TRANSACTION_EXPORT_ROW_GROUP_SIZE = config('TRANSACTION_EXPORT_ROW_GROUP_SIZE', default=100000, cast=int)  # Parquet rows per row group
+
+# Transaction Search Settings
+# 'auto' uses the full-text index (PostgreSQL GIN or SQLite FTS5) when present, 'basic' uses icontains
+TRANSACTION_SEARCH_BACKEND = config('TRANSACTION_SEARCH_BACKEND', default='auto')
+
+# Document Event Stream Settings
+DOCUMENT_EVENTS_BACKEND = config('DOCUMENT_EVENTS_BACKEND', default='local')  # local or postgres
+DOCUMENT_EVENTS_KEEPALIVE_SECONDS = config('DOCUMENT_EVENTS_KEEPALIVE_SECONDS', default=15, cast=int)
+# Each open stream holds a sync worker (thread or process) for up to this
+# long before the client reconnects; size the server's workers for the
+# number of concurrent streams expected
+DOCUMENT_EVENTS_MAX_STREAM_SECONDS = config('DOCUMENT_EVENTS_MAX_STREAM_SECONDS', default=300, cast=int)
+# Lifetime of the ?token= that EventSource clients open the stream with;
+# checked when a stream opens, so clients fetch a new one to reconnect after it expires
+DOCUMENT_EVENTS_TOKEN_MAX_AGE = config('DOCUMENT_EVENTS_TOKEN_MAX_AGE', default=600, cast=int)
+
 # File Upload Settings
 FILE_UPLOAD_MAX_MEMORY_SIZE = 10 * 1024 * 1024  # 10MB
 DATA_UPLOAD_MAX_MEMORY_SIZE = 10 * 1024 * 1024  # 10MB
@@ -0,0 +1,106 @@
+from django.test import TestCase
+from django.contrib.auth import get_user_model
+from apps.transactions.models import Transaction
+from apps.ai_services.ai_utils import ComplianceAnalyzer
+from apps.ai_services.models import AIInsight
+from apps.ai_services.tasks import rescan_compliance
+from datetime import date
+from decimal import Decimal
+import numpy as np
+import pandas as pd
+
+User = get_user_model()
+
+def random_transactions(count, seed=7):
+    rng = np.random.default_rng(seed)
+    amount = rng.choice([0, 150, 200, 200.01, 5000, 30000, 30001, 50000, 50001, 250000], count)
+    gst = rng.choice([0, 9, 18, 40], count) / 100 * amount
+    return pd.DataFrame({
+        'id': [f't{index}' for index in range(count)],
+        'amount': amount,
+        'type': rng.choice(['income', 'expense'], count),
+        'category': rng.choice(['Professional Fees', 'Rent', 'professional services', 'Travel', ''], count),
+        'gst_number': rng.choice(['', '27AABCU9603R1ZM'], count),
+        'cgst_amount': gst / 2,
+        'sgst_amount': gst / 2,
+        'igst_amount': rng.choice([0, 0, 1000], count),
+        'tds_amount': rng.choice([0, 0.05, 0.1], count) * amount,
+    })
+
+class ComplianceBatchTestCase(TestCase):
+    def setUp(self):
+        self.analyzer = ComplianceAnalyzer()
+
+    def test_batch_matches_per_transaction_analysis(self):
+        """Test every rule gives the same insights in batch and per-row mode"""
+        frame = random_transactions(5000)
+
+        batch = self.analyzer.analyze_batch(frame)
+
+        self.assertEqual(len(batch), 5000)
+        for row in frame.to_dict('records'):
+            self.assertEqual(batch[row['id']], self.analyzer.analyze_transaction(row), row)
+        # Every rule fires somewhere in the sample
+        titles = {insight['title'] for found in batch.values() for insight in found}
+        self.assertEqual(len(titles), 4)
+
+    def test_batch_accepts_rows_with_missing_columns(self):
+        """Test values() dicts without tax columns are analyzed with zero tax"""
+        results = self.analyzer.analyze_batch([
+            {'id': 1, 'amount': Decimal('60000'), 'type': 'expense', 'category': 'Professional'},
+            {'id': 2, 'amount': Decimal('100'), 'type': 'income', 'category': 'Sales'},
+        ])
+        self.assertEqual([i['title'] for i in results[1]], [
+            'GST Number Required', 'TDS Deduction Required', 'Documentation Required'
+        ])
+        self.assertEqual(results[2], [])
+
+class ComplianceRescanTestCase(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(
+            username='testuser', email='test@example.com', password='testpass123', role='SME'
+        )
+
+    def _create_transaction(self, **kwargs):
+        data = {'user': self.user, 'date': date(2024, 10, 5), 'description': 'Purchase',
+                'amount': Decimal('500.00'), 'type': 'expense', 'category': 'Supplies'}
+        data.update(kwargs)
+        return Transaction.objects.create(**data)
+
+    def test_rescan_replaces_previous_insights(self):
+        """Test a re-scan flags transactions once and clears ones that now pass"""
+        flagged = self._create_transaction()
+        fixed = self._create_transaction(gst_number='27AABCU9603R1ZM', ai_analysis='stale',
+                                         anomaly_flags=['anomaly'])
+
+        rescan_compliance(user_id=self.user.id)
+        summary = rescan_compliance(user_id=self.user.id)
+
+        self.assertEqual(summary, {'scanned': 2, 'flagged': 1, 'insights': 1})
+        self.assertEqual(AIInsight.objects.filter(related_transactions=flagged).count(), 1)
+        fixed.refresh_from_db()
+        self.assertEqual((fixed.ai_analysis, fixed.anomaly_flags), ('', []))
+
+    def test_rescan_keeps_insights_from_other_generators(self):
+        """Test only the analyzer's own insights are replaced by a re-scan"""
+        transaction = self._create_transaction()
+        other = AIInsight.objects.create(
+            user=self.user, insight_type='compliance_reminder', title='Quarterly GST filing due',
+            description='File GSTR-3B', priority='high'
+        )
+        other.related_transactions.add(transaction)
+
+        rescan_compliance(user_id=self.user.id)
+        rescan_compliance(user_id=self.user.id)
+
+        self.assertTrue(AIInsight.objects.filter(id=other.id).exists())
+        self.assertEqual(
+            AIInsight.objects.filter(related_transactions=transaction, title='GST Number Required').count(), 1
+        )
+
+    def test_dry_run_writes_nothing(self):
+        """Test a dry run only counts"""
+        self._create_transaction()
+        summary = rescan_compliance(dry_run=True)
+        self.assertEqual(summary['flagged'], 1)
+        self.assertFalse(AIInsight.objects.exists())
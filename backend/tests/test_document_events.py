@@ -0,0 +1,98 @@
+from django.test import TestCase, override_settings
+from django.contrib.auth import get_user_model
+from rest_framework.test import APIClient
+from apps.documents.models import Document
+from apps.documents.events import DocumentEventBroker, publish_document_status, broker
+import json
+
+User = get_user_model()
+
+class DocumentEventsTestCase(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(
+            username='testuser',
+            email='test@example.com',
+            password='testpass123',
+            role='SME'
+        )
+        self.document = Document.objects.create(
+            user=self.user,
+            name='invoice.pdf',
+            category='invoice',
+            file='documents/1/invoice/invoice.pdf',
+            file_size=1024,
+            mime_type='application/pdf'
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.user)
+
+    def test_broker_delivers_only_to_owner(self):
+        """Test events reach the owner's subscribers and no one else's"""
+        events = DocumentEventBroker()
+        owner = events.subscribe(self.user.id)
+        other = events.subscribe('someone-else')
+
+        events.publish(self.user.id, {'document_id': 'abc', 'status': 'processing'})
+
+        self.assertEqual(owner.get_nowait()['status'], 'processing')
+        self.assertTrue(other.empty())
+
+        events.unsubscribe(self.user.id, owner)
+        events.publish(self.user.id, {'document_id': 'abc', 'status': 'completed'})
+        self.assertTrue(owner.empty())
+
+    def test_publish_document_status(self):
+        """Test status events carry stage and progress"""
+        subscriber = broker.subscribe(self.user.id)
+        try:
+            publish_document_status(self.document, stage='extracting', progress=0.1)
+            event = subscriber.get_nowait()
+        finally:
+            broker.unsubscribe(self.user.id, subscriber)
+
+        self.assertEqual(event['document_id'], str(self.document.id))
+        self.assertEqual(event['status'], 'pending')
+        self.assertEqual(event['stage'], 'extracting')
+        self.assertEqual(event['progress'], 0.1)
+
+    @override_settings(DOCUMENT_EVENTS_MAX_STREAM_SECONDS=0)
+    def test_event_stream_sends_in_flight_snapshot(self):
+        """Test the stream opens with the status of in-flight documents"""
+        response = self.client.get('/api/documents/events/', HTTP_ACCEPT='text/event-stream')
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Content-Type'], 'text/event-stream')
+
+        body = b''.join(response.streaming_content).decode()
+        frames = [frame for frame in body.split('\n\n') if frame.startswith('event: status')]
+        self.assertEqual(len(frames), 1)
+
+        data = json.loads(frames[0].split('data: ', 1)[1])
+        self.assertEqual(data['document_id'], str(self.document.id))
+        self.assertEqual(data['status'], 'pending')
+
+    def test_event_stream_rejects_invalid_document_id(self):
+        """Test a malformed document filter is rejected before streaming"""
+        response = self.client.get('/api/documents/events/?document_id=nope',
+                                   HTTP_ACCEPT='application/json')
+        self.assertEqual(response.status_code, 400)
+
+    @override_settings(DOCUMENT_EVENTS_MAX_STREAM_SECONDS=0)
+    def test_event_stream_opens_with_query_token(self):
+        """Test EventSource clients, which cannot send headers, open the stream with a signed token"""
+        token = self.client.post('/api/documents/events/token/').data['token']
+
+        anonymous = APIClient()
+        response = anonymous.get(f'/api/documents/events/?token={token}', HTTP_ACCEPT='text/event-stream')
+        self.assertEqual(response.status_code, 200)
+        body = b''.join(response.streaming_content).decode()
+        self.assertIn(str(self.document.id), body)
+
+        response = anonymous.get('/api/documents/events/?token=forged', HTTP_ACCEPT='application/json')
+        self.assertEqual(response.status_code, 401)
+        response = anonymous.get('/api/documents/events/', HTTP_ACCEPT='application/json')
+        self.assertEqual(response.status_code, 401)
+
+        with override_settings(DOCUMENT_EVENTS_TOKEN_MAX_AGE=-1):
+            response = anonymous.get(f'/api/documents/events/?token={token}', HTTP_ACCEPT='application/json')
+        self.assertEqual(response.status_code, 401)
@@ -0,0 +1,136 @@
+from django.test import TestCase
+from django.contrib.auth import get_user_model
+from unittest.mock import patch
+from apps.ai_services.workers import ExtractionPool, ExtractionResult
+from apps.ai_services.instrumentation import PipelineTrace, stage
+from apps.documents.models import Document
+import os
+import time
+
+User = get_user_model()
+
+HANDLERS = 'tests.test_extraction_workers'
+
+# Handlers run inside the worker process, which imports this module; keep
+# its imports light so workers start quickly
+
+def echo_handler(job, send):
+    with stage('echo'):
+        send(('partial', {'raw_text': 'partial text'}))
+    return {'file_path': job['file_path'], 'pid': os.getpid()}
+
+def hanging_handler(job, send):
+    send(('partial', {'raw_text': 'first page'}))
+    time.sleep(60)
+
+def chatty_handler(job, send):
+    while True:
+        send(('partial', {'raw_text': 'still working'}))
+        time.sleep(0.01)
+
+def greedy_handler(job, send):
+    hog = bytearray(400 * 1024 * 1024)
+    hog[::4096] = b'x' * len(hog[::4096])
+    time.sleep(60)
+
+def crashing_handler(job, send):
+    os._exit(3)
+
+class ExtractionWorkerTestCase(TestCase):
+    def _pool(self, handler, **kwargs):
+        options = {'max_workers': 1, 'max_jobs': 10, 'timeout': 30, 'max_rss_mb': 0,
+                   'start_timeout': 60}
+        options.update(kwargs)
+        pool = ExtractionPool(handler_path=f'{HANDLERS}.{handler}', **options)
+        self.addCleanup(pool.shutdown)
+        return pool
+
+    def test_result_and_stages_come_back(self):
+        """Test the result, partial data and stage timings reach the parent"""
+        pool = self._pool('echo_handler')
+        trace = PipelineTrace()
+
+        result = pool.extract('/tmp/invoice.pdf', trace=trace)
+
+        self.assertTrue(result.ok)
+        self.assertEqual(result.data['file_path'], '/tmp/invoice.pdf')
+        self.assertNotEqual(result.data['pid'], os.getpid())
+        self.assertEqual(result.partial, {'raw_text': 'partial text'})
+        self.assertEqual([metrics['stage'] for metrics in trace.stages], ['echo'])
+
+    def test_workers_recycled_after_max_jobs(self):
+        """Test a worker is replaced once it has served its job quota"""
+        pool = self._pool('echo_handler', max_jobs=2)
+        pids = [pool.extract('/tmp/a.pdf').data['pid'] for _ in range(3)]
+        self.assertEqual(pids[0], pids[1])
+        self.assertNotEqual(pids[1], pids[2])
+
+    def test_timeout_keeps_partial_result(self):
+        """Test a hung job is killed and its partial text kept"""
+        pool = self._pool('hanging_handler', timeout=1)
+        result = pool.extract('/tmp/slow.pdf')
+
+        self.assertIn('timed out', result.failure_reason)
+        self.assertEqual(result.partial['raw_text'], 'first page')
+        self.assertEqual(pool._idle, [])
+
+    def test_timeout_applies_to_a_child_that_keeps_reporting(self):
+        """Test progress messages do not keep a job alive past its deadline"""
+        pool = self._pool('chatty_handler', timeout=1)
+        result = pool.extract('/tmp/chatty.pdf')
+
+        self.assertIn('timed out', result.failure_reason)
+        self.assertEqual(result.partial['raw_text'], 'still working')
+
+    def test_memory_cap(self):
+        """Test a worker growing past the RSS cap is killed"""
+        pool = self._pool('greedy_handler', max_rss_mb=200)
+        result = pool.extract('/tmp/huge.pdf')
+        self.assertIn('memory limit', result.failure_reason)
+
+    def test_crash_is_reported(self):
+        """Test a worker dying mid-job is reported with its exit code"""
+        pool = self._pool('crashing_handler')
+        result = pool.extract('/tmp/bad.pdf')
+        self.assertEqual(result.failure_reason, 'Extraction worker exited with code 3')
+
+class ProcessDocumentIsolationTestCase(TestCase):
+    def test_failure_reason_and_partial_text_saved(self):
+        """Test a failed extraction records why and keeps partial text"""
+        from apps.ai_services.tasks import process_document
+        user = User.objects.create_user(
+            username='testuser', email='test@example.com', password='testpass123', role='SME'
+        )
+        document = Document.objects.create(
+            user=user, name='statement.pdf', category='invoice',
+            file='documents/1/invoice/statement.pdf', file_size=1024, mime_type='application/pdf'
+        )
+        failed = ExtractionResult(partial={'raw_text': 'page one'},
+                                  failure_reason='Extraction timed out after 120s')
+
+        with patch('apps.ai_services.workers.get_extraction_pool') as get_pool:
+            get_pool.return_value.extract.return_value = failed
+            process_document(str(document.id))
+
+        document.refresh_from_db()
+        self.assertEqual(document.status, 'failed')
+        self.assertEqual(document.failure_reason, 'Extraction timed out after 120s')
+        self.assertEqual(document.extracted_text, 'page one')
+        self.assertTrue(document.extracted_data['partial'])
+
+    def test_entities_added_in_parent(self):
+        """Test NER runs in the parent on the text a worker returns"""
+        from apps.ai_services.tasks import extract_document_data
+        document = Document(id='00000000-0000-0000-0000-000000000001', file='documents/1/invoice/a.pdf')
+        extracted = ExtractionResult(data={'raw_text': 'Acme Traders invoice', 'entities': []})
+        entities = [{'text': 'Acme Traders', 'label': 'ORG', 'confidence': 0.9}]
+
+        with patch('apps.ai_services.workers.get_extraction_pool') as get_pool, \
+                patch('apps.ai_services.tasks.invoice_extractor.ner.extract_entities',
+                      return_value=entities) as extract_entities:
+            get_pool.return_value.extract.return_value = extracted
+            data, failure_reason, _ = extract_document_data(document)
+
+        extract_entities.assert_called_once_with('Acme Traders invoice')
+        self.assertEqual(failure_reason, '')
+        self.assertEqual(data['entities'], entities)
@@ -0,0 +1,91 @@
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.db import connection
+from django.contrib.auth import get_user_model
+from apps.ai_services.insight_writer import BulkInsightWriter
+from apps.ai_services.models import AIInsight
+from apps.ai_services import tasks
+from apps.transactions.models import Transaction
+from datetime import date, datetime, timezone as dt_timezone
+from decimal import Decimal
+from unittest.mock import patch
+
+User = get_user_model()
+
+class BulkInsightWriterTestCase(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(
+            username='testuser', email='test@example.com', password='testpass123', role='SME'
+        )
+        self.transactions = [
+            Transaction.objects.create(
+                user=self.user, date=date(2024, 10, 5), description=f'Purchase {index}',
+                amount=Decimal('500.00'), type='expense', category='Supplies'
+            )
+            for index in range(5)
+        ]
+
+    def _add(self, writer, transaction):
+        writer.add(self.user.id, insight_type='anomaly', title='Check', description='Check this',
+                   priority='high', transaction_ids=[transaction.id])
+
+    def test_flushes_in_batches_with_links(self):
+        """Test insights and their links are written with one insert per table per batch"""
+        with CaptureQueriesContext(connection) as queries:
+            with BulkInsightWriter(batch_size=2) as writer:
+                for transaction in self.transactions:
+                    self._add(writer, transaction)
+
+        inserts = [q['sql'] for q in queries.captured_queries if q['sql'].startswith('INSERT')]
+        self.assertEqual(len(inserts), 6)
+        self.assertEqual(writer.written, 5)
+        for transaction in self.transactions:
+            self.assertEqual(AIInsight.objects.get(related_transactions=transaction).title, 'Check')
+
+    def test_error_rolls_back_flushed_batches(self):
+        """Test the job's insights are written together or not at all"""
+        with self.assertRaises(RuntimeError):
+            with BulkInsightWriter(batch_size=2) as writer:
+                for transaction in self.transactions:
+                    self._add(writer, transaction)
+                raise RuntimeError('analysis failed')
+
+        self.assertFalse(AIInsight.objects.exists())
+
+class InsightTasksTestCase(TestCase):
+    def setUp(self):
+        self.users = [
+            User.objects.create_user(username=f'user{index}', email=f'user{index}@example.com',
+                                     password='testpass123', role='SME')
+            for index in range(3)
+        ]
+
+    def test_compliance_reminders_written_in_bulk(self):
+        """Test reminder day writes every user's reminder in one insert"""
+        reminder_day = datetime(2024, 10, 18, 9, tzinfo=dt_timezone.utc)
+        with patch.object(tasks.timezone, 'now', return_value=reminder_day), \
+                CaptureQueriesContext(connection) as queries:
+            tasks.send_compliance_reminders()
+
+        inserts = [q for q in queries.captured_queries if q['sql'].startswith('INSERT')]
+        self.assertEqual(len(inserts), 1)
+        self.assertEqual(AIInsight.objects.filter(title='GST Return Due Soon').count(), 3)
+
+    def test_no_reminders_no_queries(self):
+        """Test a day without reminders does not scan users"""
+        quiet_day = datetime(2024, 10, 3, 9, tzinfo=dt_timezone.utc)
+        with patch.object(tasks.timezone, 'now', return_value=quiet_day), self.assertNumQueries(0):
+            tasks.send_compliance_reminders()
+
+    def test_user_insights_created(self):
+        """Test high monthly expenses produce a bulk-written insight"""
+        user = self.users[0]
+        Transaction.objects.create(
+            user=user, date=date.today(), description='Machinery', amount=Decimal('150000.00'),
+            type='expense', category='Equipment', cgst_amount=Decimal('13500.00'),
+            sgst_amount=Decimal('13500.00')
+        )
+        tasks.generate_user_insights(str(user.id))
+
+        titles = set(AIInsight.objects.filter(user=user).values_list('title', flat=True))
+        self.assertEqual(titles, {'High Monthly Expenses Detected', 'GST Input Credit Available'})
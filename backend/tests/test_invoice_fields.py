@@ -0,0 +1,83 @@
+from django.test import TestCase
+from django.core.management import call_command
+from django.contrib.auth import get_user_model
+from apps.documents.models import Document
+from decimal import Decimal
+from datetime import date
+from io import StringIO
+
+User = get_user_model()
+
+class InvoiceFieldsTestCase(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(
+            username='testuser',
+            email='test@example.com',
+            password='testpass123',
+            role='SME'
+        )
+
+    def _create_document(self, extracted_data, status='completed'):
+        return Document.objects.create(
+            user=self.user,
+            name='invoice.pdf',
+            category='invoice',
+            file='documents/1/invoice/invoice.pdf',
+            file_size=1024,
+            mime_type='application/pdf',
+            status=status,
+            extracted_data=extracted_data
+        )
+
+    def test_populate_invoice_fields(self):
+        """Test typed invoice columns are filled from extracted_data"""
+        document = self._create_document({
+            'invoice_number': 'INV-2024-001',
+            'date': '2024-10-01',
+            'gst_number': '27aabcu9603r1zm',
+            'amount': 11800.0,
+        })
+
+        document.populate_invoice_fields()
+
+        self.assertEqual(document.invoice_number, 'INV-2024-001')
+        self.assertEqual(document.gst_number, '27AABCU9603R1ZM')
+        self.assertEqual(document.invoice_date, date(2024, 10, 1))
+        self.assertEqual(document.invoice_amount, Decimal('11800.00'))
+
+    def test_populate_invoice_fields_with_unparsed_values(self):
+        """Test unparseable regex output leaves the columns empty"""
+        document = self._create_document({
+            'invoice_number': '',
+            'date': '31/02/24',
+            'gst_number': 'N/A',
+            'amount': 0.0,
+        })
+
+        document.populate_invoice_fields()
+
+        self.assertEqual(document.invoice_number, '')
+        self.assertEqual(document.gst_number, '')
+        self.assertIsNone(document.invoice_date)
+        self.assertIsNone(document.invoice_amount)
+
+    def test_backfill_command(self):
+        """Test backfill command updates existing rows in chunks"""
+        for i in range(5):
+            self._create_document({
+                'invoice_number': f'INV-{i}',
+                'date': '2024-09-15',
+                'gst_number': '29ABCDE1234F1Z5',
+                'amount': 1000.0 + i,
+            })
+        self._create_document({}, status='failed')
+
+        out = StringIO()
+        call_command('backfill_invoice_fields', '--chunk-size', '2', stdout=out)
+
+        self.assertIn('5 documents', out.getvalue())
+        self.assertEqual(
+            Document.objects.filter(user=self.user, gst_number='29ABCDE1234F1Z5').count(), 5
+        )
+        document = Document.objects.get(invoice_number='INV-3')
+        self.assertEqual(document.invoice_amount, Decimal('1003.00'))
@@ -0,0 +1,85 @@
+from django.test import TestCase
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APIClient
+from apps.transactions.models import Transaction
+from apps.users.models import AuditLog
+from datetime import date, timedelta
+from decimal import Decimal
+
+User = get_user_model()
+
+class KeysetPaginationTestCase(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(
+            username='testuser', email='test@example.com', password='testpass123', role='SME'
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.user)
+        # Several transactions share each date so the tiebreakers matter
+        Transaction.objects.bulk_create([
+            Transaction(
+                user=self.user, date=date(2024, 4, 1) + timedelta(days=index // 4),
+                description=f'Transaction {index}', amount=Decimal('100.00'),
+                type='expense', category='Rent'
+            )
+            for index in range(55)
+        ])
+
+    def walk(self, url):
+        seen, pages = [], 0
+        while url:
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, 200)
+            seen.extend(row['id'] for row in response.data['results'])
+            url, pages = response.data['next'], pages + 1
+        return seen, pages
+
+    def test_pages_cover_every_row_once_in_order(self):
+        """Test walking the cursor visits each transaction once, in list order"""
+        seen, pages = self.walk('/api/transactions/?pagination=cursor')
+        expected = [
+            str(pk) for pk in Transaction.objects.filter(user=self.user)
+            .order_by('-date', '-created_at', '-id').values_list('id', flat=True)
+        ]
+        self.assertEqual(seen, expected)
+        self.assertEqual(pages, 3)
+
+    def test_deep_page_has_no_count_or_offset(self):
+        """Test a later page is a single bounded query without COUNT or OFFSET"""
+        first = self.client.get('/api/transactions/?pagination=cursor')
+        self.assertNotIn('count', first.data)
+        self.assertIsNone(first.data['previous'])
+
+        with CaptureQueriesContext(connection) as queries:
+            second = self.client.get(first.data['next'])
+        statements = [query['sql'] for query in queries.captured_queries
+                      if 'FROM "transactions"' in query['sql']]
+        self.assertEqual(len(statements), 1)
+        self.assertNotIn('COUNT(', statements[0])
+        self.assertNotIn('OFFSET', statements[0])
+
+        previous = self.client.get(second.data['previous'])
+        self.assertEqual(
+            [row['id'] for row in previous.data['results']],
+            [row['id'] for row in first.data['results']]
+        )
+
+    def test_page_numbers_remain_the_default(self):
+        """Test clients that do not opt in still get page-number responses"""
+        response = self.client.get('/api/transactions/?page=2')
+        self.assertEqual(response.data['count'], 55)
+        self.assertEqual(len(response.data['results']), 20)
+
+    def test_audit_logs_and_invalid_cursor(self):
+        """Test the audit log pages by cursor and a bad cursor is rejected"""
+        AuditLog.objects.bulk_create([
+            AuditLog(user=self.user, action='VIEW', resource='transaction') for _ in range(25)
+        ])
+        seen, pages = self.walk('/api/auth/audit-logs/?pagination=cursor')
+        self.assertEqual(len(set(seen)), 25)
+        self.assertEqual(pages, 2)
+
+        response = self.client.get('/api/transactions/?pagination=cursor&cursor=not-a-cursor')
+        self.assertEqual(response.status_code, 404)
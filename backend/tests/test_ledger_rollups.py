@@ -0,0 +1,174 @@
+from django.test import TestCase
+from django.contrib.auth import get_user_model
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from rest_framework.test import APIClient
+from apps.transactions.models import Transaction, LedgerRollup
+from apps.transactions.importer import import_transactions
+from apps.transactions.rollups import backfill_rollups, rebuild_rollups, verify_rollups
+from datetime import date
+from decimal import Decimal
+from io import StringIO
+
+User = get_user_model()
+
+class LedgerRollupTestCase(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(
+            username='testuser', email='test@example.com', password='testpass123', role='SME'
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.user)
+
+    def create(self, day='2024-10-05', kind='expense', category='Rent', amount='1000.00',
+               half_gst='90.00', state='pending', **fields):
+        return Transaction.objects.create(
+            user=self.user, date=day, description=category, amount=Decimal(amount), type=kind,
+            category=category, status=state, cgst_amount=Decimal(half_gst),
+            sgst_amount=Decimal(half_gst), **fields
+        )
+
+    def rollup(self, month=date(2024, 10, 1), kind='expense', category='Rent', state='pending'):
+        return LedgerRollup.objects.get(
+            user=self.user, month=month, type=kind, category=category, status=state
+        )
+
+    def test_create_update_and_delete_maintain_rollups(self):
+        """Test each write moves the transaction's contribution between rollup rows"""
+        first = self.create()
+        self.create(amount='500.00', half_gst='45.00')
+        row = self.rollup()
+        self.assertEqual(row.amount, Decimal('1500.00'))
+        self.assertEqual(row.cgst_amount, Decimal('135.00'))
+        self.assertEqual(row.count, 2)
+
+        first.amount = Decimal('2000.00')
+        first.save()
+        self.assertEqual(self.rollup().amount, Decimal('2500.00'))
+
+        # A status change moves the amount to the approved row
+        first.status = 'approved'
+        first.save(update_fields=['status'])
+        self.assertEqual(self.rollup().amount, Decimal('500.00'))
+        self.assertEqual(self.rollup(state='approved').amount, Decimal('2000.00'))
+
+        # Moving to another month
+        first.date = date(2024, 11, 2)
+        first.save()
+        self.assertEqual(self.rollup(month=date(2024, 11, 1), state='approved').count, 1)
+        self.assertEqual(self.rollup(state='approved').count, 0)
+
+        Transaction.objects.filter(user=self.user).delete()
+        self.assertEqual(verify_rollups(self.user.id), [])
+        self.assertEqual(self.rollup().count, 0)
+
+    def test_unrelated_update_skips_rollup(self):
+        """Test a save that touches no rollup field does not read or write rollups"""
+        txn = self.create()
+        txn.ai_analysis = 'checked'
+        with self.assertNumQueries(1):
+            txn.save(update_fields=['ai_analysis'])
+        self.assertEqual(self.rollup().count, 1)
+
+    def test_bulk_import_is_recorded(self):
+        """Test rows written with bulk_create by the importer reach the rollups"""
+        content = (
+            'date,description,amount,type,category\n'
+            '2024-10-01,Office rent,25000,expense,Rent\n'
+            '2024-10-15,Client payment,40000,income,Sales\n'
+            '2024-10-20,More rent,5000,expense,Rent\n'
+        ).encode()
+        import_transactions(self.user, SimpleUploadedFile('books.csv', content), 'books.csv')
+
+        self.assertEqual(self.rollup().amount, Decimal('30000.00'))
+        self.assertEqual(self.rollup(kind='income', category='Sales').count, 1)
+        self.assertEqual(verify_rollups(self.user.id), [])
+
+    def test_verify_and_rebuild(self):
+        """Test drift is reported and a rebuild restores the rollups"""
+        self.create()
+        self.create(day='2024-09-30', state='approved')
+        # A queryset update skips the signals, so the rollup drifts
+        Transaction.objects.filter(user=self.user).update(amount=Decimal('10.00'))
+
+        output = StringIO()
+        with self.assertRaises(CommandError):
+            call_command('rebuild_ledger_rollups', '--verify', stdout=output)
+        self.assertEqual(len(verify_rollups(self.user.id)), 2)
+
+        call_command('rebuild_ledger_rollups', '--user', str(self.user.id), stdout=output)
+        self.assertEqual(verify_rollups(self.user.id), [])
+        self.assertEqual(self.rollup().amount, Decimal('10.00'))
+        self.assertEqual(rebuild_rollups(), 2)
+
+    def test_deleting_user_with_transactions(self):
+        """Test the cascade does not recreate rollups for a deleted user"""
+        self.create()
+        self.create(day='2024-11-02', amount='250.00')
+        self.create(kind='income', category='Sales', amount='8000.00')
+
+        self.user.delete()
+        self.assertFalse(Transaction.objects.exists())
+        self.assertFalse(LedgerRollup.objects.exists())
+
+    def test_backfill_builds_missing_rollups(self):
+        """Test transactions written before the rollups existed are backfilled once"""
+        self.create()
+        self.create(day='2024-11-02', amount='250.00')
+        LedgerRollup.objects.all().delete()
+
+        backfill_rollups()
+        self.assertEqual(verify_rollups(), [])
+        self.assertEqual(self.rollup().amount, Decimal('1000.00'))
+
+        # Existing rollups are left alone; drift is for the rebuild command
+        LedgerRollup.objects.filter(month=date(2024, 10, 1)).update(amount=Decimal('1.00'))
+        backfill_rollups()
+        self.assertEqual(self.rollup().amount, Decimal('1.00'))
+
+    def test_removal_from_missing_rollup_is_skipped(self):
+        """Test deleting a transaction whose rollup row is missing creates no negative row"""
+        transaction = self.create()
+        LedgerRollup.objects.all().delete()
+        transaction.delete()
+        self.assertFalse(LedgerRollup.objects.exists())
+
+    def test_summary_reads_rollups(self):
+        """Test whole-month summaries come from rollups and other ranges from transactions"""
+        self.create(state='approved')
+        self.create(day='2024-10-25', kind='income', category='Sales', amount='8000.00')
+        self.create(day='2024-11-03', amount='300.00', half_gst='0')
+        LedgerRollup.objects.filter(user=self.user, month=date(2024, 10, 1), type='income').update(
+            amount=Decimal('9999.00')
+        )
+
+        with self.assertNumQueries(1):
+            response = self.client.get(
+                '/api/transactions/summary/?date_from=2024-10-01&date_to=2024-10-31&breakdown=1'
+            )
+        # The tampered rollup shows it was read instead of the transactions
+        self.assertEqual(response.data['total_income'], '9999.00')
+        self.assertEqual(response.data['total_expenses'], '1000.00')
+        self.assertEqual(response.data['pending_reviews'], 1)
+        self.assertEqual(len(response.data['breakdown']), 2)
+
+        response = self.client.get('/api/transactions/summary/?date_from=2024-10-02&date_to=2024-10-31')
+        self.assertEqual(response.data['total_income'], '8000.00')
+
+    def test_gstr3b_reads_approved_rollups(self):
+        """Test GSTR-3B totals come from the approved rollups for the period"""
+        self.create(kind='income', category='Sales', amount='50000.00', half_gst='4500.00', state='approved')
+        self.create(amount='20000.00', half_gst='1800.00', state='approved')
+        self.create(amount='7000.00', half_gst='630.00')
+
+        with self.assertNumQueries(2):
+            response = self.client.post('/api/compliance/generate-gstr3b/', {'period': '10-2024'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['outward_supplies']['taxable_value'], 50000.0)
+        self.assertEqual(response.data['inward_supplies']['cgst'], 1800.0)
+        self.assertEqual(response.data['tax_liability']['net_tax_payable'], 5400.0)
+        self.assertEqual(response.data['transaction_count'], 2)
+
+        response = self.client.post('/api/compliance/generate-gstr3b/', {'period': '13-2024'})
+        self.assertEqual(response.status_code, 400)
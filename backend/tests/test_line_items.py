@@ -0,0 +1,97 @@
+from django.test import TestCase
+from django.conf import settings
+from apps.ai_services.line_items import (
+    extract_line_items, items_to_rows, synthetic_invoice_words, LineItemExtractor,
+    words_from_ocr_data, text_from_ocr_data, words_from_pdfplumber
+)
+from pathlib import Path
+import numpy as np
+import pdfplumber
+
+SAMPLE_PDF = Path(settings.BASE_DIR).parent / 'Sample_Invoice_INR_CGST_SGST.pdf'
+
+class LineItemExtractionTestCase(TestCase):
+    def test_long_generated_invoice(self):
+        """Test every line of a 150 line table is read with its columns"""
+        items = extract_line_items([synthetic_invoice_words(150)])
+
+        self.assertEqual(len(items['amount']), 150)
+        self.assertEqual(items['description'][0], 'Item 0001 widget')
+        self.assertEqual(items['hsn'][1], '8472')
+        self.assertEqual(items['qty'][2], 3)
+        self.assertEqual(items['rate'][149], 249.0)
+        self.assertEqual(items['amount'][149], 249.0 * 3)
+        self.assertEqual(items['tax_rate'][0], 18.0)
+        self.assertIsNone(items['tax'][0])
+
+    def test_table_continues_on_next_page(self):
+        """Test a page without a header reuses the previous page's columns"""
+        first = synthetic_invoice_words(3, hsn=False)
+        second = synthetic_invoice_words(2, hsn=False)
+        # Drop the repeated header row from the second page
+        keep = slice(5, None)
+        second = {key: value[keep] for key, value in second.items()}
+        # The first page ends mid-table, without a closing subtotal row
+        first = {key: value[:-2] for key, value in first.items()}
+
+        items = extract_line_items([first, second])
+        self.assertEqual(len(items['amount']), 5)
+
+    def test_continuation_page_letterhead_not_appended(self):
+        """Test rows above the first item on a continuation page do not extend the last item"""
+        first = synthetic_invoice_words(3, hsn=False)
+        first = {key: value[:-2] for key, value in first.items()}
+        second = synthetic_invoice_words(2, hsn=False)
+        second = {key: value[5:] for key, value in second.items()}
+        # A letterhead line above the continued table
+        second['text'] = ['Acme', 'Traders'] + second['text']
+        for key, values in (('x0', [40, 80]), ('x1', [64, 122]), ('top', [10, 10]), ('bottom', [20, 20])):
+            second[key] = np.concatenate([values, second[key]])
+
+        items = extract_line_items([first, second])
+
+        self.assertEqual(len(items['amount']), 5)
+        self.assertEqual(items['description'][2], 'Item 0003 widget')
+
+    def test_pages_are_added_one_at_a_time(self):
+        """Test the incremental extractor gives the same items as a whole-document pass"""
+        pages = [synthetic_invoice_words(4), synthetic_invoice_words(2)]
+        extractor = LineItemExtractor()
+        for words in pages:
+            extractor.add_page(words)
+
+        self.assertEqual(extractor.pages, 2)
+        self.assertEqual(items_to_rows(extractor.items), items_to_rows(extract_line_items(pages)))
+        self.assertEqual(len(extractor.items['amount']), 6)
+
+    def test_sample_invoice(self):
+        """Test the bundled CGST/SGST sample yields its five service lines"""
+        with pdfplumber.open(SAMPLE_PDF) as pdf:
+            pages = [words_from_pdfplumber(page.extract_words(x_tolerance=2, y_tolerance=2))
+                     for page in pdf.pages]
+
+        rows = items_to_rows(extract_line_items(pages))
+
+        self.assertEqual(len(rows), 5)
+        self.assertEqual(rows[3]['description'], 'Cloud Hosting (3 months)')
+        self.assertEqual((rows[3]['qty'], rows[3]['rate'], rows[3]['amount']), (1.0, 4500.0, 4500.0))
+        self.assertEqual(sum(row['amount'] for row in rows), 47000.0)
+
+    def test_ocr_data_conversion(self):
+        """Test image_to_data output becomes word arrays and line text"""
+        data = {
+            'text': ['', 'Qty', 'Amount', '', '2', '500.00'],
+            'conf': ['-1', '96', '95', '-1', '91', '90'],
+            'left': [0, 10, 200, 0, 12, 198],
+            'top': [0, 10, 10, 0, 40, 40],
+            'width': [0, 30, 60, 0, 8, 62],
+            'height': [0, 12, 12, 0, 12, 12],
+            'block_num': [1, 1, 1, 1, 1, 1],
+            'par_num': [1, 1, 1, 1, 1, 1],
+            'line_num': [0, 1, 1, 0, 2, 2],
+        }
+        words = words_from_ocr_data(data)
+
+        self.assertEqual(words['text'], ['Qty', 'Amount', '2', '500.00'])
+        self.assertEqual(list(words['x1']), [40, 260, 20, 260])
+        self.assertEqual(text_from_ocr_data(data), 'Qty Amount\n2 500.00')
@@ -0,0 +1,162 @@
+from django.test import TestCase
+from django.contrib.auth import get_user_model
+from rest_framework.test import APIClient
+from apps.documents.models import Document
+from apps.transactions.models import Transaction
+from apps.transactions.matching import InvoiceMatcher, match_documents_for_user
+from datetime import date
+from decimal import Decimal
+
+User = get_user_model()
+
+class InvoiceMatcherTestCase(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(
+            username='testuser',
+            email='test@example.com',
+            password='testpass123',
+            role='SME'
+        )
+
+    def _create_transaction(self, **kwargs):
+        data = {
+            'user': self.user,
+            'date': date(2024, 10, 5),
+            'description': 'Purchase',
+            'amount': Decimal('11800.00'),
+            'type': 'expense',
+            'category': 'Materials',
+        }
+        data.update(kwargs)
+        return Transaction.objects.create(**data)
+
+    def _create_document(self, **kwargs):
+        data = {
+            'user': self.user,
+            'name': 'invoice.pdf',
+            'category': 'invoice',
+            'file': 'documents/1/invoice/invoice.pdf',
+            'file_size': 1024,
+            'mime_type': 'application/pdf',
+            'status': 'completed',
+        }
+        data.update(kwargs)
+        return Document.objects.create(**data)
+
+    def test_match_by_invoice_number_and_gstin(self):
+        """Test invoice number and GSTIN win over an amount-only candidate"""
+        matcher = InvoiceMatcher(amount_tolerance=0.01, date_window_days=7).build_index([
+            ('t1', '27AABCU9603R1ZM', 'INV-001', date(2024, 10, 20), Decimal('5000.00')),
+            ('t2', '', '', date(2024, 10, 2), Decimal('11800.00')),
+        ])
+
+        matches = matcher.match([
+            ('d1', '27AABCU9603R1ZM', 'inv/001', date(2024, 10, 1), Decimal('11800.00')),
+        ])
+
+        self.assertEqual(len(matches), 1)
+        self.assertEqual(matches[0].transaction_id, 't1')
+        self.assertIn('invoice_number', matches[0].reasons)
+        self.assertIn('gst_number', matches[0].reasons)
+
+    def test_match_by_amount_and_date_window(self):
+        """Test amount tolerance and date window are both enforced"""
+        matcher = InvoiceMatcher(amount_tolerance=0.01, date_window_days=3, min_score=0.3).build_index([
+            ('near', '', '', date(2024, 10, 3), Decimal('11850.00')),
+            ('late', '', '', date(2024, 10, 20), Decimal('11800.00')),
+            ('off', '', '', date(2024, 10, 1), Decimal('15000.00')),
+        ])
+
+        matches = matcher.match([
+            ('d1', '', '', date(2024, 10, 1), Decimal('11800.00')),
+        ])
+
+        self.assertEqual([match.transaction_id for match in matches], ['near'])
+
+    def test_matches_are_one_to_one(self):
+        """Test one transaction is never proposed for two documents"""
+        matcher = InvoiceMatcher(min_score=0.3).build_index([
+            ('t1', '', '', date(2024, 10, 1), Decimal('1000.00')),
+        ])
+
+        matches = matcher.match([
+            ('d1', '', '', date(2024, 10, 1), Decimal('1000.00')),
+            ('d2', '', '', date(2024, 10, 2), Decimal('1000.00')),
+        ])
+
+        self.assertEqual(len(matches), 1)
+        self.assertEqual(matches[0].document_id, 'd1')
+
+    def test_match_documents_for_user_applies_links(self):
+        """Test proposals are linked to Transaction.documents in bulk"""
+        transaction = self._create_transaction(
+            invoice_number='INV-2024-001', gst_number='27AABCU9603R1ZM'
+        )
+        self._create_transaction(date=date(2024, 3, 1), amount=Decimal('250.00'))
+        document = self._create_document(
+            invoice_number='INV-2024-001',
+            gst_number='27AABCU9603R1ZM',
+            invoice_date=date(2024, 10, 1),
+            invoice_amount=Decimal('11800.00'),
+        )
+
+        proposal = match_documents_for_user(self.user)
+        self.assertEqual(proposal['applied'], 0)
+        self.assertEqual(len(proposal['matches']), 1)
+        self.assertFalse(transaction.documents.exists())
+
+        result = match_documents_for_user(self.user, apply=True)
+        self.assertEqual(result['applied'], 1)
+        self.assertEqual(list(transaction.documents.all()), [document])
+
+        # Already linked pairs are not proposed again
+        self.assertEqual(match_documents_for_user(self.user)['matches'], [])
+
+    def test_linked_documents_and_transactions_are_not_rematched(self):
+        """Test either side of an existing link is left out of new proposals"""
+        linked_transaction = self._create_transaction(invoice_number='INV-7')
+        other_transaction = self._create_transaction(invoice_number='INV-8')
+        linked_document = self._create_document(
+            invoice_number='INV-8', invoice_date=date(2024, 10, 5), invoice_amount=Decimal('11800.00'),
+        )
+        new_document = self._create_document(
+            invoice_number='INV-7', invoice_date=date(2024, 10, 5), invoice_amount=Decimal('11800.00'),
+        )
+        linked_transaction.documents.add(linked_document)
+
+        result = match_documents_for_user(self.user)
+
+        self.assertEqual(result['matches'], [])
+        self.assertFalse(other_transaction.documents.exists())
+        self.assertFalse(new_document.linked_transactions.exists())
+
+    def test_invoice_numbers_prefiltered_after_normalization(self):
+        """Test a differently formatted number outside the date window is still found"""
+        transaction = self._create_transaction(invoice_number='INV001', date=date(2024, 6, 1))
+        self._create_document(
+            invoice_number='inv-001', invoice_date=date(2024, 10, 5), invoice_amount=Decimal('99.00'),
+        )
+
+        result = match_documents_for_user(self.user, min_score=0.5)
+
+        self.assertEqual([match['transaction_id'] for match in result['matches']], [str(transaction.id)])
+
+    def test_match_endpoint_parses_apply_and_document_ids(self):
+        """Test form-encoded apply=false does not link and bad ids are rejected"""
+        transaction = self._create_transaction(invoice_number='INV-9')
+        self._create_document(
+            invoice_number='INV-9', invoice_date=date(2024, 10, 5), invoice_amount=Decimal('11800.00'),
+        )
+        client = APIClient()
+        client.force_authenticate(user=self.user)
+
+        response = client.post('/api/transactions/match-documents/', {'apply': 'false'}, format='multipart')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.json()['matches']), 1)
+        self.assertEqual(response.json()['applied'], 0)
+        self.assertFalse(transaction.documents.exists())
+
+        response = client.post(
+            '/api/transactions/match-documents/', {'document_ids': ['not-a-uuid']}, format='json'
+        )
+        self.assertEqual(response.status_code, 400)
@@ -0,0 +1,69 @@
+from django.test import TestCase, override_settings
+from unittest.mock import patch
+from apps.ai_services.ocr_engines import (
+    get_ocr_engine, SubprocessTesseractEngine, TesserocrEngine
+)
+import numpy as np
+import sys
+import types
+import threading
+
+class FakeAPI:
+    created = 0
+
+    def __init__(self, **kwargs):
+        FakeAPI.created += 1
+        self.kwargs = kwargs
+        self.image = None
+
+    def SetImage(self, image):
+        self.image = image
+
+    def GetUTF8Text(self):
+        return f"{self.image.size[0]}x{self.image.size[1]}"
+
+    def Clear(self):
+        self.image = None
+
+    def End(self):
+        pass
+
+fake_tesserocr = types.SimpleNamespace(
+    PyTessBaseAPI=FakeAPI,
+    PSM=types.SimpleNamespace(AUTO=3),
+    OEM=types.SimpleNamespace(DEFAULT=3),
+)
+
+class OCREngineTestCase(TestCase):
+    def setUp(self):
+        FakeAPI.created = 0
+
+    def test_unknown_engine_rejected(self):
+        """Test a misspelled engine name fails loudly"""
+        with self.assertRaises(ValueError):
+            get_ocr_engine('tesseract-ng')
+
+    @override_settings(OCR_ENGINE='tesserocr')
+    def test_falls_back_without_tesserocr(self):
+        """Test the subprocess engine is used when tesserocr cannot be imported"""
+        with patch.dict(sys.modules, {'tesserocr': None}):
+            engine = get_ocr_engine()
+        self.assertIsInstance(engine, SubprocessTesseractEngine)
+
+    def test_tesserocr_reuses_handle_per_thread(self):
+        """Test one API handle serves every call on a thread"""
+        with patch.dict(sys.modules, {'tesserocr': fake_tesserocr}):
+            engine = get_ocr_engine('tesserocr', config='--oem 1 --psm 6')
+
+        self.assertIsInstance(engine, TesserocrEngine)
+        image = np.zeros((20, 40), np.uint8)
+        self.assertEqual(engine.image_to_string(image), '40x20')
+        self.assertEqual(engine.image_to_string(image), '40x20')
+        self.assertEqual(FakeAPI.created, 1)
+        self.assertEqual(engine._local.api.kwargs['psm'], 6)
+        self.assertEqual(engine._local.api.kwargs['oem'], 1)
+
+        worker = threading.Thread(target=engine.image_to_string, args=(image,))
+        worker.start()
+        worker.join()
+        self.assertEqual(FakeAPI.created, 2)
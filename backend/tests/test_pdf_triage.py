@@ -0,0 +1,104 @@
+from django.test import TestCase
+from django.conf import settings
+from unittest.mock import patch
+from apps.ai_services.pdf_triage import triage_pdf, routing_is_valid, render_pdf_pages
+from apps.ai_services.pdf_text import iter_pdf_text
+from apps.ai_services.ai_utils import OCRProcessor
+from PIL import Image, ImageDraw
+from pathlib import Path
+import pypdfium2 as pdfium
+import tempfile
+import os
+
+SAMPLE_PDF = Path(settings.BASE_DIR).parent / 'Sample_Invoice_INR.pdf'
+
+class FakeEngine:
+    name = 'fake'
+
+    def __init__(self):
+        self.calls = 0
+
+    def image_to_string(self, image):
+        self.calls += 1
+        return 'SCANNED PAGE TEXT'
+
+class PDFTriageTestCase(TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmpdir.name, 'mixed.pdf')
+
+        scan = Image.new('L', (850, 1100), 255)
+        ImageDraw.Draw(scan).text((100, 100), 'Total 500.00', fill=0)
+        scan_path = os.path.join(self.tmpdir.name, 'scan.pdf')
+        scan.save(scan_path, resolution=100)
+
+        # Digital page, scanned page, blank page
+        mixed = pdfium.PdfDocument.new()
+        mixed.import_pages(pdfium.PdfDocument(str(SAMPLE_PDF)))
+        mixed.import_pages(pdfium.PdfDocument(scan_path))
+        mixed.new_page(612, 792)
+        mixed.save(self.path)
+        mixed.close()
+
+    def tearDown(self):
+        self.tmpdir.cleanup()
+
+    def test_routes_each_page(self):
+        """Test mixed PDFs are routed page by page"""
+        routing = triage_pdf(self.path)
+        self.assertEqual(routing['pages'], ['text', 'ocr', 'empty'])
+        self.assertGreater(routing['chars'][0], 100)
+        self.assertGreater(routing['image_coverage'][1], 0.9)
+        self.assertTrue(routing_is_valid(routing, self.path))
+
+    def test_extract_text_ocrs_only_scanned_pages(self):
+        """Test the text layer and OCR output are merged in page order"""
+        ocr = OCRProcessor()
+        ocr.engine = FakeEngine()
+
+        text = ocr.extract_text(self.path)
+
+        self.assertEqual(ocr.engine.calls, 1)
+        self.assertTrue(text.endswith('SCANNED PAGE TEXT'))
+        self.assertIn('Invoice', text.split('SCANNED PAGE TEXT')[0])
+
+    def test_cached_routing_skips_triage(self):
+        """Test a stored routing for the same file is reused"""
+        ocr = OCRProcessor()
+        routing = triage_pdf(self.path)
+        with patch('apps.ai_services.ai_utils.triage_pdf') as triage:
+            self.assertIs(ocr.route_pdf(self.path, routing), routing)
+            triage.assert_not_called()
+
+            # A stale routing from another file is recomputed
+            ocr.route_pdf(self.path, dict(routing, file_size=1))
+            triage.assert_called_once()
+
+    def test_render_page_grayscale(self):
+        """Test pages render to 2D arrays at the requested DPI"""
+        (index, image), = render_pdf_pages(self.path, [1], dpi=72)
+        self.assertEqual(index, 1)
+        self.assertEqual(image.ndim, 2)
+        self.assertEqual(image.shape, (792, 612))
+
+    def test_iter_pdf_text_releases_pages(self):
+        """Test each page's layout cache is dropped once its text is yielded"""
+        with patch('pdfplumber.page.Page.close', autospec=True) as close:
+            pages = iter_pdf_text(str(SAMPLE_PDF))
+            index, text = next(pages)
+            # Closed while the document itself is still open
+            close.assert_called_once()
+            pages.close()
+        self.assertEqual(index, 0)
+        self.assertIn('Invoice', text)
+
+    def test_iter_pdf_pages_stops_early(self):
+        """Test the stop predicate ends the walk before later pages are OCR'd"""
+        ocr = OCRProcessor()
+        ocr.engine = FakeEngine()
+        routing = triage_pdf(self.path)
+
+        pages = list(ocr.iter_pdf_pages(self.path, routing, stop=lambda index, text: 'Invoice' in text))
+
+        self.assertEqual([index for index, _ in pages], [0])
+        self.assertEqual(ocr.engine.calls, 0)
@@ -0,0 +1,92 @@
+from django.test import TestCase
+from django.contrib.auth import get_user_model
+from rest_framework.test import APIClient
+from apps.documents.models import Document
+from apps.ai_services.instrumentation import PipelineTrace, stage, summarize_stage_timings
+from apps.ai_services.models import AIModel, DocumentStageMetric
+from apps.ai_services.tasks import save_stage_metrics, aggregate_pipeline_metrics, PIPELINE_MODEL_NAME
+import time
+
+User = get_user_model()
+
+class PipelineMetricsTestCase(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(
+            username='admin',
+            email='admin@example.com',
+            password='testpass123',
+            is_staff=True
+        )
+        self.document = Document.objects.create(
+            user=self.user,
+            name='invoice.pdf',
+            category='invoice',
+            file='documents/1/invoice/invoice.pdf',
+            file_size=1024,
+            mime_type='application/pdf'
+        )
+
+    def test_stage_records_only_inside_trace(self):
+        """Test stages are timed inside a trace and ignored outside one"""
+        with stage('regex'):
+            pass
+
+        started = []
+        with PipelineTrace(on_stage=started.append) as trace:
+            with stage('pdfplumber', input_bytes=2048) as metrics:
+                metrics['page_count'] = 3
+
+        self.assertEqual(started, ['pdfplumber'])
+        self.assertEqual(len(trace.stages), 1)
+        recorded = trace.stages[0]
+        self.assertEqual(recorded['page_count'], 3)
+        self.assertEqual(recorded['input_bytes'], 2048)
+        self.assertGreaterEqual(recorded['wall_time_ms'], 0)
+        self.assertGreaterEqual(recorded['cpu_time_ms'], 0)
+
+    def test_total_does_not_count_nested_stages_twice(self):
+        """Test the trace total is the traced block's wall time, not the sum of nested stages"""
+        with PipelineTrace() as trace:
+            with stage('pdf_pages'):
+                with stage('tesseract'):
+                    time.sleep(0.05)
+
+        stage_sum = sum(metrics['wall_time_ms'] for metrics in trace.stages)
+        self.assertGreaterEqual(trace.total_wall_ms(), 50)
+        self.assertLess(trace.total_wall_ms(), stage_sum)
+
+    def test_summarize_stage_timings(self):
+        """Test percentiles are computed per stage"""
+        rows = [('tesseract', float(ms), float(ms) / 2) for ms in range(1, 101)]
+        rows.append(('regex', 1.0, 1.0))
+
+        summary = summarize_stage_timings(rows)
+
+        self.assertEqual(summary['tesseract']['count'], 100)
+        self.assertAlmostEqual(summary['tesseract']['wall_ms']['p50'], 50.5)
+        self.assertAlmostEqual(summary['tesseract']['wall_ms']['p99'], 99.01)
+        self.assertEqual(summary['regex']['wall_ms']['p95'], 1.0)
+
+    def test_aggregate_and_api(self):
+        """Test stored stage metrics are aggregated onto the pipeline AIModel"""
+        save_stage_metrics(str(self.document.id), [
+            {'stage': 'ner', 'wall_time_ms': 120.0, 'cpu_time_ms': 110.0,
+             'page_count': None, 'input_bytes': 500, 'details': {}},
+            {'stage': 'tesseract', 'wall_time_ms': 900.0, 'cpu_time_ms': 850.0,
+             'page_count': 1, 'input_bytes': 40000, 'details': {}},
+        ])
+        self.assertEqual(DocumentStageMetric.objects.count(), 2)
+
+        metrics = aggregate_pipeline_metrics(days=1)
+        self.assertEqual(set(metrics['stages']), {'ner', 'tesseract'})
+        stored = AIModel.objects.get(name=PIPELINE_MODEL_NAME).performance_metrics
+        self.assertEqual(stored['stages']['tesseract']['wall_ms']['p50'], 900.0)
+
+        client = APIClient()
+        client.force_authenticate(user=self.user)
+        response = client.get('/api/ai/pipeline-metrics/')
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('ner', response.data['stages'])
+
+        response = client.get(f'/api/ai/pipeline-metrics/?document_id={self.document.id}')
+        self.assertEqual(len(response.data['stages']), 2)
@@ -0,0 +1,51 @@
+from django.test import TestCase
+from apps.ai_services.preprocessing import ImagePreprocessor
+from apps.ai_services.benchmark import preprocessing_variants
+import cv2
+import numpy as np
+
+class ImagePreprocessorTestCase(TestCase):
+    def _photo(self, angle=0):
+        """A page of text, optionally rotated, lying on a darker background"""
+        page = np.full((1650, 1250), 255, np.uint8)
+        for i in range(20):
+            cv2.putText(page, f"Line {i} CGST 9% Amount 12,345.00", (80, 100 + i * 70),
+                        cv2.FONT_HERSHEY_SIMPLEX, 1.2, 0, 2)
+        if angle:
+            matrix = cv2.getRotationMatrix2D((625, 825), angle, 1.0)
+            page = cv2.warpAffine(page, matrix, (1250, 1650), borderValue=255)
+        canvas = np.full((2000, 1600), 60, np.uint8)
+        canvas[150:1800, 175:1425] = page
+        return canvas
+
+    def test_crops_and_deskews_photo(self):
+        """Test the page is cropped out of the background and straightened"""
+        processed, details = ImagePreprocessor().run(self._photo(angle=5))
+
+        self.assertIn('crop', details)
+        self.assertAlmostEqual(abs(details['deskew_angle']), 5, delta=1)
+        self.assertLess(details['pixels_out'], details['pixels_in'])
+        self.assertEqual(set(np.unique(processed)), {0, 255})
+
+    def test_skips_deskew_on_straight_page(self):
+        """Test a straight page is not resampled for rotation"""
+        _, details = ImagePreprocessor().run(self._photo())
+        self.assertNotIn('deskew_angle', details)
+
+    def test_disabled_stages_are_not_run(self):
+        """Test an empty stage list hands back the grayscale input"""
+        image = self._photo()
+        processed, details = ImagePreprocessor(stages=[]).run(image)
+
+        self.assertTrue(np.array_equal(processed, image))
+        self.assertEqual(details['pixels_in'], details['pixels_out'])
+
+    def test_sweep_variants(self):
+        """Test the sweep covers each stage switched off plus both extremes"""
+        variants = preprocessing_variants(['crop', 'threshold'])
+        self.assertEqual(variants, {
+            'all': ['crop', 'threshold'],
+            'no_crop': ['threshold'],
+            'no_threshold': ['crop'],
+            'none': [],
+        })
@@ -0,0 +1,131 @@
+from django.test import TestCase
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APIClient
+from apps.ai_services.models import AIInsight
+from apps.compliance.models import ComplianceCalendar, ComplianceRule
+from apps.transactions.models import Transaction
+from apps.transactions.rollups import rebuild_rollups
+from apps.users.models import AuditLog
+from datetime import date, timedelta
+from decimal import Decimal
+import re
+
+User = get_user_model()
+
+# Tables that grow with each user's history; a full scan of any of these is a regression
+HOT_TABLES = {'transactions', 'ai_insights', 'audit_logs', 'compliance_calendar', 'documents', 'ledger_rollups'}
+
+HOT_ENDPOINTS = [
+    ('get', '/api/transactions/', None),
+    ('get', '/api/transactions/?status=pending&date_from=2024-05-01', None),
+    ('get', '/api/transactions/?type=income&date_to=2024-06-30', None),
+    ('get', '/api/transactions/?pagination=cursor', None),
+    ('get', '/api/transactions/?search=row%2012', None),
+    ('get', '/api/transactions/summary/', None),
+    ('get', '/api/transactions/summary/?date_from=2024-05-02&date_to=2024-08-15', None),
+    ('get', '/api/transactions/export/?status=approved', None),
+    ('post', '/api/compliance/generate-gstr3b/', {'period': '06-2024'}),
+    ('get', '/api/ai/insights/?priority=high', None),
+    ('get', '/api/ai/analytics/', None),
+    ('get', '/api/auth/audit-logs/', None),
+    ('get', '/api/compliance/calendar/?completed=false', None),
+    ('get', '/api/compliance/dashboard/', None),
+]
+
+def explain(sql):
+    """Return ``(plan text, hot tables read with a sequential scan)``"""
+    with connection.cursor() as cursor:
+        if connection.vendor == 'postgresql':
+            cursor.execute('EXPLAIN ' + sql)
+            plan = '\n'.join(row[0] for row in cursor.fetchall())
+            scanned = re.findall(r'Seq Scan on (\w+)', plan)
+        else:
+            cursor.execute('EXPLAIN QUERY PLAN ' + sql)
+            plan = '\n'.join(str(row[-1]) for row in cursor.fetchall())
+            # "SCAN table USING [COVERING] INDEX" walks an index; bare "SCAN table" reads every row
+            scanned = re.findall(r'\bSCAN (\w+)\b(?! USING)', plan)
+    return plan, sorted(set(scanned) & HOT_TABLES)
+
+class QueryPlanTestCase(TestCase):
+    """Every query behind the hot endpoints must reach its rows through an index"""
+
+    @classmethod
+    def setUpTestData(cls):
+        users = [
+            User.objects.create_user(
+                username=f'user{index}', email=f'user{index}@example.com', password='testpass123', role='SME'
+            )
+            for index in range(8)
+        ]
+        cls.user = users[0]
+        rule = ComplianceRule.objects.create(
+            name='GSTR-3B', rule_type='gst_filing', description='Monthly return',
+            consequences='Late fee', due_period='monthly'
+        )
+        start = date(2024, 4, 1)
+        for user in users:
+            Transaction.objects.bulk_create([
+                Transaction(
+                    user=user, date=start + timedelta(days=index % 365), description=f'Row {index}',
+                    amount=Decimal('1000.00'), type='income' if index % 3 else 'expense',
+                    category=['Sales', 'Rent', 'Travel'][index % 3],
+                    status=['pending', 'approved', 'rejected'][index % 3],
+                    cgst_amount=Decimal('90.00'), sgst_amount=Decimal('90.00'),
+                )
+                for index in range(1500)
+            ])
+            AIInsight.objects.bulk_create([
+                AIInsight(
+                    user=user, insight_type=AIInsight.TYPE_CHOICES[index % 6][0], title='Insight',
+                    description='Seeded', priority=['low', 'medium', 'high'][index % 3],
+                    is_dismissed=index % 4 == 0,
+                )
+                for index in range(400)
+            ])
+            AuditLog.objects.bulk_create([
+                AuditLog(user=user, action='VIEW', resource='transaction') for _ in range(400)
+            ])
+            ComplianceCalendar.objects.bulk_create([
+                ComplianceCalendar(
+                    user=user, rule=rule, due_date=start + timedelta(days=index), title='Return due',
+                    is_completed=index % 2 == 0,
+                )
+                for index in range(200)
+            ])
+        rebuild_rollups()
+        with connection.cursor() as cursor:
+            cursor.execute('ANALYZE')
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.user)
+
+    def test_hot_endpoints_use_indexes(self):
+        """Test no hot endpoint query falls back to a sequential scan"""
+        regressions = []
+        for method, url, data in HOT_ENDPOINTS:
+            # The seeding filled the bounded query log, which would hide new entries
+            connection.queries_log.clear()
+            with CaptureQueriesContext(connection) as queries:
+                response = getattr(self.client, method)(url, data)
+                if response.streaming:
+                    b''.join(response.streaming_content)
+            self.assertLess(response.status_code, 400, url)
+
+            for query in queries.captured_queries:
+                sql = query['sql']
+                if not sql.lstrip().upper().startswith('SELECT'):
+                    continue
+                plan, scanned = explain(sql)
+                if scanned:
+                    regressions.append(f'{method.upper()} {url}: {", ".join(scanned)}\n  {sql}\n  {plan}')
+
+        self.assertFalse(regressions, 'Sequential scans on hot tables:\n' + '\n'.join(regressions))
+
+    def test_detects_a_sequential_scan(self):
+        """Test the checker itself flags an unindexed predicate"""
+        sql = str(Transaction.objects.filter(description='Row 1').query)
+        _, scanned = explain(sql.replace('= Row 1', "= 'Row 1'"))
+        self.assertEqual(scanned, ['transactions'])
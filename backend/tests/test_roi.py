@@ -0,0 +1,126 @@
+from django.test import TestCase
+from apps.ai_services.roi import RegionOCR, detect_text_blocks, classify_region
+from apps.ai_services.ai_utils import InvoiceDataExtractor, OCRProcessor
+import cv2
+import numpy as np
+
+class ScriptedEngine:
+    """Returns canned text in call order and records the crops it was given"""
+    name = 'subprocess'
+
+    def __init__(self, texts):
+        self.texts = list(texts)
+        self.calls = []
+
+    def image_to_string(self, image):
+        self.calls.append(image.shape)
+        return self.texts.pop(0)
+
+class PageDataEngine:
+    """Answers a whole-page ``image_to_data`` call with one word line per block"""
+    name = 'subprocess'
+
+    def __init__(self, boxes, texts, scale):
+        self.boxes, self.texts, self.scale = boxes, texts, scale
+        self.calls = []
+
+    def image_to_data(self, image):
+        self.calls.append(image.shape)
+        data = {key: [] for key in ['block_num', 'par_num', 'line_num', 'word_num',
+                                    'left', 'top', 'width', 'height', 'conf', 'text']}
+        for block, ((x, y, w, h), text) in enumerate(zip(self.boxes, self.texts), start=1):
+            words = text.split()
+            for index, word in enumerate(words):
+                width = w / len(words)
+                data['block_num'].append(block)
+                data['par_num'].append(1)
+                data['line_num'].append(1)
+                data['word_num'].append(index + 1)
+                data['left'].append(int((x + index * width) * self.scale))
+                data['top'].append(int(y * self.scale))
+                data['width'].append(int(width * self.scale))
+                data['height'].append(int(h * self.scale))
+                data['conf'].append(90)
+                data['text'].append(word)
+        return data
+
+class NoopNER:
+    def extract_entities(self, text):
+        return []
+
+def _page(lines):
+    page = np.full((1400, 1000), 255, np.uint8)
+    for i, line in enumerate(lines):
+        cv2.putText(page, line, (60, 100 + i * 120), cv2.FONT_HERSHEY_SIMPLEX, 1.0, 0, 2)
+    return page
+
+class RegionOCRTestCase(TestCase):
+    def test_detects_one_block_per_line(self):
+        """Test separate text lines come back as separate blocks, top to bottom"""
+        boxes = detect_text_blocks(_page(['TAX INVOICE', 'Widget x 2', 'Total 500.00']))
+        self.assertEqual(len(boxes), 3)
+        self.assertEqual([box[1] for box in boxes], sorted(box[1] for box in boxes))
+
+    def test_classify_region(self):
+        """Test keywords decide the region kind and position catches garbled headers"""
+        self.assertEqual(classify_region('CGST @ 9%: 90.00', (0, 900, 10, 10), 1000), 'tax')
+        self.assertEqual(classify_region('Grand Total 1,180.00', (0, 900, 10, 10), 1000), 'totals')
+        self.assertEqual(classify_region('Acme Traders', (0, 50, 10, 10), 1000), 'header')
+        self.assertEqual(classify_region('Widget x 2', (0, 500, 10, 10), 1000), 'body')
+
+    def test_only_key_regions_get_accurate_pass(self):
+        """Test one fast page pass classifies blocks and only key blocks are re-OCR'd"""
+        page = _page(['', '', '', 'Invoice No: INV-9', 'Widget x 2', 'Total 500.00'])
+        accurate = ScriptedEngine(['Invoice No: INV-9', 'Total: 500.00'])
+        region_ocr = RegionOCR(engine=accurate, body='fast', fast_scale=0.5)
+        region_ocr.fast_engine = PageDataEngine(
+            detect_text_blocks(page), ['Invoice No INV-9', 'Widget x 2', 'Total 5O0.00'], 0.5
+        )
+
+        regions = region_ocr.run(page)
+
+        self.assertEqual([r['kind'] for r in regions], ['header', 'body', 'totals'])
+        self.assertEqual([r['quality'] for r in regions], ['accurate', 'fast', 'accurate'])
+        self.assertEqual(regions[1]['text'], 'Widget x 2')
+        self.assertEqual(len(accurate.calls), 2)
+        # The fast pass is a single call on a downscaled page
+        self.assertEqual(region_ocr.fast_engine.calls, [(700, 500)])
+
+    def test_skipped_body_blocks_get_no_ocr(self):
+        """Test body blocks are dropped before the accurate pass when skipping"""
+        page = _page(['', '', '', 'Invoice No: INV-9', 'Widget x 2', 'Total 500.00'])
+        accurate = ScriptedEngine(['Invoice No: INV-9', 'Total: 500.00'])
+        region_ocr = RegionOCR(engine=accurate, body='skip', fast_scale=0.5)
+        region_ocr.fast_engine = PageDataEngine(
+            detect_text_blocks(page), ['Invoice No INV-9', 'Widget x 2', 'Total 5O0.00'], 0.5
+        )
+
+        regions = region_ocr.run(page)
+
+        self.assertEqual([r['kind'] for r in regions], ['header', 'totals'])
+        self.assertEqual(len(accurate.calls), 2)
+        self.assertEqual(len(region_ocr.fast_engine.calls), 1)
+
+    def test_roi_mode_needs_in_process_engine(self):
+        """Test the subprocess engine falls back to full-page OCR"""
+        ocr = OCRProcessor(engine='subprocess')
+        ocr.mode = 'roi'
+
+        self.assertFalse(ocr.use_regions())
+        self.assertFalse(ocr.use_regions('full'))
+
+    def test_fields_come_from_their_regions(self):
+        """Test the total is read from the totals block rather than an item line"""
+        regions = [
+            {'kind': 'header', 'box': [0, 0, 10, 10], 'text': 'Invoice No: INV-9', 'quality': 'accurate'},
+            {'kind': 'body', 'box': [0, 20, 10, 10], 'text': 'Total items: 3', 'quality': 'fast'},
+            {'kind': 'totals', 'box': [0, 40, 10, 10], 'text': 'Total: 1,180.00', 'quality': 'accurate'},
+        ]
+        extractor = InvoiceDataExtractor(ocr=object(), ner=NoopNER())
+        text = "\n".join(r['text'] for r in regions)
+
+        data = extractor._extract_from_regions(regions, text)
+
+        self.assertEqual(data['invoice_number'], 'INV-9')
+        self.assertEqual(data['amount'], 1180.0)
+        self.assertEqual([r['kind'] for r in data['regions']], ['header', 'body', 'totals'])
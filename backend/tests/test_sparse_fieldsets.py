@@ -0,0 +1,129 @@
+from django.test import TestCase
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework.renderers import JSONRenderer
+from rest_framework.test import APIClient, APIRequestFactory
+from apps.ai_services.models import AIInsight
+from apps.ai_services.serializers import AIInsightSerializer
+from apps.documents.models import Document
+from apps.documents.serializers import DocumentSerializer
+from apps.transactions.models import Transaction
+from apps.transactions.serializers import TransactionSerializer
+from decimal import Decimal
+import json
+
+User = get_user_model()
+
+def as_json(data):
+    return json.loads(JSONRenderer().render(data))
+
+class SparseFieldsetTestCase(TestCase):
+    maxDiff = None
+
+    def setUp(self):
+        self.user = User.objects.create_user(
+            username='testuser', email='test@example.com', password='testpass123', role='SME',
+            first_name='Asha', last_name='Rao'
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.user)
+        self.request = APIRequestFactory().get('/')
+        self.documents = [
+            Document.objects.create(
+                user=self.user, name=f'invoice{index}.pdf', category='invoice',
+                file=f'documents/1/invoice/invoice{index}.pdf', file_size=1024,
+                mime_type='application/pdf', status='completed',
+                extracted_text='lorem ipsum ' * 500, extracted_data={'total': 1180 + index}
+            )
+            for index in range(3)
+        ]
+        for index in range(6):
+            txn = Transaction.objects.create(
+                user=self.user, date=f'2024-10-{index + 1:02d}', description=f'Purchase {index}',
+                amount=Decimal('1180.00'), type='expense', category='Materials',
+                cgst_amount=Decimal('90.00'), sgst_amount=Decimal('90.00'), tds_amount=Decimal('10.00'),
+                reviewed_by=self.user if index % 2 else None, reviewed_at=timezone.now() if index % 2 else None,
+            )
+            txn.documents.set(self.documents[:index % 3])
+
+    def expected(self, serializer_class, queryset, request):
+        return as_json(serializer_class(queryset, many=True, context={'request': request}).data)
+
+    def test_transaction_list_matches_full_serializer_without_documents(self):
+        """Test the values() rows equal the model serializer's, minus the opt-in documents"""
+        response = self.client.get('/api/transactions/')
+        self.assertEqual(response.status_code, 200)
+        rows = json.loads(response.content)['results']
+
+        expected = self.expected(TransactionSerializer, Transaction.objects.filter(user=self.user),
+                                 response.wsgi_request)
+        for row in expected:
+            del row['documents']
+        self.assertEqual(rows, expected)
+
+    def test_expand_documents_restores_full_payload_in_constant_queries(self):
+        """Test ?expand=documents matches the old nested payload with a fixed query count"""
+        with CaptureQueriesContext(connection) as small:
+            response = self.client.get('/api/transactions/?expand=documents')
+        rows = json.loads(response.content)['results']
+        expected = self.expected(TransactionSerializer, Transaction.objects.filter(user=self.user),
+                                 response.wsgi_request)
+        self.assertEqual(rows, expected)
+
+        txn = Transaction.objects.create(
+            user=self.user, date='2024-10-20', description='More', amount=Decimal('10.00'),
+            type='expense', category='Materials'
+        )
+        txn.documents.set(self.documents)
+        with CaptureQueriesContext(connection) as large:
+            self.client.get('/api/transactions/?expand=documents')
+        self.assertEqual(len(large.captured_queries), len(small.captured_queries))
+
+    def test_fields_limit_rows_and_work_with_cursor_pages(self):
+        """Test ?fields= returns only the named fields, including under keyset pagination"""
+        response = self.client.get('/api/transactions/?fields=id,net_amount&pagination=cursor')
+        row = response.data['results'][0]
+        self.assertEqual(set(row), {'id', 'net_amount'})
+        self.assertEqual(row['net_amount'], Decimal('1170.00'))
+
+        response = self.client.get('/api/transactions/?fields=description&pagination=cursor')
+        self.assertEqual(len(response.data['results']), 6)
+        self.assertEqual(set(response.data['results'][0]), {'description'})
+
+        response = self.client.get('/api/transactions/?fields=id,secret')
+        self.assertEqual(response.status_code, 400)
+
+    def test_document_list_leaves_out_extracted_content(self):
+        """Test extracted text and data are opt-in on the document list"""
+        response = self.client.get('/api/documents/')
+        rows = json.loads(response.content)['results']
+        expected = self.expected(DocumentSerializer, Document.objects.filter(user=self.user),
+                                 response.wsgi_request)
+        for row in expected:
+            del row['extracted_text'], row['extracted_data']
+        self.assertEqual(rows, expected)
+
+        response = self.client.get('/api/documents/?expand=extracted_data&fields=id,name')
+        row = response.data['results'][0]
+        self.assertEqual(set(row), {'id', 'name', 'extracted_data'})
+        self.assertEqual(row['extracted_data'], {'total': 1182})
+
+    def test_insight_counts_in_one_query(self):
+        """Test insight relation counts come from the list query instead of per row"""
+        for index in range(5):
+            insight = AIInsight.objects.create(
+                user=self.user, insight_type='anomaly', title=f'Insight {index}',
+                description='Check', priority='high'
+            )
+            insight.related_transactions.set(Transaction.objects.filter(user=self.user)[:index])
+            insight.related_documents.set(self.documents[:1])
+
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get('/api/ai/insights/')
+        self.assertEqual(len(queries.captured_queries), 2)  # COUNT and the page
+        rows = json.loads(response.content)['results']
+        expected = self.expected(AIInsightSerializer, AIInsight.objects.filter(user=self.user),
+                                 response.wsgi_request)
+        self.assertEqual(rows, expected)
@@ -0,0 +1,223 @@
+from django.test import TestCase, override_settings
+from django.contrib.auth import get_user_model
+from apps.documents.models import Document
+from apps.transactions.models import Transaction
+from apps.transactions.statements import (
+    StatementParser, import_statement, iter_statement_rows, read_statement, StatementFormatError
+)
+from apps.ai_services.workers import ExtractionPool, ExtractionResult
+from datetime import date, datetime, timedelta
+from decimal import Decimal
+from pathlib import Path
+from unittest.mock import ANY, patch
+import tempfile
+import tracemalloc
+import shutil
+
+User = get_user_model()
+
+class StatementImportTestCase(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(
+            username='testuser', email='test@example.com', password='testpass123', role='SME'
+        )
+        self.media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.media_root)
+        media = override_settings(MEDIA_ROOT=self.media_root)
+        media.enable()
+        self.addCleanup(media.disable)
+
+    def _document(self, filename, write):
+        path = Path(self.media_root) / 'documents' / filename
+        path.parent.mkdir(parents=True, exist_ok=True)
+        write(path)
+        return Document.objects.create(
+            user=self.user, name=filename, category='bank_statement',
+            file=f'documents/{filename}', file_size=path.stat().st_size, mime_type='text/csv'
+        )
+
+    def _write_csv(self, count):
+        def write(path):
+            with open(path, 'w') as f:
+                f.write('Account Statement,,,,\nAccount No: 000123456789,,,,\n')
+                f.write('Opening Balance: 1000.00,,,,\n')
+                f.write('Txn Date,Narration,Withdrawal Amt.,Deposit Amt.,Closing Balance\n')
+                balance = Decimal('1000.00')
+                start = date(2024, 4, 1)
+                for index in range(count):
+                    amount = Decimal(index % 50 + 1)
+                    withdrawal = index % 3 != 0
+                    balance += -amount if withdrawal else amount
+                    day = (start + timedelta(days=index // 60)).strftime('%d/%m/%Y')
+                    debit, credit = (f'{amount:.2f}', '') if withdrawal else ('', f'{amount:.2f}')
+                    f.write(f'{day},UPI/{index:06d}/Payee {index % 40},{debit},{credit},{balance:.2f}\n')
+        return write
+
+    def test_csv_statement_imported_in_chunks(self):
+        """Test CSV rows become linked transactions with income/expense from their columns"""
+        document = self._document('statement.csv', self._write_csv(2500))
+
+        with patch.object(Transaction.objects, 'bulk_create',
+                          wraps=Transaction.objects.bulk_create) as bulk_create:
+            stats = import_statement(document, chunk_size=1000)
+
+        self.assertEqual([len(call.args[0]) for call in bulk_create.call_args_list], [1000, 1000, 500])
+
+        self.assertEqual(stats['rows'], 2500)
+        self.assertEqual(stats['first_date'], '2024-04-01')
+        self.assertGreater(stats['rows_per_second'], 0)
+        self.assertEqual(document.linked_transactions.count(), 2500)
+        self.assertEqual(Transaction.objects.filter(user=self.user, type='income').count(), 834)
+        first = Transaction.objects.get(description='UPI/000000/Payee 0')
+        self.assertEqual((first.amount, first.type), (Decimal('1.00'), 'income'))
+
+    def test_reimport_replaces_previous_rows(self):
+        """Test importing the same statement twice does not duplicate transactions"""
+        document = self._document('statement.csv', self._write_csv(10))
+        import_statement(document)
+        import_statement(document)
+        self.assertEqual(Transaction.objects.filter(user=self.user).count(), 10)
+
+    def test_xlsx_signed_by_direction_column(self):
+        """Test an XLSX sheet with an amount and a Dr/Cr column"""
+        from openpyxl import Workbook
+
+        def write(path):
+            workbook = Workbook()
+            sheet = workbook.active
+            sheet.append(['Date', 'Particulars', 'Amount (INR)', 'Dr/Cr', 'Balance'])
+            sheet.append([datetime(2024, 5, 2), 'Salary May', 85000, 'CR', 95000])
+            sheet.append([datetime(2024, 5, 3), 'Rent', 25000, 'DR', 70000])
+            sheet.append([None, None, None, None, None])
+            workbook.save(path)
+        document = self._document('statement.xlsx', write)
+
+        import_statement(document)
+
+        rows = list(Transaction.objects.filter(user=self.user).order_by('date')
+                    .values_list('date', 'description', 'amount', 'type'))
+        self.assertEqual(rows, [
+            (date(2024, 5, 2), 'Salary May', Decimal('85000.00'), 'income'),
+            (date(2024, 5, 3), 'Rent', Decimal('25000.00'), 'expense'),
+        ])
+
+    def test_unrecognized_file_raises(self):
+        """Test a file without a statement table is reported, not silently empty"""
+        document = self._document('notes.csv', lambda path: path.write_text('hello,world\n'))
+        with self.assertRaises(StatementFormatError):
+            import_statement(document)
+
+    def test_process_document_imports_statement(self):
+        """Test processing a bank statement document imports it instead of extracting invoice data"""
+        from apps.ai_services.tasks import process_document
+        document = self._document('statement.csv', self._write_csv(20))
+
+        with patch('apps.ai_services.tasks.extract_document_data') as extract:
+            process_document(str(document.id))
+
+        extract.assert_not_called()
+        document.refresh_from_db()
+        self.assertEqual(document.status, 'completed')
+        self.assertEqual(document.extracted_data['statement']['rows'], 20)
+        self.assertEqual(document.linked_transactions.count(), 20)
+
+    def test_pdf_statement_parsed_in_extraction_worker(self):
+        """Test PDF statements are parsed by the sandbox and only written in this process"""
+        from apps.ai_services.tasks import import_bank_statement
+        source = self._document('rows.csv', self._write_csv(30))
+        document = self._document('statement.pdf', lambda path: path.write_bytes(b'%PDF-1.4'))
+
+        def parse_in_worker(file_path, on_rows, **kwargs):
+            return ExtractionResult(data=read_statement(source.file.path, on_rows, chunk_size=10))
+
+        with override_settings(EXTRACTION_ISOLATION=True), \
+                patch('apps.ai_services.workers.get_extraction_pool') as get_pool, \
+                patch('apps.transactions.statements.iter_statement_rows',
+                      wraps=iter_statement_rows) as iter_rows:
+            get_pool.return_value.parse_statement.side_effect = parse_in_worker
+            import_bank_statement(document)
+
+        get_pool.return_value.parse_statement.assert_called_once()
+        # Only the stand-in worker read the file; this process only wrote rows
+        iter_rows.assert_called_once_with(source.file.path, ANY)
+        self.assertEqual(document.extracted_data['statement']['rows'], 30)
+        self.assertEqual(document.linked_transactions.count(), 30)
+
+    def test_statement_worker_failure_fails_import(self):
+        """Test a timed-out or crashed statement parse is reported and writes nothing"""
+        from apps.ai_services.tasks import import_bank_statement
+        document = self._document('statement.pdf', lambda path: path.write_bytes(b'%PDF-1.4'))
+        source = self._document('rows.csv', self._write_csv(30))
+
+        def time_out_midway(file_path, on_rows, **kwargs):
+            # Some chunks arrive before the worker is killed
+            read_statement(source.file.path, on_rows, chunk_size=10)
+            return ExtractionResult(failure_reason='Extraction timed out after 120s')
+
+        with override_settings(EXTRACTION_ISOLATION=True), \
+                patch('apps.ai_services.workers.get_extraction_pool') as get_pool:
+            get_pool.return_value.parse_statement.side_effect = time_out_midway
+            with self.assertRaisesMessage(RuntimeError, 'timed out'):
+                import_bank_statement(document)
+        self.assertFalse(Transaction.objects.exists())
+
+    def test_statement_streamed_by_real_worker(self):
+        """Test the default worker handler streams statement rows back in chunks"""
+        document = self._document('worker.csv', self._write_csv(25))
+        pool = ExtractionPool(max_workers=1, max_jobs=1, timeout=60, max_rss_mb=0, start_timeout=120)
+        self.addCleanup(pool.shutdown)
+        chunks = []
+
+        def parse(write):
+            def on_rows(rows):
+                chunks.append(len(rows))
+                write(rows)
+            result = pool.parse_statement(document.file.path, on_rows, chunk_size=10)
+            self.assertTrue(result.ok, result.failure_reason)
+            return result.data
+
+        stats = import_statement(document, parse=parse)
+
+        self.assertEqual(chunks, [10, 10, 5])
+        self.assertEqual(stats['rows'], 25)
+        self.assertEqual(document.linked_transactions.count(), 25)
+
+    def test_memory_bounded_by_chunk(self):
+        """Test a long statement imports without holding every row in memory"""
+        document = self._document('annual.csv', self._write_csv(5000))
+
+        tracemalloc.start()
+        try:
+            stats = import_statement(document, chunk_size=500)
+            _, peak = tracemalloc.get_traced_memory()
+        finally:
+            tracemalloc.stop()
+
+        self.assertEqual(stats['rows'], 5000)
+        # Holding all 5,000 rows at once peaks around 11MB
+        self.assertLess(peak, 6 * 1024 * 1024)
+
+class StatementTextParsingTestCase(TestCase):
+    def test_pdf_lines_signed_by_running_balance(self):
+        """Test text lines with a single amount are signed by the balance movement"""
+        parser = StatementParser()
+        lines = [
+            'Statement of Account',
+            'Date Value Date Description Amount Balance',
+            'Opening Balance 10,000.00',
+            '01-04-2024 01-04-2024 NEFT ACME CORP 2,500.00 12,500.00',
+            'INVOICE 1042',
+            '02-04-2024 02-04-2024 ATM WDL 1,000.00 11,500.00',
+            '03-04-2024 POS GROCERY 450.00 Dr 11,050.00 Cr',
+            'Page 1 of 2',
+        ]
+        rows = [row for row in map(parser.feed_line, lines) if row is not None]
+        rows.append(parser.flush())
+
+        self.assertEqual([(row.description, row.amount, row.type) for row in rows], [
+            ('NEFT ACME CORP INVOICE 1042', Decimal('2500.00'), 'income'),
+            ('ATM WDL', Decimal('1000.00'), 'expense'),
+            ('POS GROCERY', Decimal('450.00'), 'expense'),
+        ])
+        self.assertEqual(rows[0].date, date(2024, 4, 1))
+        self.assertEqual(parser.previous_balance, Decimal('11050.00'))
@@ -0,0 +1,112 @@
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.db import connection
+from django.contrib.auth import get_user_model
+from rest_framework.test import APIClient
+from apps.ai_services.deferred import CoalescingExecutor, DeferredTask
+from apps.ai_services.models import AIInsight
+from apps.ai_services.tasks import analyze_transaction_task, analyze_transactions
+from apps.transactions.models import Transaction
+from unittest.mock import patch
+import threading
+
+User = get_user_model()
+
+class CoalescingExecutorTestCase(TestCase):
+    def _executor(self, **kwargs):
+        batches = []
+        done = threading.Event()
+
+        def run(keys):
+            batches.append(keys)
+            if sum(len(batch) for batch in batches) >= 5:
+                done.set()
+        return CoalescingExecutor(run, name='test', **kwargs), batches, done
+
+    def test_keys_within_window_run_as_one_batch(self):
+        """Test keys submitted together, repeats included, run in one background batch"""
+        executor, batches, done = self._executor(window_seconds=0.2)
+        for key in ['a', 'b', 'a', 'c', 'd', 'e']:
+            executor.submit(key)
+
+        self.assertTrue(done.wait(5))
+        self.assertEqual(batches, [['a', 'b', 'c', 'd', 'e']])
+
+    def test_full_batch_runs_without_waiting(self):
+        """Test max_batch splits a burst and does not wait out the window"""
+        executor, batches, done = self._executor(window_seconds=30, max_batch=2)
+        for key in 'abcde':
+            executor.submit(key)
+        executor.flush()
+
+        self.assertEqual(sorted(key for batch in batches for key in batch), list('abcde'))
+        self.assertTrue(all(len(batch) <= 2 for batch in batches))
+
+    def test_eager_mode_runs_inline(self):
+        """Test eager mode runs each key as it is submitted"""
+        executor, batches, _ = self._executor(mode='eager')
+        executor.submit('a')
+        self.assertEqual(batches, [['a']])
+
+    def test_submit_many_in_eager_mode_runs_in_batches(self):
+        """Test a bulk submit in eager mode runs inline, split by max_batch"""
+        executor, batches, _ = self._executor(mode='eager', max_batch=2)
+        executor.submit_many(['a', 'b', 'a', 'c'])
+        self.assertEqual(batches, [['a', 'b'], ['c']])
+
+class DeferredTaskTestCase(TestCase):
+    def test_task_runs_inline_and_delays_through_its_executor(self):
+        """Test calling the task runs it and delay() queues on a lazily built executor"""
+        calls, built = [], []
+
+        def make_executor():
+            built.append(True)
+            return CoalescingExecutor(lambda keys: calls.append(keys), name='test', mode='eager')
+        task = DeferredTask(lambda key: calls.append(key), make_executor)
+
+        task('a')
+        self.assertEqual((calls, built), (['a'], []))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            task.delay('b')
+            task.delay_many(['c', 'd'])
+        self.assertEqual(calls, ['a', ['b'], ['c', 'd']])
+        self.assertEqual(len(built), 1)
+
+class TransactionAnalysisTestCase(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(
+            username='testuser', email='test@example.com', password='testpass123', role='SME'
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.user)
+
+    def test_created_transactions_analyzed_in_one_batch(self):
+        """Test creating transactions queues analysis that runs as one batch"""
+        payload = {'date': '2024-10-05', 'description': 'Consulting', 'amount': '60000.00',
+                   'type': 'expense', 'category': 'Professional Services'}
+
+        # Capture what reaches the executor instead of racing its background thread
+        with patch.object(analyze_transaction_task.executor, 'submit_many') as submit_many, \
+                self.captureOnCommitCallbacks(execute=True):
+            for _ in range(3):
+                response = self.client.post('/api/transactions/', payload, format='json')
+                self.assertEqual(response.status_code, 201)
+        queued = [key for call in submit_many.call_args_list for key in call.args[0]]
+        self.assertEqual(len(queued), 3)
+
+        executor = CoalescingExecutor(analyze_transactions, name='test', mode='eager')
+        with patch.object(executor, 'func', wraps=analyze_transactions) as analyze, \
+                CaptureQueriesContext(connection) as queries:
+            executor.submit_many(queued)
+
+        # One select, one bulk update, then bulk inserts of insights and links
+        statements = [q['sql'].split()[0] for q in queries.captured_queries
+                      if 'SAVEPOINT' not in q['sql']]
+        self.assertEqual(statements, ['SELECT', 'UPDATE', 'INSERT', 'INSERT'])
+
+        analyze.assert_called_once_with(queued)
+        self.assertEqual(AIInsight.objects.filter(user=self.user).count(), 9)
+        self.assertEqual(AIInsight.related_transactions.through.objects.count(), 9)
+        flagged = Transaction.objects.filter(user=self.user, anomaly_flags=['compliance_reminder'])
+        self.assertEqual(flagged.count(), 3)
@@ -0,0 +1,126 @@
+from django.test import TestCase
+from django.http import StreamingHttpResponse
+from django.contrib.auth import get_user_model
+from rest_framework.test import APIClient
+from apps.transactions.models import Transaction
+from apps.transactions.exporters import export_rows
+from datetime import date
+from decimal import Decimal
+import csv
+import io
+import unittest
+import zipfile
+
+try:
+    import pyarrow.parquet as pq
+except ImportError:
+    pq = None
+
+User = get_user_model()
+
+class TransactionExportTestCase(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(
+            username='testuser', email='test@example.com', password='testpass123', role='SME'
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.user)
+        rows = [
+            ('2024-10-05', 'Consulting fee', 'income', 'Professional', '10000.00', '900.00', '0', '1000.00'),
+            ('2024-10-12', 'Office rent', 'expense', 'Rent', '25000.00', '2250.00', '0', '2500.00'),
+            ('2024-11-02', 'Laptop', 'expense', 'Equipment', '60000.00', '0', '10800.00', '0'),
+        ]
+        for day, description, kind, category, amount, half_gst, igst, tds in rows:
+            Transaction.objects.create(
+                user=self.user, date=day, description=description, amount=Decimal(amount),
+                type=kind, category=category, cgst_amount=Decimal(half_gst),
+                sgst_amount=Decimal(half_gst), igst_amount=Decimal(igst), tds_amount=Decimal(tds)
+            )
+
+    def read_file(self, response):
+        return io.BytesIO(b''.join(response.streaming_content))
+
+    def read_csv(self, response):
+        content = b''.join(response.streaming_content).decode()
+        return list(csv.reader(io.StringIO(content)))
+
+    def test_export_streams_rows_with_sql_totals(self):
+        """Test the export streams a header and rows with computed tax and net amounts"""
+        with self.assertNumQueries(0):
+            response = self.client.get('/api/transactions/export/')
+        self.assertIsInstance(response, StreamingHttpResponse)
+        self.assertEqual(response['Content-Type'], 'text/csv')
+
+        with self.assertNumQueries(1):
+            rows = self.read_csv(response)
+        self.assertEqual(rows[0][0], 'Date')
+        self.assertEqual(rows[0][-2:], ['Total Tax', 'Net Amount'])
+        self.assertEqual(len(rows), 4)
+        # Newest first
+        self.assertEqual(rows[1][1], 'Laptop')
+        self.assertEqual(Decimal(rows[1][13]), Decimal('10800.00'))
+        rent = rows[2]
+        self.assertEqual(Decimal(rent[13]), Decimal('4500.00'))
+        self.assertEqual(Decimal(rent[14]), Decimal('22500.00'))
+
+    def test_export_applies_list_filters(self):
+        """Test the export honours the same filters as the transaction list"""
+        response = self.client.get('/api/transactions/export/?type=expense&date_to=2024-10-31')
+        rows = self.read_csv(response)
+        self.assertEqual([row[1] for row in rows[1:]], ['Office rent'])
+
+        response = self.client.get('/api/transactions/export/?search=consult')
+        rows = self.read_csv(response)
+        self.assertEqual([row[1] for row in rows[1:]], ['Consulting fee'])
+
+    def test_rows_are_read_in_chunks(self):
+        """Test the cursor is consumed lazily rather than loading every row"""
+        queryset = Transaction.objects.filter(user=self.user).order_by('date')
+        rows = export_rows(queryset, chunk_size=2)
+        self.assertEqual(next(rows)[1], 'Consulting fee')
+        self.assertEqual(len(list(rows)), 2)
+
+    def test_xlsx_export(self):
+        """Test the XLSX export holds typed dates and amounts"""
+        from openpyxl import load_workbook
+        response = self.client.get('/api/transactions/export/?file_format=xlsx')
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('transactions.xlsx', response['Content-Disposition'])
+
+        rows = list(load_workbook(self.read_file(response)).active.iter_rows(values_only=True))
+        self.assertEqual(rows[0][0], 'Date')
+        self.assertEqual(len(rows), 4)
+        self.assertEqual(rows[1][0].date(), date(2024, 11, 2))
+        self.assertEqual(rows[2][13], 4500)
+
+    @unittest.skipUnless(pq, 'pyarrow is not installed')
+    def test_parquet_export(self):
+        """Test the Parquet export keeps decimal and date types"""
+        response = self.client.get('/api/transactions/export/?file_format=parquet&type=expense')
+        self.assertEqual(response.status_code, 200)
+
+        table = pq.read_table(self.read_file(response))
+        self.assertEqual(str(table.schema.field('amount').type), 'decimal128(15, 2)')
+        self.assertEqual(str(table.schema.field('date').type), 'date32[day]')
+        self.assertEqual(table.column('net_amount').to_pylist(), [Decimal('60000.00'), Decimal('22500.00')])
+
+    def test_export_split_by_financial_year(self):
+        """Test partition=fy writes one file per April-March year into a ZIP"""
+        Transaction.objects.create(
+            user=self.user, date='2025-03-31', description='Year end', amount=Decimal('100.00'),
+            type='expense', category='Rent'
+        )
+        Transaction.objects.create(
+            user=self.user, date='2025-04-01', description='New year', amount=Decimal('100.00'),
+            type='expense', category='Rent'
+        )
+        response = self.client.get('/api/transactions/export/?partition=fy')
+        archive = zipfile.ZipFile(self.read_file(response))
+        self.assertEqual(archive.namelist(), ['transactions_FY2024-25.csv', 'transactions_FY2025-26.csv'])
+        rows = list(csv.reader(io.StringIO(archive.read('transactions_FY2025-26.csv').decode())))
+        self.assertEqual([row[1] for row in rows[1:]], ['New year'])
+
+    def test_unknown_format(self):
+        """Test an unsupported format is rejected"""
+        response = self.client.get('/api/transactions/export/?file_format=pdf')
+        self.assertEqual(response.status_code, 400)
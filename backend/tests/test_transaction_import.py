@@ -0,0 +1,139 @@
+from django.test import TestCase
+from django.contrib.auth import get_user_model
+from django.core.files.uploadedfile import SimpleUploadedFile
+from rest_framework.test import APIClient
+from apps.transactions.models import Transaction
+from apps.transactions.importer import import_transactions
+from apps.ai_services.models import AIInsight
+from apps.ai_services.tasks import analyze_transactions, analyze_transaction_task
+from apps.users.models import AuditLog
+from datetime import date
+from decimal import Decimal
+from unittest.mock import patch
+import io
+import zipfile
+
+User = get_user_model()
+
+HEADER = 'Date,Description,Amount,Type,Category,Vendor,GSTIN,CGST,SGST,IGST,TDS\n'
+
+class TransactionImportTestCase(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(
+            username='testuser', email='test@example.com', password='testpass123', role='SME'
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.user)
+
+    def _upload(self, content, name='books.csv', **data):
+        upload = SimpleUploadedFile(name, content.encode() if isinstance(content, str) else content)
+        return self.client.post('/api/transactions/import/', {'file': upload, **data}, format='multipart')
+
+    def test_valid_rows_imported_and_invalid_reported(self):
+        """Test per-row errors are reported while the valid rows are created"""
+        content = HEADER + (
+            '2024-04-01,Office rent,50000,expense,Rent,Landlord,27AABCU9603R1ZM,4500,4500,0,5000\n'
+            '15/04/2024,Consulting fee,118000,income,Services,Acme,,0,0,18000,0\n'
+            'not-a-date,Broken,abc,transfer,Misc,,27AAB,0,0,0,0\n'
+            '2024-04-20,Bad tax,1000,expense,Supplies,,,100,50,0,0\n'
+        )
+        response = self._upload(content)
+
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual((response.data['rows'], response.data['created']), (4, 2))
+        self.assertEqual(response.data['error_count'], 2)
+        errors = {error['row']: error['errors'] for error in response.data['errors']}
+        self.assertEqual(set(errors), {4, 5})
+        self.assertIn('Invalid or missing date', errors[4])
+        self.assertIn('Invalid GSTIN format', errors[4])
+        self.assertIn("Type must be 'income' or 'expense'", errors[4])
+        self.assertEqual(errors[5], ['CGST and SGST must be equal'])
+
+        rent = Transaction.objects.get(user=self.user, description='Office rent')
+        self.assertEqual((rent.date, rent.amount, rent.cgst_amount), (date(2024, 4, 1), Decimal('50000.00'), Decimal('4500.00')))
+        self.assertEqual(Transaction.objects.get(description='Consulting fee').date, date(2024, 4, 15))
+
+    def test_single_audit_entry_and_batched_analysis(self):
+        """Test a large import writes one audit entry and queues the rows for background analysis"""
+        rows = ''.join(f'2024-05-{index % 28 + 1:02d},Purchase {index},500,expense,Supplies,,,0,0,0,0\n'
+                       for index in range(3000))
+
+        with patch.object(analyze_transaction_task.executor, 'submit_many') as submit_many, \
+                self.settings(TRANSACTION_IMPORT_CHUNK_SIZE=1000), \
+                self.captureOnCommitCallbacks(execute=True):
+            response = self._upload(HEADER + rows)
+
+        self.assertEqual(response.data['created'], 3000)
+        self.assertEqual(response.data['analysis_queued'], 3000)
+        self.assertEqual(AuditLog.objects.filter(user=self.user, resource='transaction_import').count(), 1)
+        self.assertEqual(AuditLog.objects.filter(user=self.user, resource='transaction').count(), 0)
+        # The response does not wait for the analysis
+        self.assertFalse(AIInsight.objects.exists())
+        submit_many.assert_called_once()
+        queued = submit_many.call_args.args[0]
+        self.assertEqual(len(queued), 3000)
+
+        summary = analyze_transactions(queued)
+        self.assertEqual(summary, {'analyzed': 3000, 'flagged': 3000})
+        # Each expense over 200 without a GSTIN gets a compliance reminder
+        self.assertEqual(AIInsight.objects.filter(user=self.user).count(), 3000)
+        self.assertEqual(Transaction.objects.filter(user=self.user).exclude(ai_analysis='').count(), 3000)
+
+    def test_dry_run_creates_nothing(self):
+        """Test dry_run only validates"""
+        response = self._upload(HEADER + '2024-04-01,Rent,500,expense,Rent,,,0,0,0,0\n', dry_run='true')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual((response.data['rows'], response.data['created']), (1, 0))
+        self.assertFalse(Transaction.objects.exists())
+
+    def test_missing_columns_and_unknown_format(self):
+        """Test unusable files are rejected with a 400"""
+        response = self._upload('Date,Amount\n2024-04-01,500\n')
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('description', response.data['error'])
+
+        response = self._upload('{}', name='books.json')
+        self.assertEqual(response.status_code, 400)
+
+    def test_corrupt_xlsx_rejected(self):
+        """Test a damaged or renamed workbook is rejected with a 400 instead of failing"""
+        response = self._upload(b'not a workbook at all', name='books.xlsx')
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('Could not read file', response.data['error'])
+
+        archive = io.BytesIO()
+        with zipfile.ZipFile(archive, 'w') as bundle:
+            bundle.writestr('notes.txt', 'a zip, but not a workbook')
+        response = self._upload(archive.getvalue(), name='books.xlsx')
+        self.assertEqual(response.status_code, 400)
+        self.assertFalse(Transaction.objects.exists())
+
+    def test_amounts_rounded_before_validation(self):
+        """Test an amount that rounds to zero is rejected rather than stored as 0.00"""
+        content = HEADER + (
+            '2024-04-01,Bank charge,0.004,expense,Bank,,,0,0,0,0\n'
+            '2024-04-02,Stationery,99.999,expense,Office,,,0,0,0,0\n'
+        )
+        summary = import_transactions(self.user, io.BytesIO(content.encode()), 'books.csv')
+        self.assertEqual(summary['created'], 1)
+        self.assertEqual(summary['errors'], [{'row': 2, 'errors': ['Amount must be greater than zero']}])
+        self.assertEqual(Transaction.objects.get().amount, Decimal('100.00'))
+
+    def test_xlsx_import(self):
+        """Test XLSX sheets with datetime cells are imported"""
+        from openpyxl import Workbook
+        from datetime import datetime
+        workbook = Workbook()
+        sheet = workbook.active
+        sheet.append(['Date', 'Description', 'Amount', 'Type', 'Category', 'IGST'])
+        sheet.append([datetime(2024, 6, 1), 'Laptop', 59000, 'expense', 'Equipment', 9000])
+        sheet.append(['02/06/2024', 'Sale', 1000.5, 'Income', 'Sales', None])
+        buffer = io.BytesIO()
+        workbook.save(buffer)
+
+        summary = import_transactions(self.user, io.BytesIO(buffer.getvalue()), 'books.xlsx')
+
+        self.assertEqual(summary['created'], 2)
+        sale = Transaction.objects.get(description='Sale')
+        self.assertEqual((sale.date, sale.amount, sale.type), (date(2024, 6, 2), Decimal('1000.50'), 'income'))
+        self.assertEqual(Transaction.objects.get(description='Laptop').igst_amount, Decimal('9000.00'))
@@ -0,0 +1,96 @@
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.contrib.auth import get_user_model
+from rest_framework.test import APIClient
+from apps.transactions.models import Transaction
+from apps.transactions.search import search_backend, search_transactions
+from decimal import Decimal
+
+User = get_user_model()
+
+class TransactionSearchTestCase(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(
+            username='testuser', email='test@example.com', password='testpass123', role='SME'
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.user)
+        rows = [
+            ('Consulting fee for audit', 'Sharma & Co', 'INV-2024-0117'),
+            ('Office rent April', 'Prestige Estates', 'RENT-04'),
+            ('Printer cartridges', 'Office Depot', 'OD-99812'),
+            ('Audit support retainer', 'Sharma & Co', 'INV-2024-0342'),
+        ]
+        for description, vendor, invoice in rows:
+            Transaction.objects.create(
+                user=self.user, date='2024-10-01', description=description, amount=Decimal('1000.00'),
+                type='expense', category='Professional', vendor_name=vendor, invoice_number=invoice
+            )
+
+    def search(self, text):
+        return [
+            txn.description for txn in
+            search_transactions(Transaction.objects.filter(user=self.user), text)
+        ]
+
+    def test_uses_an_index_on_sqlite(self):
+        """Test the FTS5 index is installed with the test database"""
+        self.assertEqual(search_backend(), 'fts5')
+
+    def test_prefix_and_all_words(self):
+        """Test words match as prefixes and every word must match"""
+        self.assertEqual(sorted(self.search('shar')), ['Audit support retainer', 'Consulting fee for audit'])
+        self.assertEqual(self.search('office dep'), ['Printer cartridges'])
+        self.assertEqual(self.search('INV-2024-03'), ['Audit support retainer'])
+        self.assertEqual(self.search('nothing'), [])
+
+    def test_ranked_results(self):
+        """Test an invoice number hit ranks above a description hit"""
+        Transaction.objects.create(
+            user=self.user, date='2024-10-02', description='Paid rent-04 late fee', amount=Decimal('50.00'),
+            type='expense', category='Rent'
+        )
+        self.assertEqual(self.search('rent 04')[0], 'Office rent April')
+
+    def test_index_follows_writes(self):
+        """Test updates, deletes and bulk inserts are reflected in search"""
+        txn = Transaction.objects.get(invoice_number='RENT-04')
+        txn.description = 'Warehouse lease'
+        txn.save()
+        self.assertEqual(self.search('warehouse'), ['Warehouse lease'])
+        self.assertEqual(self.search('april'), [])
+
+        txn.delete()
+        self.assertEqual(self.search('warehouse'), [])
+
+        Transaction.objects.bulk_create([
+            Transaction(user=self.user, date='2024-10-03', description='Courier charges',
+                        amount=Decimal('80.00'), type='expense', category='Logistics')
+        ])
+        self.assertEqual(self.search('couri'), ['Courier charges'])
+
+    def test_index_survives_rowid_renumbering(self):
+        """Test search still finds the right rows after their implicit rowids change, as VACUUM may do"""
+        with connection.cursor() as cursor:
+            cursor.execute('UPDATE transactions SET rowid = rowid + 1000')
+            cursor.execute(
+                "UPDATE transactions SET rowid = 1 WHERE invoice_number = 'OD-99812'"
+            )
+        self.assertEqual(self.search('office dep'), ['Printer cartridges'])
+        self.assertEqual(self.search('april'), ['Office rent April'])
+
+    def test_list_endpoint_and_basic_fallback(self):
+        """Test the list view searches through the index and falls back to icontains"""
+        other = User.objects.create_user(
+            username='other', email='other@example.com', password='testpass123', role='SME'
+        )
+        Transaction.objects.create(
+            user=other, date='2024-10-01', description='Audit of other books', amount=Decimal('10.00'),
+            type='expense', category='Professional'
+        )
+        response = self.client.get('/api/transactions/?search=audit')
+        self.assertEqual(response.data['count'], 2)
+
+        with override_settings(TRANSACTION_SEARCH_BACKEND='basic'):
+            # Substring matches only work with the basic filter
+            self.assertEqual(self.search('artrid'), ['Printer cartridges'])
@@ -0,0 +1,67 @@
+from django.test import TestCase
+from django.contrib.auth import get_user_model
+from rest_framework.test import APIClient
+from apps.transactions.models import Transaction
+from decimal import Decimal
+
+User = get_user_model()
+
+class TransactionSummaryTestCase(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(
+            username='testuser', email='test@example.com', password='testpass123', role='SME'
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.user)
+        rows = [
+            ('2024-09-10', 'income', 'Sales', '50000.00', '4500.00', '0', 'approved'),
+            ('2024-09-15', 'expense', 'Rent', '20000.00', '1800.00', '2000.00', 'pending'),
+            ('2024-10-05', 'income', 'Sales', '30000.00', '2700.00', '0', 'pending'),
+            ('2024-10-20', 'expense', 'Professional', '10000.00', '0', '1000.00', 'approved'),
+            ('2024-10-21', 'expense', 'Professional', '5000.00', '450.00', '0', 'pending'),
+        ]
+        for day, kind, category, amount, half_gst, tds, state in rows:
+            Transaction.objects.create(
+                user=self.user, date=day, description=category, amount=Decimal(amount),
+                type=kind, category=category, status=state, cgst_amount=Decimal(half_gst),
+                sgst_amount=Decimal(half_gst), tds_amount=Decimal(tds)
+            )
+
+    def test_summary_is_one_query(self):
+        """Test every summary figure comes from a single query"""
+        with self.assertNumQueries(1):
+            response = self.client.get('/api/transactions/summary/')
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['total_income'], '80000.00')
+        self.assertEqual(response.data['total_expenses'], '35000.00')
+        self.assertEqual(response.data['net_profit'], '45000.00')
+        self.assertEqual(response.data['total_gst_collected'], '14400.00')
+        self.assertEqual(response.data['total_gst_paid'], '4500.00')
+        self.assertEqual(response.data['total_tds'], '3000.00')
+        self.assertEqual(response.data['transaction_count'], 5)
+        self.assertEqual(response.data['pending_reviews'], 3)
+        self.assertNotIn('breakdown', response.data)
+
+    def test_breakdown_in_the_same_query(self):
+        """Test the month/category breakdown adds no queries and agrees with the totals"""
+        with self.assertNumQueries(1):
+            response = self.client.get('/api/transactions/summary/?breakdown=true')
+
+        groups = {(row['month'], row['category']): row for row in response.data['breakdown']}
+        self.assertEqual(len(groups), 4)
+        professional = groups[('2024-10-01', 'Professional')]
+        self.assertEqual(professional['total_expenses'], '15000.00')
+        self.assertEqual(professional['transaction_count'], 2)
+        self.assertEqual(response.data['total_income'], '80000.00')
+        self.assertEqual(response.data['pending_reviews'], 3)
+
+    def test_empty_and_filtered(self):
+        """Test date filters apply and an empty range sums to zero"""
+        response = self.client.get('/api/transactions/summary/?date_from=2024-10-01')
+        self.assertEqual(response.data['transaction_count'], 3)
+        self.assertEqual(response.data['total_income'], '30000.00')
+
+        response = self.client.get('/api/transactions/summary/?date_from=2030-01-01&breakdown=1')
+        self.assertEqual(response.data['total_income'], '0.00')
+        self.assertEqual(response.data['breakdown'], [])